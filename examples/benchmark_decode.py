@@ -0,0 +1,36 @@
+"""
+Micro-benchmark of the decoding of read_array fragments.
+
+It compares the decoding element by element through UNPACK_DATA_FUNCTION with the single unpack of a whole
+fragment done by unpack_array_from, and prints the elements decoded per second. No PLC is needed.
+"""
+from __future__ import print_function
+
+import timeit
+
+from pycomm.cip.cip_base import UNPACK_DATA_FUNCTION, PACK_DATA_FUNCTION, unpack_array_from
+from pycomm.cip.cip_const import DATA_FUNCTION_SIZE
+
+FRAGMENT_SIZE = 3984    # the values of a fragment on a 4002 bytes connection
+REPEAT = 200
+
+
+def per_element(typ, fragment, count):
+    size = DATA_FUNCTION_SIZE[typ]
+    return [UNPACK_DATA_FUNCTION[typ](fragment[i * size:(i + 1) * size]) for i in range(count)]
+
+
+def bulk(typ, fragment, count):
+    return unpack_array_from(typ, fragment, 0, count)
+
+
+if __name__ == '__main__':
+
+    for typ in ('SINT', 'INT', 'DINT', 'REAL', 'LINT'):
+        count = FRAGMENT_SIZE // DATA_FUNCTION_SIZE[typ]
+        fragment = b''.join([PACK_DATA_FUNCTION[typ](i % 100 - 50) for i in range(count)])
+        assert per_element(typ, fragment, count) == bulk(typ, fragment, count)
+
+        for name, decode in (('per element', per_element), ('bulk', bulk)):
+            seconds = timeit.timeit(lambda: decode(typ, fragment, count), number=REPEAT)
+            print('{0:5} {1:12} {2:14,.0f} elements/s'.format(typ, name, count * REPEAT / seconds))
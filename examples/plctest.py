@@ -72,36 +72,10 @@ def load_tags(ip, path):
                     if tag['dimensions'] <= 0:
                         tag['length'] = 1
                     else:
-                        idx = 0
-                        lower = 0
-                        upper = 100
-                        # Find an upper bound
-                        done = False
-                        while not done:
-                            # da, dt = c.read_tag(tag['tag_name'] + '[' + str(upper) + ']')
-                            da, dt = c.read_array(tag['tag_name'], upper)
-                            # print '{0} {1} {2}\n'.format(da, dt, upper)
-                            if da == -1:
-                                done = True
-                            else:
-                                lower = upper
-                                upper *= 2
-                        # print "Got Upper Bound"
-                        idx = int(upper - round(float(upper - lower) / 2))
-                        while upper - lower != 1:
-                            # print "J"
-                            # da, dt = c.read_tag(tag['tag_name'] + '[' + str(idx) + ']')
-                            da, dt = c.read_array(tag['tag_name'], idx)
-                            # print '{0} {1} {2}\n'.format(da, dt, upper)
-                            if da == -1:
-                                # Too high
-                                upper = idx
-                                idx = int(upper - round(float(upper - lower) / 2))
-                            else:
-                                # Too low
-                                lower = idx
-                                idx = int(upper - round(float(upper - lower) / 2))
-                        tag['length'] = lower
+                        # The sizes of the dimensions come with the tag list
+                        tag['length'] = 1
+                        for size in tag['array_dimensions']:
+                            tag['length'] *= size
 
                     tag_cnt += 1
                     populate_members(tag, c, templates, True)
@@ -26,7 +26,232 @@
 
 
 import logging,string
+import binascii
+import functools
+import threading
+import time
 from pycomm.cip.cip_base import *
+from pycomm.ab_comm.udt import TemplateCache, compile_udt
+from pycomm.ab_comm.tagdb import TagDatabase, struct_template_ids
+from pycomm.ab_comm.symbols import SymbolTable
+from pycomm.ab_comm.tagindex import TagIndex
+from pycomm.ab_comm.valuecache import ValueCache
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# Offset of the sequence count in the messages of send_unit_data, from the start of the encapsulation header
+CONNECTED_SEQUENCE_OFFSET = 44
+
+# Clock used for deadlines. It must not jump with the wall clock when available
+_clock = getattr(time, 'monotonic', time.time)
+
+
+def _is_ndarray(values):
+	""" True if values is a numpy.ndarray
+	"""
+	return numpy is not None and isinstance(values, numpy.ndarray)
+
+
+def _read_tag_flight(tag):
+	""" The key and the span of a read_tag, for _single_flight
+	"""
+	return ('read_tag', tuple(tag) if isinstance(tag, list) else tag), 0
+
+
+def _share_read_tag(result, span, flight_span):
+	""" The result of a read_tag in flight for another caller
+	"""
+	return list(result) if isinstance(result, list) else result
+
+
+def _read_array_flight(tag, counts, ndarray=False):
+	""" The key and the span of a read_array, for _single_flight: a read of the first counts elements of a tag
+	"""
+	return ('read_array', tag, ndarray), counts
+
+
+def _share_read_array(result, span, flight_span):
+	""" The first span elements of the result of a read_array in flight for another caller
+
+	An array of structures read without ndarray is a list of one bytes entry per fragment, not per element: it is
+	shared only by the reads of the same span.
+	"""
+	if result is None or not result[1]:
+		return result
+	values, typ = result
+	if _is_ndarray(values):
+		return values[:span].copy(), typ
+	if typ == 'STRUCT':
+		return list(values) if span == flight_span else _UNSHARED
+	return values[:span], typ
+
+
+_UNSHARED = object()    # returned by the share function of _single_flight when the caller has to read by itself
+
+
+def _serialized(method):
+	""" Run the method holding the lock of the driver
+
+	Only one request/reply exchange at a time can use the connection. A method called by another one already holding
+	the lock, like forward_open called by read_tag, runs straight away.
+	"""
+	@functools.wraps(method)
+	def wrapper(self, *args, **kwargs):
+		with self._lock:
+			owner = self._lock_owner
+			self._lock_owner = threading.current_thread()
+			try:
+				return method(self, *args, **kwargs)
+			finally:
+				self._lock_owner = owner
+	return wrapper
+
+
+class _Flight(object):
+	""" A read in flight, shared by the callers asking for the same read
+	"""
+	__slots__ = ('span', 'result', 'done')
+
+	def __init__(self, span):
+		self.span = span
+		self.result = None
+		self.done = threading.Event()
+
+
+def _single_flight(request, share):
+	""" Share a read in flight among the threads asking for it, instead of sending it again
+
+	request(*args) returns the key and the span of a read: a read waits for the one in flight with the same key and a
+	span not smaller, and gets its result through share(result, span, flight span), or reads by itself when share
+	returns _UNSHARED. It goes before _serialized, so that a thread waits for the read in flight and not for the lock.
+	A read called by a thread already holding the lock runs straight away.
+	"""
+	def decorator(method):
+		@functools.wraps(method)
+		def wrapper(self, *args, **kwargs):
+			if self._lock_owner is threading.current_thread():
+				return method(self, *args, **kwargs)
+			key, span = request(*args, **kwargs)
+			with self._flights_lock:
+				flights = self._flights.setdefault(key, [])
+				for flight in flights:
+					if flight.span >= span:
+						break
+				else:
+					flight = None
+					leader = _Flight(span)
+					flights.append(leader)
+			if flight is not None:
+				flight.done.wait()
+				result = share(flight.result, span, flight.span)
+				if result is _UNSHARED:
+					return method(self, *args, **kwargs)
+				with self._flights_lock:
+					self._coalesced_reads += 1
+				return result
+
+			try:
+				leader.result = method(self, *args, **kwargs)
+			finally:
+				with self._flights_lock:
+					flights.remove(leader)
+					if not flights:
+						del self._flights[key]
+				leader.done.set()
+			return leader.result
+		return wrapper
+	return decorator
+
+
+class ReadPlan(object):
+	""" A list of tags compiled in the frames of read_tag, to read it again and again
+
+	Pass it to Driver.read_plan: the frames are built at the first read and then only the session handle, the
+	connection id and the sequence count are patched in place. Once a packet has been read with all its tags of atomic
+	type, its reply is decoded with a single struct laid out on that reply, as long as the next replies have the same
+	shape. The frames are built again if the connection size changes, or if get_tag_list finds the tags at other
+	instances for attribs['symbol instance addressing'].
+
+	:param tags: the list of tag names, as passed to read_tag
+	"""
+	def __init__(self, tags):
+		self.tags = list(tags)
+		self.connection_size = None
+		self.generation = None  # the generation of the symbol instances the frames were built with
+		self._packets = []      # (tags, frame) for each packet
+		self._layouts = []      # (struct, expected fields, bool positions) for each packet, None if not known
+
+	def __len__(self):
+		return len(self._packets)
+
+	def _patch(self, index, session, cid, sequence):
+		""" Patch session handle, connection id and sequence count in the frame of packet index
+
+		:return: the frame
+		"""
+		frame = self._packets[index][1]
+		frame[4:8] = pack_dint(session)
+		frame[36:40] = cid
+		frame[44:46] = pack_uint(sequence)
+		return frame
+
+	def _learn(self, index, reply):
+		""" Lay out the decoding of packet index on the reply, if all its tags are atomic and read without error
+		"""
+		self._layouts[index] = None
+		tags = self._packets[index][0]
+		count = unpack_uint_from(reply, 50)
+		if count != len(tags):
+			return
+		fmt = ['<BxBxH', 'H' * count]
+		expected = [I_TAG_SERVICES_REPLY['Multiple Service Packet'], SUCCESS, count]
+		bools = []
+		offset = 2 + count * 2
+		for index_tag in range(count):
+			start = 50 + unpack_uint_from(reply, 52 + index_tag * 2)
+			# A service reply with an error has no data type
+			if unpack_sint_from(reply, start+2) != SUCCESS:
+				return
+			typ = I_DATA_TYPE.get(unpack_uint_from(reply, start+4))
+			if typ not in DATA_STRUCT:
+				return
+			fmt.append('BxBxH' + data_format(typ))
+			expected.append(offset)
+			if typ == 'BOOL':
+				bools.append(index_tag)
+			offset += 6 + DATA_FUNCTION_SIZE[typ]
+
+		layout = struct.Struct(''.join(fmt))
+		if 46 + layout.size != len(reply):
+			return
+		fields = layout.unpack_from(reply, 46)
+		header = len(expected)
+		self._layouts[index] = (layout, tuple(expected), fields[header::4], fields[header+1::4], fields[header+2::4],
+								tuple(I_DATA_TYPE[t] for t in fields[header+2::4]), bools)
+
+	def _decode(self, index, reply):
+		""" Decode the reply to packet index with its layout
+
+		:return: the tag list, None if there is no layout or the reply does not match it
+		"""
+		layout = self._layouts[index]
+		if layout is None:
+			return None
+		layout, expected, services, statuses, types, type_names, bools = layout
+		if 46 + layout.size != len(reply):
+			return None
+		fields = layout.unpack_from(reply, 46)
+		header = len(expected)
+		if fields[:header] != expected or fields[header::4] != services or fields[header+1::4] != statuses or \
+				fields[header+2::4] != types:
+			return None
+		values = list(fields[header+3::4])
+		for position in bools:
+			values[position] = 1 if values[position] & 255 else 0
+		return list(zip(self._packets[index][0], values, type_names))
 
 
 class Driver(object):
@@ -51,19 +276,37 @@ class Driver(object):
 	def __init__(self):
 		self.logger = logging.getLogger('ab_comm.clx')
 		self.__version__ = '0.1'
-		self.__sock = Socket(None)
+		self.__sock = None
 		self._session = 0
 		self._connection_opened = False
 		self._reply = None
 		self._message = None
 		self._target_cid = None
 		self._target_is_connected = False
+		self._connection_size = CONNECTION_PARAMETER['Default'] & CONNECTION_SIZE_MASK
+		self._service_reply_size = {}
+		self._symbol_instances = {}
+		self._symbol_types = {}
+		self._symbol_generation = 0
 		self._tag_array = []
+		self._array_bytes = None
 		self._tag_list = []
+		self._tag_page = []
+		self._tag_list_filter = (False, False)
 		self._tag_struct = {}
 		self._tag_template = {}
-		self._template_buffer = ""
+		self._template_cache = TemplateCache()
+		self._value_cache = ValueCache()
+		self._lock = threading.RLock()
+		self._lock_owner = None   # thread holding the lock, see _serialized
+		self._flights = {}      # key -> list of the reads in flight, see _single_flight
+		self._flights_lock = threading.Lock()
+		self._coalesced_reads = 0
+		self._udt_codecs = {}
+		self._template_buffer = b""
 		self._template_member_cnt = 0
+		self._reading_template = False
+		self._reading_controller = False
 		self._sequence = 1
 		self._last_instance = 0
 		self._byte_offset = 0
@@ -73,9 +316,11 @@ class Driver(object):
 		self._last_tag_write = ()
 		self._status = (0, "")
 
-		self.attribs = {'context': '_pycomm_', 'protocol version': 1, 'rpi': 5000, 'port': 0xAF12, 'timeout': 10,
-						'backplane': 1, 'cpu slot': 0, 'option': 0, 'cid': '\x27\x04\x19\x71', 'csn': '\x27\x04',
-						'vid': '\x09\x10', 'vsn': '\x09\x10\x19\x71'}
+		self.attribs = {'context': b'_pycomm_', 'protocol version': 1, 'rpi': 5000, 'port': 0xAF12, 'timeout': 10,
+						'backplane': 1, 'cpu slot': 0, 'option': 0, 'cid': b'\x27\x04\x19\x71', 'csn': b'\x27\x04',
+						'vid': b'\x09\x10', 'vsn': b'\x09\x10\x19\x71', 'zero copy': False,
+						'pipeline depth': 1, 'pipeline timeout': 5.0, 'connection size': MAX_CONNECTION_SIZE,
+						'symbol instance addressing': False, 'tag database': None, 'value cache age': None}
 
 	def __len__(self):
 		return len(self.attribs)
@@ -113,6 +358,7 @@ class Driver(object):
 		h += pack_dint(self.attribs['option'])      # Option UDINT
 		return h
 
+	@_serialized
 	def nop(self):
 		""" No reply command
 
@@ -121,6 +367,7 @@ class Driver(object):
 		self._message = self.build_header(ENCAPSULATION_COMMAND['nop'], 0)
 		self._send()
 
+	@_serialized
 	def list_identity(self):
 		""" ListIdentity command to locate and identify potential target
 
@@ -138,6 +385,15 @@ class Driver(object):
 		"""
 		return self._status
 
+	def get_connection_size(self):
+		""" Get the size of the connection opened with the target
+
+		It is the size asked with attribs['connection size'] if the target accepted the Large Forward Open, otherwise
+		the size of the classic Forward Open.
+		:return: the maximum size in bytes of a connected message
+		"""
+		return self._connection_size
+
 	def get_last_tag_read(self):
 		""" Return the last tag read by a multi request read
 
@@ -159,6 +415,7 @@ class Driver(object):
 		"""
 		self._status = (0, "")
 
+	@_serialized
 	def register_session(self):
 		""" Register a new session with the communication partner
 
@@ -173,12 +430,13 @@ class Driver(object):
 		self._send()
 		self._receive()
 		if self._check_reply():
-			self._session = unpack_dint(self._reply[4:8])
-			self.logger.info("Session ={0} has been registered.".format(print_bytes_line(self._reply[4:8])))
+			self._session = unpack_dint_from(self._reply, 4)
+			self.logger.info("Session ={0} has been registered.".format(print_bytes_line(copy_bytes(self._reply, 4, 8))))
 			return self._session
 		self.logger.warning('Session not registered.')
 		return None
 
+	@_serialized
 	def un_register_session(self):
 		""" Un-register a connection
 
@@ -187,6 +445,7 @@ class Driver(object):
 		self._send()
 		self._session = None
 
+	@_serialized
 	def send_rr_data(self, msg):
 		""" SendRRData transfer an encapsulated request/reply packet between the originator and target
 
@@ -199,18 +458,152 @@ class Driver(object):
 		self._receive()
 		return self._check_reply()
 
+	@_serialized
 	def send_unit_data(self, msg):
 		""" SendUnitData send encapsulated connected messages.
 
+		The replies with another sequence count, like the late replies of pipelined requests timed out, are discarded.
+
 		:param msg: The message to be send to the target
 		:return: the reply received from the target
 		"""
 		self._message = self.build_header(ENCAPSULATION_COMMAND["send_unit_data"], len(msg))
 		self._message += msg
+		sequence = unpack_uint_from(msg, CONNECTED_SEQUENCE_OFFSET - HEADER_SIZE)
 		self._send()
-		self._receive()
+		while self._receive() and self._is_stale_reply(sequence):
+			self.logger.warning("Discarded stale reply with sequence count {0}".format(
+				unpack_uint_from(self._reply, CONNECTED_SEQUENCE_OFFSET)))
 		return self._check_reply()
 
+	def _is_stale_reply(self, sequence):
+		""" True if the last reply is a connected reply to a request other than the one with the sequence count given
+		"""
+		reply = self._reply
+		return reply is not None and len(reply) >= CONNECTED_SEQUENCE_OFFSET + 2 and \
+			unpack_uint_from(reply, 0) == unpack_uint(ENCAPSULATION_COMMAND["send_unit_data"]) and \
+			unpack_uint_from(reply, CONNECTED_SEQUENCE_OFFSET) != sequence
+
+	@_serialized
+	def send_unit_data_pipelined(self, message_requests, parse=None):
+		""" Send connected messages keeping more than one of them in flight on the connection
+
+		Up to attribs['pipeline depth'] requests are sent before waiting for the replies. Each request is stamped with
+		its own sequence count and the replies are matched back to the requests by the sequence count echoed by the
+		target, so they can arrive in any order. A request without reply within attribs['pipeline timeout'] seconds
+		fails and frees its place in the pipeline; if its reply comes later, it is discarded as stale together with
+		any other reply whose sequence count is not in flight.
+
+		:param message_requests: the list of message requests to send, each one without the sequence count
+		:param parse: if not None, called as parse(index) for each reply matched, while self._reply holds the reply
+		:return: a list with the result of _check_reply for each request, False for the ones timed out
+		"""
+		return self._send_frames_pipelined(len(message_requests), self._unit_data_frame(message_requests), parse)
+
+	def _unit_data_frame(self, message_requests):
+		""" Make the frame function of _send_frames_pipelined for a list of message requests
+
+		:return: a function frame(index, sequence) returning the send_unit_data message of message_requests[index]
+		"""
+		def frame(index, sequence):
+			msg = self._connected_message(message_requests[index], sequence)
+			return self.build_header(ENCAPSULATION_COMMAND["send_unit_data"], len(msg)) + msg
+		return frame
+
+	def _send_frames_pipelined(self, count, frame, parse):
+		""" The pipeline of send_unit_data_pipelined, for messages already encapsulated
+
+		:param count: the number of messages to send
+		:param frame: called as frame(index, sequence), returns the message number index with the sequence count given
+		:param parse: as in send_unit_data_pipelined
+		:return: as send_unit_data_pipelined
+		"""
+		depth = max(1, self.attribs['pipeline depth'])
+		timeout = self.attribs['pipeline timeout']
+		results = [False] * count
+		in_flight = {}      # sequence count -> (index of the request, deadline)
+		next_request = 0
+		socket_timeout = self.__sock.gettimeout()
+		try:
+			while next_request < count or in_flight:
+				# Fill the pipeline
+				while next_request < count and len(in_flight) < depth:
+					sequence = self._get_sequence()
+					self._message = frame(next_request, sequence)
+					if not self._send():
+						return results
+					in_flight[sequence] = (next_request, _clock() + timeout)
+					next_request += 1
+
+				# Wait for the next reply, not longer than the oldest request can wait
+				reply_received = False
+				remaining = min(deadline for index, deadline in in_flight.values()) - _clock()
+				if remaining > 0:
+					self.__sock.settimeout(remaining)
+					try:
+						if self.attribs['zero copy']:
+							self._reply = self.__sock.receive_into()
+						else:
+							self._reply = self.__sock.receive()
+						reply_received = True
+					except SocketTimeout:
+						pass
+					except SocketError as e:
+						self._status = (12, "Error {0} during {1}".format(e, 'receive'))
+						self.logger.critical(self._status)
+						return results
+
+				if not reply_received:
+					now = _clock()
+					for sequence in [seq for seq, (index, deadline) in in_flight.items() if deadline <= now]:
+						del in_flight[sequence]
+						self._status = (12, "Request with sequence count {0} timed out".format(sequence))
+						self.logger.warning(self._status)
+					continue
+
+				sequence = unpack_uint_from(self._reply, CONNECTED_SEQUENCE_OFFSET)
+				if unpack_uint_from(self._reply, 0) != unpack_uint(ENCAPSULATION_COMMAND["send_unit_data"]) or \
+						sequence not in in_flight:
+					self.logger.warning("Discarded stale reply with sequence count {0}".format(sequence))
+					continue
+				index, deadline = in_flight.pop(sequence)
+				results[index] = self._check_reply()
+				if parse is not None:
+					parse(index)
+		finally:
+			self.__sock.settimeout(socket_timeout)
+		return results
+
+	def _connected_message(self, message_request, sequence=None):
+		""" Wrap a message request in the common packet format of a connected message
+
+		:param message_request: the message request, without the sequence count
+		:param sequence: the sequence count to use. If None the next one is taken
+		:return: the message to pass to send_unit_data
+		"""
+		if sequence is None:
+			sequence = self._get_sequence()
+		return build_common_packet_format(
+			DATA_ITEM['Connected'],
+			pack_uint(sequence) + message_request,
+			ADDRESS_ITEM['Connection Based'],
+			addr_data=self._target_cid,
+		)
+
+	def _create_tag_rp(self, tag, multi_requests=False):
+		""" create_tag_rp addressing the tag by its Symbol Object instance if known
+
+		With attribs['symbol instance addressing'] the first name of the tag is looked up in the instances returned by
+		get_tag_list; the tags not found keep the symbolic path. The instances change when the program is downloaded
+		again, so get_tag_list must be called again after a download.
+
+		:return: the request path, None if it cannot be created
+		"""
+		instance_id = None
+		if self.attribs['symbol instance addressing']:
+			instance_id = self._symbol_instances.get(tag.split('.', 1)[0].split('[', 1)[0])
+		return create_tag_rp(tag, multi_requests, instance_id)
+
 	def _get_sequence(self):
 		""" Increase and return the sequence used with connected messages
 
@@ -225,27 +618,38 @@ class Driver(object):
 	def _parse_tag_list(self, start_tag_ptr, status):
 		""" extract the tags list from the message received
 
+		The tags are put in self._tag_page, except the ones excluded by self._tag_list_filter.
+
 		:param start_tag_ptr: The point in the message string where the tag list begin
 		:param status: The status of the message receives
 		"""
-		tags_returned = self._reply[start_tag_ptr:]
-		tags_returned_length = len(tags_returned)
-		idx = 0
+		reply = self._reply
+		reply_length = len(reply)
+		idx = start_tag_ptr
 		instance = 0
+		skip_system, skip_programs = self._tag_list_filter
 		try:
-			while idx < tags_returned_length:
-				instance = unpack_dint(tags_returned[idx:idx+4])
+			while idx < reply_length:
+				instance = unpack_dint_from(reply, idx)
 				idx += 4
-				tag_length = unpack_uint(tags_returned[idx:idx+2])
+				tag_length = unpack_uint_from(reply, idx)
 				idx += 2
-				tag_name = tags_returned[idx:idx+tag_length]
+				tag_name = to_str(copy_bytes(reply, idx, idx+tag_length))
 				idx += tag_length
-				symbol_type = unpack_uint(tags_returned[idx:idx+2])
+				symbol_type = unpack_uint_from(reply, idx)
 				idx += 2
-				attr_4 = unpack_dint(tags_returned[idx:idx+4])
+				attr_4 = unpack_dint_from(reply, idx)
 				idx += 4
+				# The sizes of the three dimensions, the ones not used are 0
+				dimensions = unpack_array_from('DWORD', reply, idx, 3)
+				idx += 12
+				if skip_system and (symbol_type & 0b0001000000000000 or tag_name.startswith('__')):
+					continue
+				if skip_programs and tag_name.startswith('Program:'):
+					continue
 				#self._tag_list.append((instance, tag_name, symbol_type))
-				self._tag_list.append({'instance_id': instance, 'tag_name': tag_name, 'symbol_type': symbol_type, 'attr_3': attr_4})
+				self._tag_page.append({'instance_id': instance, 'tag_name': tag_name, 'symbol_type': symbol_type, 'attr_3': attr_4,
+									   'array_dimensions': dimensions[:(symbol_type & 0b0110000000000000) >> 13]})
 
 			if status == SUCCESS:
 				self._last_instance = -1
@@ -273,35 +677,35 @@ class Driver(object):
 		:param start_tag_ptr: The point in the message string where the tag list begin
 		:param status: The status of the message receives
 		"""
-		attrs_returned = self._reply[start_tag_ptr:]
-		attrs_returned_length = len(attrs_returned)
+		attrs_returned = self._reply
+		attrs_returned_length = len(attrs_returned) - start_tag_ptr
 		if attrs_returned_length < 30:
 			print(attrs_returned_length)
 			self._status = (1, 'response too short _parse_tag_struct')
 			return
 
 		self._tag_struct = {}
-		idx = 4
+		idx = start_tag_ptr + 4
 		try:
-			success = unpack_uint(attrs_returned[idx:idx + 2])
+			success = unpack_uint_from(attrs_returned, idx)
 			if not success:
 				idx += 2
-				self._tag_struct['obj_def_size'] = unpack_dint(attrs_returned[idx:idx + 4])
+				self._tag_struct['obj_def_size'] = unpack_dint_from(attrs_returned, idx)
 			idx += 6
-			success = unpack_uint(attrs_returned[idx:idx + 2])
+			success = unpack_uint_from(attrs_returned, idx)
 			if not success:
 				idx += 2
-				self._tag_struct['struct_size'] = unpack_dint(attrs_returned[idx:idx + 4])
+				self._tag_struct['struct_size'] = unpack_dint_from(attrs_returned, idx)
 			idx += 6
-			success = unpack_uint(attrs_returned[idx:idx + 2])
+			success = unpack_uint_from(attrs_returned, idx)
 			if not success:
 				idx += 2
-				self._tag_struct['member_cnt'] = unpack_uint(attrs_returned[idx:idx + 2])
+				self._tag_struct['member_cnt'] = unpack_uint_from(attrs_returned, idx)
 			idx += 4
-			success = unpack_uint(attrs_returned[idx:idx + 2])
+			success = unpack_uint_from(attrs_returned, idx)
 			if not success:
 				idx += 2
-				self._tag_struct['struct_handle'] = unpack_uint(attrs_returned[idx:idx + 2])
+				self._tag_struct['struct_handle'] = unpack_uint_from(attrs_returned, idx)
 
 			if status != SUCCESS:
 				if status in SERVICE_STATUS:
@@ -321,7 +725,7 @@ class Driver(object):
 		:param start_tag_ptr: The point in the message string where the tag list begin
 		:param status: The status of the message receives
 		"""
-		tags_returned = self._reply[start_tag_ptr:]
+		tags_returned = copy_bytes(self._reply, start_tag_ptr)
 		tags_returned_length = len(tags_returned)
 		member = 0
 		idx = 0
@@ -356,23 +760,28 @@ class Driver(object):
 		:param start_ptr: Where the fragment starts within the reply
 		:param status: status field used to decide if keep parsing or stop
 		"""
-		data_type = unpack_uint(self._reply[start_ptr:start_ptr+2])
-		fragment_returned = self._reply[start_ptr+2:]
-
-		fragment_returned_length = len(fragment_returned)
-		idx = 0
+		reply = self._reply
 		try:
-			while idx < fragment_returned_length:
-				typ = I_DATA_TYPE[data_type]
-				if typ != 'STRUCT':
-					value = UNPACK_DATA_FUNCTION[typ](fragment_returned[idx:idx+DATA_FUNCTION_SIZE[typ]])
-					idx += DATA_FUNCTION_SIZE[typ]
-					self._tag_array.append(value)
-				else:
-					value = UNPACK_DATA_FUNCTION[typ](fragment_returned[idx:])
-					self._tag_array.append(value)
+			# An error reply has no data type
+			data_type = unpack_uint_from(reply, start_ptr)
+			fragment_start = start_ptr + 2
+			fragment_returned_length = len(reply) - fragment_start
+			if self._array_bytes is not None:
+				# Keep the values as they are, read_array makes an ndarray of them at the end
+				if I_DATA_TYPE.get(data_type) == 'STRUCT':
+					# Skip the structure handle
+					fragment_start += 2
 					fragment_returned_length -= 2
-					idx = fragment_returned_length
+				self._array_bytes += reply[fragment_start:]
+			elif I_DATA_TYPE[data_type] != 'STRUCT':
+				# All the elements of the fragment with one unpack
+				typ = I_DATA_TYPE[data_type]
+				count = fragment_returned_length // DATA_FUNCTION_SIZE[typ]
+				self._tag_array.extend(unpack_array_from(typ, reply, fragment_start, count))
+				self._last_position += count
+			elif fragment_returned_length > 0:
+				self._tag_array.append(unpack_data_from('STRUCT', reply, fragment_start))
+				fragment_returned_length -= 2
 				self._last_position += 1
 			if status == SUCCESS:
 				self._byte_offset = -1
@@ -395,25 +804,32 @@ class Driver(object):
 
 		:return: the tag list
 		"""
+		reply = self._reply
 		offset = 50
 		position = 50
-		number_of_service_replies = unpack_uint(self._reply[offset:offset+2])
+		number_of_service_replies = unpack_uint_from(reply, offset)
 		tag_list = []
 		for index in range(number_of_service_replies):
 			position += 2
-			start = offset + unpack_uint(self._reply[position:position+2])
-			general_status = unpack_sint(self._reply[start+2:start+3])
+			start = offset + unpack_uint_from(reply, position)
+			general_status = unpack_sint_from(reply, start+2)
 
 			if general_status == 0:
-				data_type = unpack_uint(self._reply[start+4:start+6])
+				data_type = unpack_uint_from(reply, start+4)
 				try:
 					value_begin = start + 6
 					value_end = value_begin + DATA_FUNCTION_SIZE[I_DATA_TYPE[data_type]]
-					value = self._reply[value_begin:value_end]
-					self._last_tag_read = (tags[index], UNPACK_DATA_FUNCTION[I_DATA_TYPE[data_type]](value),
-										   I_DATA_TYPE[data_type])
+					self._last_tag_read = (tags[index], unpack_data_from(I_DATA_TYPE[data_type], reply, value_begin,
+																		 value_end), I_DATA_TYPE[data_type])
 				except LookupError:
 					self._last_tag_read = (tags[index], None, None)
+
+				# Remember the size of the reply to plan the next packets with this tag
+				if index < number_of_service_replies - 1:
+					end = offset + unpack_uint_from(reply, position+2)
+				else:
+					end = len(reply)
+				self._service_reply_size[tags[index]] = end - start
 			else:
 				self._last_tag_read = (tags[index], None, None)
 
@@ -429,14 +845,15 @@ class Driver(object):
 
 		:return: the tag list
 		"""
+		reply = self._reply
 		offset = 50
 		position = 50
-		number_of_service_replies = unpack_uint(self._reply[offset:offset+2])
+		number_of_service_replies = unpack_uint_from(reply, offset)
 		tag_list = []
 		for index in range(number_of_service_replies):
 			position += 2
-			start = offset + unpack_uint(self._reply[position:position+2])
-			general_status = unpack_sint(self._reply[start+2:start+3])
+			start = offset + unpack_uint_from(reply, position)
+			general_status = unpack_sint_from(reply, start+2)
 
 			if general_status == 0:
 				self._last_tag_write = (tags[index] + ('GOOD',))
@@ -453,22 +870,23 @@ class Driver(object):
 		self._more_packets_available = False
 		try:
 			if self._reply is None:
-				self._status = (3, '%s without reply' % REPLY_INFO[unpack_dint(self._message[:2])])
+				self._status = (3, '%s without reply' % REPLY_INFO[unpack_uint_from(self._message, 0)])
 				self.logger.warning(self._status)
 				return False
 			# Get the type of command
-			typ = unpack_uint(self._reply[:2])
+			reply = self._reply
+			typ = unpack_uint_from(reply, 0)
 
 			# Encapsulation status check
-			if unpack_dint(self._reply[8:12]) != SUCCESS:
+			if unpack_dint_from(reply, 8) != SUCCESS:
 				self._status = (3, "{0} reply status:{1}".format(REPLY_INFO[typ],
-																 SERVICE_STATUS[unpack_dint(self._reply[8:12])]))
+																 SERVICE_STATUS[unpack_dint_from(reply, 8)]))
 				self.logger.warning(self._status)
 				return False
 
 			# Command Specific Status check
 			if typ == unpack_uint(ENCAPSULATION_COMMAND["send_rr_data"]):
-				status = unpack_sint(self._reply[42:43])
+				status = unpack_sint_from(reply, 42)
 				if status != SUCCESS:
 					self._status = (3, "send_rr_data reply:{0} - Extend status:{1}".format(
 						SERVICE_STATUS[status], get_extended_status(self._reply, 42)))
@@ -478,17 +896,20 @@ class Driver(object):
 					return True
 
 			elif typ == unpack_uint(ENCAPSULATION_COMMAND["send_unit_data"]):
-				status = unpack_sint(self._reply[48:49])
-				if unpack_sint(self._reply[46:47]) == I_TAG_SERVICES_REPLY["Read Tag Fragmented"]:
+				status = unpack_sint_from(reply, 48)
+				service = unpack_sint_from(reply, 46)
+				if service == I_TAG_SERVICES_REPLY["Read Tag Fragmented"]:
 					self._parse_fragment(50, status)
 					return True
-				if unpack_sint(self._reply[46:47]) == I_TAG_SERVICES_REPLY["Get Instance Attribute List"]:
+				if service == I_TAG_SERVICES_REPLY["Get Instance Attribute List"]:
 					self._parse_tag_list(50, status)
 					return True
-				if unpack_sint(self._reply[46:47]) == I_TAG_SERVICES_REPLY["Get Attribute List"]:
+				# The Controller Object replies are parsed by get_change_signature
+				if service == I_TAG_SERVICES_REPLY["Get Attribute List"] and not self._reading_controller:
 					self._parse_tag_struct(50, status)
 					return True
-				if unpack_sint(self._reply[46:47]) == I_TAG_SERVICES_REPLY["Read Template"]:
+				# Read Template shares the reply code with Read Tag
+				if service == I_TAG_SERVICES_REPLY["Read Template"] and self._reading_template:
 					self._parse_template(50, status)
 					return True
 				if status == 0x06:
@@ -512,20 +933,22 @@ class Driver(object):
 
 		return True
 
-	def forward_open(self):
-		""" CIP implementation of the forward open message
-
-		Refer to ODVA documentation Volume 1 3-5.5.2
+	def _build_forward_open_request(self, large=False):
+		""" Build the forward open message
 
-		:return: False if any error in the reply message
+		:param large: if True build a Large Forward Open asking attribs['connection size'] bytes
+		:return: the message to pass to send_rr_data
 		"""
-		if self._session == 0:
-			self._status = (4, "A session need to be registered before to call forward_open.")
-			self.logger.warning(self._status)
-			return None
+		if large:
+			service = LARGE_FORWARD_OPEN
+			size = min(self.attribs['connection size'], MAX_CONNECTION_SIZE)
+			connection_parameter = pack_dint(LARGE_CONNECTION_PARAMETER['Default'] | size)
+		else:
+			service = FORWARD_OPEN
+			connection_parameter = pack_uint(CONNECTION_PARAMETER['Default'])
 
 		forward_open_msg = [
-			FORWARD_OPEN,
+			service,
 			pack_sint(2),
 			CLASS_ID["8-bit"],
 			CLASS_CODE["Connection Manager"],  # Volume 1: 5-1
@@ -539,11 +962,11 @@ class Driver(object):
 			self.attribs['vid'],
 			self.attribs['vsn'],
 			TIMEOUT_MULTIPLIER,
-			'\x00\x00\x00',
+			b'\x00\x00\x00',
 			pack_dint(self.attribs['rpi'] * 1000),
-			pack_uint(CONNECTION_PARAMETER['Default']),
+			connection_parameter,
 			pack_dint(self.attribs['rpi'] * 1000),
-			pack_uint(CONNECTION_PARAMETER['Default']),
+			connection_parameter,
 			TRANSPORT_CLASS,  # Transport Class
 			CONNECTION_SIZE['Backplane'],
 			pack_sint(self.attribs['backplane']),
@@ -553,30 +976,55 @@ class Driver(object):
 			INSTANCE_ID["8-bit"],
 			pack_sint(1)
 		]
+		return build_common_packet_format(DATA_ITEM['Unconnected'], b''.join(forward_open_msg), ADDRESS_ITEM['UCMM'],)
 
-		if self.send_rr_data(
-				build_common_packet_format(DATA_ITEM['Unconnected'], ''.join(forward_open_msg), ADDRESS_ITEM['UCMM'],)):
-			self._target_cid = self._reply[44:48]
-			self._target_is_connected = True
-			self.logger.info("The target is connected end returned CID %s" % print_bytes_line(self._target_cid))
-			return True
-		self._status = (4, "forward_open returned False")
-		self.logger.warning(self._status)
-		return False
+	def _parse_forward_open_reply(self, large=False):
+		""" Take the connection id returned by a successful forward open
 
-	def forward_close(self):
-		""" CIP implementation of the forward close message
+		:param large: True if the reply is to a Large Forward Open
+		:return: True
+		"""
+		self._target_cid = copy_bytes(self._reply, 44, 48)
+		self._target_is_connected = True
+		if large:
+			self._connection_size = min(self.attribs['connection size'], MAX_CONNECTION_SIZE)
+		else:
+			self._connection_size = CONNECTION_PARAMETER['Default'] & CONNECTION_SIZE_MASK
+		self.logger.info("The target is connected end returned CID %s" % print_bytes_line(self._target_cid))
+		return True
 
-		Each connection opened with the froward open message need to be closed.
-		Refer to ODVA documentation Volume 1 3-5.5.3
+	@_serialized
+	def forward_open(self):
+		""" CIP implementation of the forward open message
+
+		Refer to ODVA documentation Volume 1 3-5.5.2
+
+		When attribs['connection size'] is bigger than the size of the classic Forward Open, a Large Forward Open is
+		tried first. If the target rejects it, the connection is opened with the classic Forward Open.
 
 		:return: False if any error in the reply message
 		"""
 		if self._session == 0:
-			self._status = (5, "A session need to be registered before to call forward_close.")
+			self._status = (4, "A session need to be registered before to call forward_open.")
 			self.logger.warning(self._status)
 			return None
 
+		if self.attribs['connection size'] > CONNECTION_PARAMETER['Default'] & CONNECTION_SIZE_MASK:
+			if self.send_rr_data(self._build_forward_open_request(large=True)):
+				return self._parse_forward_open_reply(large=True)
+			self.logger.warning("Large Forward Open rejected, trying Forward Open.")
+
+		if self.send_rr_data(self._build_forward_open_request()):
+			return self._parse_forward_open_reply()
+		self._status = (4, "forward_open returned False")
+		self.logger.warning(self._status)
+		return False
+
+	def _build_forward_close_request(self):
+		""" Build the forward close message
+
+		:return: the message to pass to send_rr_data
+		"""
 		forward_close_msg = [
 			FORWARD_CLOSE,
 			pack_sint(2),
@@ -590,7 +1038,7 @@ class Driver(object):
 			self.attribs['vid'],
 			self.attribs['vsn'],
 			CONNECTION_SIZE['Backplane'],
-			'\x00',     # Reserved
+			b'\x00',     # Reserved
 			pack_sint(self.attribs['backplane']),
 			pack_sint(self.attribs['cpu slot']),
 			CLASS_ID["8-bit"],
@@ -598,14 +1046,184 @@ class Driver(object):
 			INSTANCE_ID["8-bit"],
 			pack_sint(1)
 		]
-		if self.send_rr_data(
-				build_common_packet_format(DATA_ITEM['Unconnected'], ''.join(forward_close_msg), ADDRESS_ITEM['UCMM'])):
+		return build_common_packet_format(DATA_ITEM['Unconnected'], b''.join(forward_close_msg), ADDRESS_ITEM['UCMM'])
+
+	@_serialized
+	def forward_close(self):
+		""" CIP implementation of the forward close message
+
+		Each connection opened with the froward open message need to be closed.
+		Refer to ODVA documentation Volume 1 3-5.5.3
+
+		:return: False if any error in the reply message
+		"""
+		if self._session == 0:
+			self._status = (5, "A session need to be registered before to call forward_close.")
+			self.logger.warning(self._status)
+			return None
+
+		if self.send_rr_data(self._build_forward_close_request()):
 			self._target_is_connected = False
 			return True
 		self._status = (5, "forward_close returned False")
 		self.logger.warning(self._status)
 		return False
 
+	def _build_read_tag_request(self, tag):
+		""" Build the message request of read_tag with a single tag
+
+		:return: the message request, None if a request path cannot be created
+		"""
+		rp = self._create_tag_rp(tag)
+		if rp is None:
+			self._status = (6, "Cannot create tag {0} request packet. read_tag will not be executed.".format(tag))
+			self.logger.warning(self._status)
+			return None
+		# Creating the Message Request Packet
+		message_request = [
+			pack_sint(TAG_SERVICES_REQUEST['Read Tag']),  # the Request Service
+			pack_sint(len(rp) // 2),                     # the Request Path Size length in word
+			rp,                                          # the request path
+			pack_uint(1)
+		]
+		return b''.join(message_request)
+
+	def _parse_read_tag_reply(self, tag):
+		""" Extract the result of read_tag with a single tag from the reply
+
+		:return: the value of read_tag
+		"""
+		# Get the data type
+		status = unpack_sint_from(self._reply, 48)
+		if status == SUCCESS:
+			try:
+				data_type = unpack_uint_from(self._reply, 50)
+				return unpack_data_from(I_DATA_TYPE[data_type], self._reply, 52), I_DATA_TYPE[data_type]
+			except LookupError:
+				self._status = (6, "Unknown data type returned by read_tag")
+				self.logger.warning(self._status)
+				return None
+		else:
+			ext_status = get_extended_status(self._reply, 48)
+			self._status = (6, "Read Tag status: {0} | Extended Status: {1}".format(SERVICE_STATUS[status], ext_status))
+			self.logger.warning(self._status)
+			return -1, 0
+
+	def _estimate_service_reply_size(self, tag):
+		""" Estimate the size of the reply to the Read Tag service of a tag never read
+
+		The controller scope tags, and their elements, found by get_tag_list have the size of their data type; the
+		structures need their size in the template cache too. The other tags, like the members of the structures, are
+		taken as DEFAULT_SERVICE_REPLY_SIZE.
+
+		:return: the size in bytes
+		"""
+		symbol_type = None if '.' in tag else self._symbol_types.get(tag.split('[', 1)[0])
+		if symbol_type is None:
+			return DEFAULT_SERVICE_REPLY_SIZE
+		if symbol_type & 0x8000:
+			# Reply header, the structure data type with its handle and the structure
+			struct_size = self._template_cache.struct_size(symbol_type & 0x0fff)
+			if struct_size is None:
+				return DEFAULT_SERVICE_REPLY_SIZE
+			return 8 + struct_size
+		# Reply header, the data type and the value
+		size = DATA_FUNCTION_SIZE.get(I_DATA_TYPE.get(symbol_type & 0xff))
+		return DEFAULT_SERVICE_REPLY_SIZE if size is None else 6 + size
+
+	def _build_read_tag_packets(self, tags):
+		""" Build the Multiple Service Packets of read_tag with a list of tags
+
+		The list is split by plan_multiple_service to fit the connection size. The reply expected for a tag is as big
+		as the last one received for it, or as estimated by _estimate_service_reply_size if the tag was never read.
+
+		:return: a list of (tags, message request), one for each packet, None if a request path cannot be created
+		"""
+		rp_list = []
+		for t in tags:
+			rp = self._create_tag_rp(t, multi_requests=True)
+			if rp is None:
+				self._status = (6, "Cannot create tag {0} request packet. read_tag will not be executed.".format(t))
+				self.logger.warning(self._status)
+				return None
+			rp_list.append(pack_sint(TAG_SERVICES_REQUEST['Read Tag']) + rp + pack_uint(1))
+
+		reply_sizes = [self._service_reply_size.get(t) or self._estimate_service_reply_size(t) for t in tags]
+		return [(tags[start:end], b''.join(build_multiple_service(rp_list[start:end])))
+				for start, end in plan_multiple_service(rp_list, reply_sizes, self._connection_size)]
+
+	def _parse_read_tag_packet(self, tags):
+		""" Extract the result of one packet built by _build_read_tag_packets from the last reply
+
+		:return: the tag list, None if the reply does not carry the replies of the services
+		"""
+		if self._reply is None or \
+				unpack_sint_from(self._reply, 46) != I_TAG_SERVICES_REPLY['Multiple Service Packet'] or \
+				unpack_sint_from(self._reply, 48) not in (SUCCESS, 0x1e):
+			return None
+		return self._parse_multiple_request_read(tags)
+
+	def _compile_read_plan(self, plan):
+		""" Build the frames of a ReadPlan for the connection size in use
+
+		:return: False if a request path cannot be created
+		"""
+		packets = self._build_read_tag_packets(plan.tags)
+		if packets is None:
+			return False
+		plan._packets = []
+		for tags, message_request in packets:
+			msg = self._connected_message(message_request, 0)
+			frame = bytearray(self.build_header(ENCAPSULATION_COMMAND["send_unit_data"], len(msg)) + msg)
+			plan._packets.append((tags, frame))
+		plan._layouts = [None] * len(packets)
+		plan.connection_size = self._connection_size
+		plan.generation = self._symbol_generation
+		return True
+
+	def _read_plan_compiled(self, plan):
+		""" True if the frames of a ReadPlan are up to date with the connection size and the symbol instances
+		"""
+		return plan.connection_size == self._connection_size and plan.generation == self._symbol_generation
+
+	def _read_plan_frame(self, plan):
+		""" Make the frame function of _send_frames_pipelined for a ReadPlan
+		"""
+		def frame(index, sequence):
+			return plan._patch(index, self._session, self._target_cid, sequence)
+		return frame
+
+	def _parse_read_plan_packet(self, plan, index):
+		""" Extract the result of packet index of a ReadPlan from the last reply
+
+		:return: the tag list, None if the reply does not carry the replies of the services
+		"""
+		tag_list = plan._decode(index, self._reply)
+		if tag_list is None:
+			tag_list = self._parse_read_tag_packet(plan._packets[index][0])
+			if tag_list is not None:
+				plan._learn(index, self._reply)
+		if tag_list:
+			self._last_tag_read = tag_list[-1]
+		return tag_list
+
+	def _merge_read_tag_packets(self, packets, replies):
+		""" Merge the results of the packets of read_tag in the order of the tags
+
+		:param packets: the packets returned by _build_read_tag_packets
+		:param replies: the result of _parse_read_tag_packet for each packet
+		:return: the tag list, with (tag name, None, None) for the tags of the packets without reply
+		"""
+		tag_list = []
+		for (tags, message_request), reply in zip(packets, replies):
+			if reply is None:
+				tag_list.extend((t, None, None) for t in tags)
+			else:
+				tag_list.extend(reply)
+		return tag_list
+
+	@_single_flight(_read_tag_flight, _share_read_tag)
+	@_serialized
 	def read_tag(self, tag):
 		""" read tag from a connected plc
 
@@ -614,6 +1232,15 @@ class Driver(object):
 				- (['ControlWord']) a list with one tag or many
 				- (['parts', 'ControlWord', 'Counts'])
 
+		A list of tags is split in as many Multiple Service Packets as needed to fit the connection size. The packets
+		are sent through send_unit_data_pipelined and the results are returned in the order of the list.
+
+		With attribs['value cache age'], or an age set by set_value_cache_age, the tags read not longer than their age
+		ago are served by the value cache, and only the others are read from the plc.
+
+		It can be called from many threads, like every method of the driver that goes to the plc: a thread asking for
+		the same tags of a read_tag in flight waits for its result instead of sending the request again.
+
 		At the moment there is not a strong validation for the argument passed. The user should verify
 		the correctness of the format passed.
 
@@ -634,116 +1261,98 @@ class Driver(object):
 				self.logger.warning(self._status)
 				return None
 
+		now = _clock()
+		cached = self._use_value_cache()
 		if multi_requests:
-			rp_list = []
-			for t in tag:
-				rp = create_tag_rp(t, multi_requests=True)
-				if rp is None:
-					self._status = (6, "Cannot create tag {0} request packet. read_tag will not be executed.".format(tag))
-					self.logger.warning(self._status)
-					return None
-				else:
-					rp_list.append(chr(TAG_SERVICES_REQUEST['Read Tag']) + rp + pack_uint(1))
-			message_request = build_multiple_service(rp_list, self._get_sequence())
-
-		else:
-			rp = create_tag_rp(tag)
-			if rp is None:
-				self._status = (6, "Cannot create tag {0} request packet. read_tag will not be executed.".format(tag))
-				self.logger.warning(self._status)
+			results, stale = self._value_cache.split(tag, now) if cached else (None, tag)
+			if not stale:
+				return results
+			packets = self._build_read_tag_packets(stale)
+			if packets is None:
 				return None
-			else:
-				# Creating the Message Request Packet
-				message_request = [
-					pack_uint(self._get_sequence()),
-					chr(TAG_SERVICES_REQUEST['Read Tag']),  # the Request Service
-					chr(len(rp) / 2),                       # the Request Path Size length in word
-					rp,                                     # the request path
-					pack_uint(1)
-				]
-
-		self.send_unit_data(
-			build_common_packet_format(
-				DATA_ITEM['Connected'],
-				''.join(message_request),
-				ADDRESS_ITEM['Connection Based'],
-				addr_data=self._target_cid,
-			))
+			replies = [None] * len(packets)
 
-		if multi_requests:
-			return self._parse_multiple_request_read(tag)
-		else:
-			# Get the data type
-			status = unpack_sint(self._reply[48:49])
-			if status == SUCCESS:
-				try:
-					data_type = unpack_uint(self._reply[50:52])
-					return UNPACK_DATA_FUNCTION[I_DATA_TYPE[data_type]](self._reply[52:]), I_DATA_TYPE[data_type]
-				except LookupError:
-					self._status = (6, "Unknown data type returned by read_tag")
-					self.logger.warning(self._status)
-					return None
-			else:
-				ext_status = get_extended_status(self._reply, 48)
-				self._status = (6, "Read Tag status: {0} | Extended Status: {1}".format(SERVICE_STATUS[status], ext_status))
-				self.logger.warning(self._status)
-				return -1, 0
+			def parse(index):
+				replies[index] = self._parse_read_tag_packet(packets[index][0])
 
-	def read_array(self, tag, counts):
-		""" read array of atomic data type from a connected plc
+			self.send_unit_data_pipelined([message_request for tags, message_request in packets], parse)
+			tag_list = self._merge_read_tag_packets(packets, replies)
+			return self._value_cache.merge(results, tag_list, now) if cached else tag_list
 
-		At the moment there is not a strong validation for the argument passed. The user should verify
-		the correctness of the format passed.
+		if cached:
+			value = self._value_cache.get(tag, now)
+			if value is not None:
+				return value
 
-		:param tag: the name of the tag to read
-		:param counts: the number of element to read
+		message_request = self._build_read_tag_request(tag)
+		if message_request is None:
+			return None
+
+		self.send_unit_data(self._connected_message(message_request))
+		return self._cache_read_value(tag, self._parse_read_tag_reply(tag), now)
+
+	@_serialized
+	def read_plan(self, plan):
+		""" read the tags of a ReadPlan from a connected plc
+
+		It is the same of read_tag with the list of tags of the plan, without building the requests at every call. The
+		tags are always read from the plc, the values read are kept by the value cache for read_tag.
+
+		:param plan: the ReadPlan to read
 		:return: None is returned in case of error otherwise the tag list is returned
 		"""
 		if self._session == 0:
-			self._status = (7, "A session need to be registered before to call read_array.")
+			self._status = (6, "A session need to be registered before to call read_plan.")
 			self.logger.warning(self._status)
 			return None
 
 		if not self._target_is_connected:
 			if not self.forward_open():
-				self._status = (7, "Target did not connected. read_tag will not be executed.")
+				self._status = (5, "Target did not connected. read_plan will not be executed.")
 				self.logger.warning(self._status)
 				return None
 
-		self._byte_offset = 0
-		self._last_position = 0
+		if not self._read_plan_compiled(plan) and not self._compile_read_plan(plan):
+			return None
 
-		self._tag_array = []
-		while self._byte_offset != -1:
-			rp = create_tag_rp(tag)
-			if rp is None:
-				self._status = (7, "Cannot create tag {0} request packet. read_tag will not be executed.".format(tag))
-				self.logger.warning(self._status)
-				return None
-			else:
-				# Creating the Message Request Packet
-				message_request = [
-					pack_uint(self._get_sequence()),
-					chr(TAG_SERVICES_REQUEST["Read Tag Fragmented"]),  # the Request Service
-					chr(len(rp) / 2),                                  # the Request Path Size length in word
-					rp,                                                # the request path
-					pack_uint(counts),
-					pack_dint(self._byte_offset)
-				]
-
-			self.send_unit_data(
-				build_common_packet_format(
-					DATA_ITEM['Connected'],
-					''.join(message_request),
-					ADDRESS_ITEM['Connection Based'],
-					addr_data=self._target_cid,
-				))
-
-		status = unpack_sint(self._reply[48:49])
+		replies = [None] * len(plan)
+
+		def parse(index):
+			replies[index] = self._parse_read_plan_packet(plan, index)
+
+		now = _clock()
+		self._send_frames_pipelined(len(plan), self._read_plan_frame(plan), parse)
+		return self._cache_read_values(self._merge_read_tag_packets(plan._packets, replies), now)
+
+	def _build_read_array_request(self, rp, counts):
+		""" Build the Read Tag Fragmented message request for the fragment at self._byte_offset
+
+		:return: the message request
+		"""
+		message_request = [
+			pack_sint(TAG_SERVICES_REQUEST["Read Tag Fragmented"]),  # the Request Service
+			pack_sint(len(rp) // 2),                                # the Request Path Size length in word
+			rp,                                                     # the request path
+			pack_uint(counts),
+			pack_dint(self._byte_offset)
+		]
+		return b''.join(message_request)
+
+	def _parse_read_array_reply(self):
+		""" Extract the result of read_array from the last reply
+
+		:return: the value of read_array
+		"""
+		status = unpack_sint_from(self._reply, 48)
 		if status == SUCCESS:
 			# Get the data type
-			data_type = unpack_uint(self._reply[50:52])
+			data_type = unpack_uint_from(self._reply, 50)
 			try:
+				if self._array_bytes is not None:
+					typ = I_DATA_TYPE[data_type]
+					if typ == 'STRUCT':
+						return self._struct_records(unpack_uint_from(self._reply, 52)), typ
+					return numpy.frombuffer(self._array_bytes, dtype=DATA_DTYPE[typ]), typ
 				return self._tag_array, I_DATA_TYPE[data_type]
 			except LookupError:
 				self._status = (6, "Unknown data type returned by read_array {0} {1}".format(status, data_type))
@@ -755,22 +1364,338 @@ class Driver(object):
 			self.logger.warning(self._status)
 			return -1, 0
 
-		#return self._tag_list
+	def _check_numpy(self, ndarray, method):
+		""" Check that numpy is installed if ndarray is asked
 
-	def write_tag(self, tag, value=None, typ=None):
-		""" write tag/tags from a connected plc
+		:return: False if method cannot be executed
+		"""
+		if ndarray and numpy is None:
+			self._status = (7, "numpy is not installed. {0} will not be executed.".format(method))
+			self.logger.warning(self._status)
+			return False
+		return True
 
-		Possible combination can be passed to this method:
-				- ('tag name', Value, data type)  as single parameters or inside a tuple
-				- ([('tag name', Value, data type), ('tag name2', Value, data type)]) as array of tuples
+	def _start_read_array(self, ndarray):
+		""" Reset the state used by _parse_fragment for a new read_array
 
-		At the moment there is not a strong validation for the argument passed. The user should verify
-		the correctness of the format passed.
+		:return: False if ndarray is asked and numpy is not installed
+		"""
+		if not self._check_numpy(ndarray, 'read_array'):
+			return False
+		self._byte_offset = 0
+		self._last_position = 0
+		self._tag_array = []
+		self._array_bytes = bytearray() if ndarray else None
+		return True
 
-		The type accepted are:
-			- BOOL
-			- SINT
-			- INT
+	def _struct_dtype(self, struct_handle):
+		""" The numpy dtype of the structures of an array read with ndarray
+
+		:return: the dtype, None if the template of the structure has not been read by get_udt_codec
+		"""
+		codec = self._udt_codecs.get(self._template_cache.struct_handles.get(struct_handle))
+		if codec is None or codec.dtype is None:
+			self._status = (6, "Structure handle {0} unknown. Call get_udt_codec before read_array.".format(struct_handle))
+			self.logger.warning(self._status)
+			return None
+		return codec.dtype
+
+	def _struct_records(self, struct_handle):
+		""" Make the record array of the structures collected by read_array
+
+		:return: the record array, None if the template of the structure has not been read by get_udt_codec
+		"""
+		dtype = self._struct_dtype(struct_handle)
+		if dtype is None:
+			return None
+		return numpy.frombuffer(self._array_bytes, dtype=dtype).view(numpy.recarray)
+
+	@_single_flight(_read_array_flight, _share_read_array)
+	@_serialized
+	def read_array(self, tag, counts, ndarray=False):
+		""" read array of atomic data type from a connected plc
+
+		At the moment there is not a strong validation for the argument passed. The user should verify
+		the correctness of the format passed.
+
+		:param tag: the name of the tag to read
+		:param counts: the number of element to read
+		:param ndarray: if True the values are returned as a numpy.ndarray of the data type read, made over the bytes
+						received without decoding them one by one. It needs numpy. An array of structures is returned
+						as a record array with the dtype of the UdtCodec of the structure, which get_udt_codec must
+						have compiled before.
+
+		It can be called from many threads: a thread asking for no more elements of the same tag of a read_array in
+		flight waits for its result, and gets its first counts elements, instead of sending the requests again.
+
+		:return: None is returned in case of error otherwise the tag list is returned
+		"""
+		if self._session == 0:
+			self._status = (7, "A session need to be registered before to call read_array.")
+			self.logger.warning(self._status)
+			return None
+
+		if not self._target_is_connected:
+			if not self.forward_open():
+				self._status = (7, "Target did not connected. read_tag will not be executed.")
+				self.logger.warning(self._status)
+				return None
+
+		rp = self._create_tag_rp(tag)
+		if rp is None:
+			self._status = (7, "Cannot create tag {0} request packet. read_tag will not be executed.".format(tag))
+			self.logger.warning(self._status)
+			return None
+
+		if not self._start_read_array(ndarray):
+			return None
+
+		while self._byte_offset != -1:
+			self.send_unit_data(self._connected_message(self._build_read_array_request(rp, counts)))
+
+		return self._parse_read_array_reply()
+
+	@_serialized
+	def _read_array_fragment(self, rp, counts, byte_offset, ndarray):
+		""" Read the fragment of iter_array at byte_offset
+
+		All the state used by _parse_fragment is set here, so the fragments of iter_array do not depend on what the
+		other requests left in it between two fragments.
+
+		:return: see _parse_array_fragment
+		"""
+		self._byte_offset = byte_offset
+		self._last_position = 0
+		self._tag_array = []
+		self._array_bytes = bytearray() if ndarray else None
+		if not self.send_unit_data(self._connected_message(self._build_read_array_request(rp, counts))):
+			return None
+		return self._parse_array_fragment()
+
+	def _parse_array_fragment(self):
+		""" Extract the fragment of iter_array from the last reply
+
+		:return: (values, data type, dtype, byte offset of the next fragment or -1 after the last one), None in case
+				 of error. values is the list of the values, or the bytearray of the data with ndarray, and dtype the
+				 numpy dtype of the elements with ndarray.
+		"""
+		status = unpack_sint_from(self._reply, 48)
+		if status not in (SUCCESS, 0x06):
+			ext_status = get_extended_status(self._reply, 48)
+			self._status = (6, "Read Tag status: {0} | Extended Status: {1}".format(SERVICE_STATUS[status], ext_status))
+			self.logger.warning(self._status)
+			return None
+		data_type = unpack_uint_from(self._reply, 50)
+		typ = I_DATA_TYPE.get(data_type)
+		if typ is None:
+			self._status = (6, "Unknown data type returned by iter_array {0}".format(data_type))
+			self.logger.warning(self._status)
+			return None
+		if self._array_bytes is None:
+			return self._tag_array, typ, None, self._byte_offset
+		if typ == 'STRUCT':
+			dtype = self._struct_dtype(unpack_uint_from(self._reply, 52))
+			if dtype is None:
+				return None
+		else:
+			dtype = numpy.dtype(DATA_DTYPE[typ])
+		return self._array_bytes, typ, dtype, self._byte_offset
+
+	@staticmethod
+	def _split_array_chunks(buffer, typ, dtype, chunk_size, last):
+		""" Take from the front of buffer the chunks that iter_array yields
+
+		:param buffer: the list of values, or the bytearray of the data with ndarray, received and not yet yielded
+		:param chunk_size: the number of elements per chunk, None to take all the elements received
+		:param last: True after the last fragment, to take the incomplete chunk too
+		:return: the list of the chunks
+		"""
+		if dtype is not None:
+			size = dtype.itemsize
+		elif typ == 'STRUCT':
+			# The data of the structures stays as read_array returns it, one bytes per fragment
+			chunk_size = None
+			size = 1
+		else:
+			size = 1
+		chunks = []
+		start = 0
+		while True:
+			available = (len(buffer) - start) // size
+			take = min(available, chunk_size or available)
+			if take == 0 or (chunk_size and take < chunk_size and not last):
+				break
+			end = start + take * size
+			if dtype is None:
+				chunks.append(buffer[start:end])
+			elif typ == 'STRUCT':
+				chunks.append(numpy.frombuffer(bytes(buffer[start:end]), dtype=dtype).view(numpy.recarray))
+			else:
+				chunks.append(numpy.frombuffer(bytes(buffer[start:end]), dtype=dtype))
+			start = end
+		del buffer[:start]
+		return chunks
+
+	def iter_array(self, tag, counts, chunk_size=None, ndarray=False):
+		""" read array from a connected plc yielding the values while the fragments arrive
+
+		Unlike read_array, the values are not collected until the last fragment: a chunk is yielded as soon as it is
+		complete and only the elements of an incomplete chunk are kept in between, so an array of any size is read
+		with constant memory. The driver can be used by other requests between two chunks.
+
+		:param tag: the name of the tag to read
+		:param counts: the number of element to read
+		:param chunk_size: the number of elements of each chunk, the last one can be shorter. None to yield the
+						   elements of each fragment as they arrive. It is ignored for the arrays of structures read
+						   without ndarray, whose data comes one bytes per fragment as in read_array.
+		:param ndarray: if True each chunk is a numpy.ndarray, or a record array for the structures, like in read_array
+		:return: a generator of (chunk, data type). It stops early in case of error, with the error in the status.
+		"""
+		if self._session == 0:
+			self._status = (7, "A session need to be registered before to call iter_array.")
+			self.logger.warning(self._status)
+			return
+
+		if not self._target_is_connected:
+			if not self.forward_open():
+				self._status = (7, "Target did not connected. iter_array will not be executed.")
+				self.logger.warning(self._status)
+				return
+
+		rp = self._create_tag_rp(tag)
+		if rp is None:
+			self._status = (7, "Cannot create tag {0} request packet. iter_array will not be executed.".format(tag))
+			self.logger.warning(self._status)
+			return
+
+		if not self._check_numpy(ndarray, 'iter_array'):
+			return
+
+		buffer = bytearray() if ndarray else []
+		byte_offset = 0
+		while byte_offset != -1:
+			fragment = self._read_array_fragment(rp, counts, byte_offset, ndarray)
+			if fragment is None:
+				return
+			values, typ, dtype, byte_offset = fragment
+			buffer += values
+			for chunk in self._split_array_chunks(buffer, typ, dtype, chunk_size, byte_offset == -1):
+				yield chunk, typ
+
+	def _build_write_tag_packets(self, tags):
+		""" Build the Multiple Service Packets of write_tag with a list of tags
+
+		The list is split by plan_multiple_service to fit the connection size. The tags whose value cannot be packed
+		in their data type are removed from the list.
+
+		:return: a list of (tags, message request), one for each packet, None if a request path cannot be created
+		"""
+		rp_list = []
+		tag_to_remove = []
+		for idx, (name, value, typ) in enumerate(tags):
+			# Create the request path to wrap the tag name
+			rp = self._create_tag_rp(name, multi_requests=True)
+			if rp is None:
+				self._status = (8, "Cannot create tag{0} req. packet. write_tag will not be executed".format(tags))
+				self.logger.warning(self._status)
+				return None
+			try:    # Trying to add the rp to the request path list
+				val = PACK_DATA_FUNCTION[typ](value)
+				rp_list.append(
+					pack_sint(TAG_SERVICES_REQUEST['Write Tag'])
+					+ rp
+					+ pack_uint(S_DATA_TYPE[typ])
+					+ pack_uint(1)
+					+ val
+				)
+			except (LookupError, struct.error) as e:
+				self._status = (8, "Tag:{0} type:{1} removed from write list. Error:{2}.".format(name, typ, e))
+				self.logger.warning(self._status)
+
+				# The tag in idx position need to be removed from the list because has some kind of error
+				tag_to_remove.append(idx)
+
+		# Remove the tags that have not been inserted in the request path list, from the last one
+		for position in reversed(tag_to_remove):
+			del tags[position]
+		# The reply to a Write Tag service is its header only
+		reply_sizes = [4] * len(rp_list)
+		return [(tags[start:end], b''.join(build_multiple_service(rp_list[start:end])))
+				for start, end in plan_multiple_service(rp_list, reply_sizes, self._connection_size)]
+
+	def _parse_write_tag_packet(self, tags):
+		""" Extract the result of one packet built by _build_write_tag_packets from the last reply
+
+		:return: the tag list, None if the reply does not carry the replies of the services
+		"""
+		if self._reply is None or \
+				unpack_sint_from(self._reply, 46) != I_TAG_SERVICES_REPLY['Multiple Service Packet'] or \
+				unpack_sint_from(self._reply, 48) not in (SUCCESS, 0x1e):
+			return None
+		return self._parse_multiple_request_write(tags)
+
+	def _merge_write_tag_packets(self, packets, replies):
+		""" Merge the results of the packets of write_tag in the order of the tags
+
+		:param packets: the packets returned by _build_write_tag_packets
+		:param replies: the result of _parse_write_tag_packet for each packet
+		:return: the tag list, with the tags of the packets without reply as BAD
+		"""
+		tag_list = []
+		for (tags, message_request), reply in zip(packets, replies):
+			if reply is None:
+				tag_list.extend(t + ('BAD',) for t in tags)
+			else:
+				tag_list.extend(reply)
+		return tag_list
+
+	def _build_write_tag_request(self, tag, value, typ):
+		""" Build the message request of write_tag with a single tag
+
+		:return: the message request, None if a request path cannot be created
+		"""
+		if isinstance(tag, tuple):
+			name, value, typ = tag
+		else:
+			name = tag
+
+		rp = self._create_tag_rp(name)
+		if rp is None:
+			self._status = (8, "Cannot create tag {0} request packet. write_tag will not be executed.".format(tag))
+			self.logger.warning(self._status)
+			return None
+		# Creating the Message Request Packet
+		message_request = [
+			pack_sint(TAG_SERVICES_REQUEST["Write Tag"]),   # the Request Service
+			pack_sint(len(rp) // 2),        # the Request Path Size length in word
+			rp,                             # the request path
+			pack_uint(S_DATA_TYPE[typ]),    # data type
+			pack_uint(1),                    # Add the number of tag to write
+			PACK_DATA_FUNCTION[typ](value)
+		]
+		return b''.join(message_request)
+
+	@_serialized
+	def write_tag(self, tag, value=None, typ=None):
+		""" write tag/tags from a connected plc
+
+		Possible combination can be passed to this method:
+				- ('tag name', Value, data type)  as single parameters or inside a tuple
+				- ([('tag name', Value, data type), ('tag name2', Value, data type)]) as array of tuples
+
+		A list of tags is split in as many Multiple Service Packets as needed to fit the connection size. The packets
+		are sent through send_unit_data_pipelined and the results are returned in the order of the list. The tags
+		whose value cannot be packed in their data type are removed from the list.
+
+		The value cache keeps the values written, and drops the values of the tags that could not be written.
+
+		At the moment there is not a strong validation for the argument passed. The user should verify
+		the correctness of the format passed.
+
+		The type accepted are:
+			- BOOL
+			- SINT
+			- INT
 			- DINT
 			- REAL
 			- LINT
@@ -800,77 +1725,67 @@ class Driver(object):
 				return None
 
 		if multi_requests:
-			rp_list = []
-			tag_to_remove = []
-			idx = 0
-			for name, value, typ in tag:
-				# Create the request path to wrap the tag name
-				rp = create_tag_rp(name, multi_requests=True)
-				if rp is None:
-					self._status = (8, "Cannot create tag{0} req. packet. write_tag will not be executed".format(tag))
-					self.logger.warning(self._status)
-					return None
-				else:
-					try:    # Trying to add the rp to the request path list
-						val = PACK_DATA_FUNCTION[typ](value)
-						rp_list.append(
-							chr(TAG_SERVICES_REQUEST['Write Tag'])
-							+ rp
-							+ pack_uint(S_DATA_TYPE[typ])
-							+ pack_uint(1)
-							+ val
-						)
-						idx += 1
-					except (LookupError, struct.error) as e:
-						self._status = (8, "Tag:{0} type:{1} removed from write list. Error:{2}.".format(name, typ, e))
-						self.logger.warning(self._status)
+			packets = self._build_write_tag_packets(tag)
+			if packets is None:
+				return None
+			replies = [None] * len(packets)
 
-						# The tag in idx position need to be removed from the rp list because has some kind of error
-						tag_to_remove.append(idx)
+			def parse(index):
+				replies[index] = self._parse_write_tag_packet(packets[index][0])
 
-			# Remove the tags that have not been inserted in the request path list
-			for position in tag_to_remove:
-				del tag[position]
-			# Create the message request
-			message_request = build_multiple_service(rp_list, self._get_sequence())
+			self.send_unit_data_pipelined([message_request for tags, message_request in packets], parse)
+			return self._cache_written_values(self._merge_write_tag_packets(packets, replies))
 
-		else:
-			if isinstance(tag, tuple):
-				name, value, typ = tag
-			else:
-				name = tag
+		message_request = self._build_write_tag_request(tag, value, typ)
+		if message_request is None:
+			return None
 
-			rp = create_tag_rp(name)
-			if rp is None:
-				self._status = (8, "Cannot create tag {0} request packet. write_tag will not be executed.".format(tag))
-				self.logger.warning(self._statustag)
-				return None
-			else:
-				# Creating the Message Request Packet
-				message_request = [
-					pack_uint(self._get_sequence()),
-					chr(TAG_SERVICES_REQUEST["Write Tag"]),   # the Request Service
-					chr(len(rp) / 2),               # the Request Path Size length in word
-					rp,                             # the request path
-					pack_uint(S_DATA_TYPE[typ]),    # data type
-					pack_uint(1),                    # Add the number of tag to write
-					PACK_DATA_FUNCTION[typ](value)
-				]
-
-		ret_val = self.send_unit_data(
-			build_common_packet_format(
-				DATA_ITEM['Connected'],
-				''.join(message_request),
-				ADDRESS_ITEM['Connection Based'],
-				addr_data=self._target_cid,
-			)
-		)
+		ret_val = self.send_unit_data(self._connected_message(message_request))
+		self._cache_written_value(tag, value, typ, ret_val)
+		return ret_val
 
-		if multi_requests:
-			return self._parse_multiple_request_write(tag)
+	def _build_write_array_fragments(self, tag, data_type, values):
+		""" Build the Write Tag Fragmented message requests needed to write values
+
+		The values of a numpy.ndarray are sent from its buffer, converted to the data type only if needed.
+
+		:return: the list of message requests, None if the request path cannot be created
+		"""
+		rp = self._create_tag_rp(tag)
+		if rp is None:
+			self._status = (9, "Cannot create tag {0} request packet. \
+				write_array will not be executed.".format(tag))
+			self.logger.warning(self._status)
+			return None
+
+		if _is_ndarray(values):
+			values = numpy.ascontiguousarray(values, dtype=DATA_DTYPE[data_type]).ravel()
+			number_of_elements = values.size
+			array_of_values = values.view(numpy.uint8)
 		else:
-			return ret_val
+			number_of_elements = len(values)
+			array_of_values = b''.join([PACK_DATA_FUNCTION[data_type](value) for value in values])
 
+		fragments = []
+		element_size = DATA_FUNCTION_SIZE[data_type]
+		# What is left of the connection size after sequence count, service, path, data type, elements and offset
+		fragment_size = max(1, (self._connection_size - len(rp) - 12) // element_size) * element_size
+
+		for byte_offset in range(0, len(array_of_values), fragment_size):
+			# Creating the Message Request Packet of the fragment
+			message_request = [
+				pack_sint(TAG_SERVICES_REQUEST["Write Tag Fragmented"]),  # the Request Service
+				pack_sint(len(rp) // 2),                                 # the Request Path Size length in word
+				rp,                                                      # the request path
+				pack_uint(S_DATA_TYPE[data_type]),                       # Data type to write
+				pack_uint(number_of_elements),                           # Number of elements to write
+				pack_dint(byte_offset),
+				array_of_values[byte_offset:byte_offset+fragment_size]   # Fragment of elements to write
+			]
+			fragments.append(b''.join(message_request))
+		return fragments
+
+	@_serialized
 	def write_array(self, tag, data_type, values):
 		""" write array of atomic data type from a connected plc
 
@@ -879,9 +1794,9 @@ class Driver(object):
 
 		:param tag: the name of the tag to read
 		:param data_type: the type of tag to write
-		:param values: the array of values to write
+		:param values: the array of values to write, a list or a numpy.ndarray
 		"""
-		if not isinstance(values, list):
+		if not isinstance(values, list) and not _is_ndarray(values):
 			self._status = (9, "A list of tags must be passed to write_array.")
 			self.logger.warning(self._status)
 			return None
@@ -897,49 +1812,115 @@ class Driver(object):
 				self.logger.warning(self._status)
 				return None
 
-		array_of_values = ""
-		byte_size = 0
-		byte_offset = 0
+		fragments = self._build_write_array_fragments(tag, data_type, values)
+		if fragments is None:
+			return None
 
-		for i, value in enumerate(values):
-			array_of_values += PACK_DATA_FUNCTION[data_type](value)
-			byte_size += DATA_FUNCTION_SIZE[data_type]
+		# Each fragment carries its own byte offset, so they can be in flight together
+		self.send_unit_data_pipelined(fragments)
+		self._value_cache.invalidate(tag)
 
-			if byte_size >= 450 or i == len(values)-1:
-				# create the message and send the fragment
-				rp = create_tag_rp(tag)
-				if rp is None:
-					self._status = (9, "Cannot create tag {0} request packet. \
-						write_array will not be executed.".format(tag))
-					self.logger.warning(self._status)
-					return None
-				else:
-					# Creating the Message Request Packet
-					message_request = [
-						pack_uint(self._get_sequence()),
-						chr(TAG_SERVICES_REQUEST["Write Tag Fragmented"]),  # the Request Service
-						chr(len(rp) / 2),                                   # the Request Path Size length in word
-						rp,                                                 # the request path
-						pack_uint(S_DATA_TYPE[data_type]),                  # Data type to write
-						pack_uint(len(values)),                             # Number of elements to write
-						pack_dint(byte_offset),
-						array_of_values                                     # Fragment of elements to write
-					]
-					byte_offset += byte_size
-
-				self.send_unit_data(
-					build_common_packet_format(
-						DATA_ITEM['Connected'],
-						''.join(message_request),
-						ADDRESS_ITEM['Connection Based'],
-						addr_data=self._target_cid,
-					))
-				array_of_values = ""
-				byte_size = 0
-
-	def get_tag_list(self):
+	def _build_tag_list_request(self):
+		""" Build the Get Instance Attribute List message request starting from self._last_instance
+
+		:return: the message request
+		"""
+		message_request = [
+			pack_sint(TAG_SERVICES_REQUEST['Get Instance Attribute List']),
+			# the Request Path Size length in word
+			pack_sint(3),
+			# Request Path ( 20 6B 25 00 Instance )
+			CLASS_ID["8-bit"],       # Class id = 20 from spec 0x20
+			CLASS_CODE["Symbol Object"],  # Logical segment: Symbolic Object 0x6B
+			INSTANCE_ID["16-bit"],   # Instance Segment: 16 Bit instance 0x25
+			b'\x00',
+			pack_uint(self._last_instance),          # The instance
+			# Request Data
+			pack_uint(4),   # Number of attributes to retrieve
+			pack_uint(1),   # Attribute 1: Symbol name
+			pack_uint(2),    # Attribute 2: Symbol type
+			pack_uint(3),  # Attribute 3: ?
+			pack_uint(8)  # Attribute 8: Array dimensions
+		]
+		return b''.join(message_request)
+
+	@_serialized
+	def _read_tag_list_page(self, instance, skip_system, skip_programs):
+		""" Read the page of the tag list starting at instance
+
+		:return: (the tags of the page, the instance where the next page starts or -1 after the last page), None in
+				 case of error
+		"""
+		self._last_instance = instance
+		self._tag_page = []
+		self._tag_list_filter = (skip_system, skip_programs)
+		try:
+			if not self.send_unit_data(self._connected_message(self._build_tag_list_request())):
+				return None
+		finally:
+			self._tag_list_filter = (False, False)
+		return self._tag_page, self._last_instance
+
+	def _clear_symbol_instances(self):
+		""" Forget the instances and the symbol types of the tags, before the tag list is read or loaded again
+		"""
+		self._symbol_instances = {}
+		self._symbol_types = {}
+		self._symbol_generation += 1
+
+	def _add_symbol_instances(self, tags):
+		""" Keep the instances of the controller scope tags for attribs['symbol instance addressing'], and their
+		symbol types for the reply sizes of read_tag
+
+		The ReadPlan compiled with the instances known before are built again.
+		"""
+		self._symbol_generation += 1
+		for tag in tags:
+			if not tag['tag_name'].startswith('Program:'):
+				self._symbol_instances[tag['tag_name']] = tag['instance_id']
+				self._symbol_types[tag['tag_name']] = tag['symbol_type']
+
+	def iter_tag_list(self, skip_system=False, skip_programs=False):
+		""" get the tags in the plc one page at a time
+
+		Each page is the list of the tags of one Get Instance Attribute List reply, yielded as soon as it arrives.
+		Nothing is kept between the pages, so the tags of any controller are enumerated with constant memory; for the
+		same reason the tags are not recorded for attribs['symbol instance addressing'], which needs get_tag_list.
+
+		:param skip_system: if True the system tags and the tags whose name starts with '__' are left out
+		:param skip_programs: if True the 'Program:' entries are left out
+		:return: a generator of lists of tags, as in get_tag_list. It stops early in case of error.
+		"""
+		if self._session == 0:
+			self._status = (10, "A session need to be registered before to call iter_tag_list.")
+			self.logger.warning(self._status)
+			return
+
+		if not self._target_is_connected:
+			if not self.forward_open():
+				self._status = (10, "Target did not connected. iter_tag_list will not be executed.")
+				self.logger.warning(self._status)
+				return
+
+		instance = 0
+		while instance != -1:
+			page = self._read_tag_list_page(instance, skip_system, skip_programs)
+			if page is None:
+				return
+			tags, instance = page
+			yield tags
+
+	@_serialized
+	def get_tag_list(self, skip_system=False, skip_programs=False):
 		""" get a list of the tags in the plc
 
+		Each tag is a dictionary with instance_id, tag_name, symbol_type, attr_3 and array_dimensions, the list of the
+		sizes of the dimensions of an array tag, empty for the other tags. Every call reads the list again.
+
+		If a page cannot be read the tags read before it are returned, and the status tells that the list is partial.
+
+		:param skip_system: if True the system tags and the tags whose name starts with '__' are left out
+		:param skip_programs: if True the 'Program:' entries are left out
 		"""
 
 		if self._session == 0:
@@ -953,66 +1934,71 @@ class Driver(object):
 				self.logger.warning(self._status)
 				return None
 
-		self._last_instance = 0
-
-		while self._last_instance != -1:
-
-			# Creating the Message Request Packet
+		self._tag_list = []
+		# The instances of the tags deleted from the plc can be taken by other tags
+		self._clear_symbol_instances()
+		instance = 0
+		while instance != -1:
+			page = self._read_tag_list_page(instance, skip_system, skip_programs)
+			if page is None:
+				self._tag_list_partial()
+				break
+			tags, instance = page
+			self._tag_list.extend(tags)
+			self._add_symbol_instances(tags)
 
-			message_request = [
-				pack_uint(self._get_sequence()),
-				chr(TAG_SERVICES_REQUEST['Get Instance Attribute List']),
-				# the Request Path Size length in word
-				chr(3),
-				# Request Path ( 20 6B 25 00 Instance )
-				CLASS_ID["8-bit"],       # Class id = 20 from spec 0x20
-				CLASS_CODE["Symbol Object"],  # Logical segment: Symbolic Object 0x6B
-				INSTANCE_ID["16-bit"],   # Instance Segment: 16 Bit instance 0x25
-				'\x00',
-				pack_uint(self._last_instance),          # The instance
-				# Request Data
-				pack_uint(3),   # Number of attributes to retrieve
-				pack_uint(1),   # Attribute 1: Symbol name
-				pack_uint(2),    # Attribute 2: Symbol type
-				pack_uint(3)  # Attribute 3: ?
-			]
+		return self._tag_list
 
-			self.send_unit_data(
-				build_common_packet_format(
-					DATA_ITEM['Connected'],
-					''.join(message_request),
-					ADDRESS_ITEM['Connection Based'],
-					addr_data=self._target_cid,
-				))
+	def _tag_list_partial(self):
+		""" Report that get_tag_list stopped at a page that cannot be read
+		"""
+		self._status = (10, "get_tag_list read {0} tags only, a page failed: {1}".format(len(self._tag_list),
+																							 self._status))
+		self.logger.warning(self._status)
 
-		return self._tag_list
+	def get_symbol_table(self, skip_system=False, skip_programs=False):
+		""" get the tags in the plc as a SymbolTable
 
-	def get_tag_struct(self, instance_id):
-		""" get the structure of a tag in the plc
+		The tags are added to the table page by page, without the dictionaries of get_tag_list. Like iter_tag_list, it
+		does not record the tags for attribs['symbol instance addressing'].
 
+		:param skip_system: if True the system tags and the tags whose name starts with '__' are left out
+		:param skip_programs: if True the 'Program:' entries are left out
+		:return: the SymbolTable, None in case of error
 		"""
-
 		if self._session == 0:
-			self._status = (10, "A session need to be registered before to call get_tag_list.")
+			self._status = (10, "A session need to be registered before to call get_symbol_table.")
 			self.logger.warning(self._status)
 			return None
 
 		if not self._target_is_connected:
 			if not self.forward_open():
-				self._status = (10, "Target did not connected. get_tag_list will not be executed.")
+				self._status = (10, "Target did not connected. get_symbol_table will not be executed.")
 				self.logger.warning(self._status)
 				return None
 
-		# Creating the Message Request Packet
+		table = SymbolTable()
+		instance = 0
+		while instance != -1:
+			page = self._read_tag_list_page(instance, skip_system, skip_programs)
+			if page is None:
+				return None
+			tags, instance = page
+			table.extend(tags)
+		return table
 
+	def _build_tag_struct_request(self, instance_id):
+		""" Build the Get Attribute List message request for the template instance_id
+
+		:return: the message request
+		"""
 		message_request = [
-			pack_uint(self._get_sequence()),
-			chr(TAG_SERVICES_REQUEST['Get Attribute List']),  # the Request Path Size length in word
-			chr(3),  # Request Path ( 20 6B 25 00 Instance )
+			pack_sint(TAG_SERVICES_REQUEST['Get Attribute List']),  # the Request Path Size length in word
+			pack_sint(3),  # Request Path ( 20 6B 25 00 Instance )
 			CLASS_ID["8-bit"],  # Class id = 20 from spec 0x20
 			CLASS_CODE["Template Object"],  # Logical segment: Template Object 0x6C
 			INSTANCE_ID["16-bit"],  # Instance Segment: 16 Bit instance 0x25
-			'\x00',
+			b'\x00',
 			pack_uint(instance_id),  # self._last_instance),  # The instance  # Request Data
 			pack_uint(4),  # Number of attributes to retrieve
 			pack_uint(4),  # Attribute 4: Template Object Definition Size
@@ -1020,69 +2006,70 @@ class Driver(object):
 			pack_uint(2),  # Attribute 2: Member Count
 			pack_uint(1)  # Attribute 1: Structure Handle
 		]
+		return b''.join(message_request)
 
-		self.send_unit_data(
-			build_common_packet_format(
-				DATA_ITEM['Connected'],
-				''.join(message_request),
-				ADDRESS_ITEM['Connection Based'],
-				addr_data=self._target_cid,
-			))
+	def get_tag_struct(self, instance_id):
+		""" get the structure of a tag in the plc
 
-		return self._tag_struct
+		The attributes are read once per template, then taken from the template cache. A thread asking for the
+		attributes another thread is reading waits for them instead of reading them again.
+		"""
+		return self._template_cache.lookup('struct', instance_id, functools.partial(self._read_tag_struct, instance_id),
+										   self._lock_owner is not threading.current_thread())
 
-	def read_template(self, instance_id, to_read, mem_cnt):
-		""" get a list of the members of a template
+	@_serialized
+	def _read_tag_struct(self, instance_id):
+		""" Read the attributes of a template for get_tag_struct
 
+		:return: the attributes, or None, and True if they are complete
 		"""
-
 		if self._session == 0:
 			self._status = (10, "A session need to be registered before to call get_tag_list.")
 			self.logger.warning(self._status)
-			return None
+			return None, False
 
 		if not self._target_is_connected:
 			if not self.forward_open():
 				self._status = (10, "Target did not connected. get_tag_list will not be executed.")
 				self.logger.warning(self._status)
-				return None
+				return None, False
 
-		self._last_instance = 0
-		self._template_buffer = ""
+		self._tag_struct = {}
+		self.send_unit_data(self._connected_message(self._build_tag_struct_request(instance_id)))
+		return self._tag_struct, self._tag_struct_read(self._tag_struct)
 
-		while self._last_instance != -1:
-			# Creating the Message Request Packet
+	def _build_read_template_request(self, instance_id, to_read):
+		""" Build the Read Template message request starting from the offset self._last_instance
 
-			message_request = [
-				pack_uint(self._get_sequence()),
-				chr(TAG_SERVICES_REQUEST['Read Template']),  # the Request Path Size length in word
-				chr(3),  # Request Path ( 20 6B 25 00 Instance )
-				CLASS_ID["8-bit"],  # Class id = 20 from spec 0x20
-				CLASS_CODE["Template Object"],  # Logical segment: Template Object 0x6C
-				INSTANCE_ID["16-bit"],  # Instance Segment: 16 Bit instance 0x25
-				'\x00',
-				pack_uint(instance_id), #self._last_instance),  # The instance  # Request Data
-				pack_dint(self._last_instance),  # Offset
-				pack_uint(to_read - self._last_instance),  # Attribute 1: Symbol name
-			]
+		:return: the message request
+		"""
+		message_request = [
+			pack_sint(TAG_SERVICES_REQUEST['Read Template']),  # the Request Path Size length in word
+			pack_sint(3),  # Request Path ( 20 6B 25 00 Instance )
+			CLASS_ID["8-bit"],  # Class id = 20 from spec 0x20
+			CLASS_CODE["Template Object"],  # Logical segment: Template Object 0x6C
+			INSTANCE_ID["16-bit"],  # Instance Segment: 16 Bit instance 0x25
+			b'\x00',
+			pack_uint(instance_id), #self._last_instance),  # The instance  # Request Data
+			pack_dint(self._last_instance),  # Offset
+			pack_uint(to_read - self._last_instance),  # Attribute 1: Symbol name
+		]
+		return b''.join(message_request)
 
-			self.send_unit_data(
-				build_common_packet_format(
-					DATA_ITEM['Connected'],
-					''.join(message_request),
-					ADDRESS_ITEM['Connection Based'],
-					addr_data=self._target_cid,
-				))
+	def _parse_template_members(self, mem_cnt):
+		""" Extract name and members of the template from the data collected in self._template_buffer
 
+		:return: the template
+		"""
 		member = 0
 		idx = 0
 		template_returned = self._template_buffer
 		template_members = []
 		try:
 			while member < mem_cnt:
-				info = unpack_uint(template_returned[idx:idx + 2])
+				info = unpack_uint_from(template_returned, idx)
 				idx += 2
-				symbol_type = unpack_uint(template_returned[idx:idx + 2])
+				symbol_type = unpack_uint_from(template_returned, idx)
 				dimensions = (symbol_type & 0b0110000000000000) >> 13
 				data_type = symbol_type & 0b0000111111111111
 				tag_type = 'atomic'
@@ -1091,36 +2078,342 @@ class Driver(object):
 				else:
 					data_type = I_DATA_TYPE[data_type]
 				idx += 2
-				offset = unpack_dint(template_returned[idx:idx + 4])
+				offset = unpack_dint_from(template_returned, idx)
 				idx += 4
 				template_members.append({'info': info, 'tag_type': tag_type, 'data_type': data_type, 'dimensions': dimensions, 'offset': offset})
 				member += 1
 
 			member = 0
-			names = template_returned[idx:].split('\x00')
+			names = template_returned[idx:].split(b'\x00')
 			if len(names) < mem_cnt + 1:
 				err = "Failed to read member names {" + str(len(names)) + "} {" + str(mem_cnt + 1) + "}."
 				raise Exception(err)
 
 			while member < mem_cnt:
 				# template_members[member]['member_name'] = names[member + 1]
-				template_members[member]['tag_name'] = names[member + 1]
+				template_members[member]['tag_name'] = to_str(names[member + 1])
 				member += 1
 
-			self._tag_template = {'name': names[0], 'members': template_members}
+			self._tag_template = {'name': to_str(names[0]), 'members': template_members}
 		except Exception as e:
 			self._status = (1, "Error :{0} inside read_template during parsing of template".format(e))
 			self.logger.warning(self._status)
 
 		return self._tag_template
 
+	def read_template(self, instance_id, to_read, mem_cnt):
+		""" get a list of the members of a template
+
+		The template is read once, then taken from the template cache. A thread asking for the template another thread
+		is reading waits for it instead of reading it again.
+		"""
+		return self._template_cache.lookup('template', instance_id,
+										   functools.partial(self._read_template, instance_id, to_read, mem_cnt),
+										   self._lock_owner is not threading.current_thread())
+
+	@_serialized
+	def _read_template(self, instance_id, to_read, mem_cnt):
+		""" Read a template for read_template
+
+		:return: the template, or None, and True if it is complete
+		"""
+		if self._session == 0:
+			self._status = (10, "A session need to be registered before to call get_tag_list.")
+			self.logger.warning(self._status)
+			return None, False
+
+		if not self._target_is_connected:
+			if not self.forward_open():
+				self._status = (10, "Target did not connected. get_tag_list will not be executed.")
+				self.logger.warning(self._status)
+				return None, False
+
+		self._tag_template = {}
+		self._last_instance = 0
+		self._template_buffer = b""
+		self._reading_template = True
+
+		while self._last_instance != -1:
+			self.send_unit_data(self._connected_message(self._build_read_template_request(instance_id, to_read)))
+		self._reading_template = False
+
+		template = self._parse_template_members(mem_cnt)
+		return template, self._template_read(template, mem_cnt)
+
+	def _tag_struct_read(self, tag_struct):
+		""" True if tag_struct is a complete reply of get_tag_struct
+		"""
+		return isinstance(tag_struct, dict) and \
+			all(key in tag_struct for key in ('obj_def_size', 'struct_size', 'member_cnt', 'struct_handle'))
+
+	def _template_read(self, template, mem_cnt):
+		""" True if template is a complete reply of read_template
+		"""
+		return isinstance(template, dict) and len(template.get('members', ())) == mem_cnt
+
+	def _add_template(self, instance_id, tag_struct, template, pending):
+		""" Keep a template read for get_udt_codec and queue its nested templates not read yet
+
+		:return: False if the template has not been read completely
+		"""
+		if not self._template_read(template, tag_struct['member_cnt']):
+			return False
+		self._template_cache.add_template(instance_id, template, tag_struct['struct_size'], tag_struct['struct_handle'])
+		for member in template['members']:
+			if member['tag_type'] == 'struct' and member['data_type'] not in self._template_cache.templates:
+				pending.append(member['data_type'])
+		return True
+
+	def _use_value_cache(self):
+		""" Check if the value cache can serve or keep any tag, with the default age in attribs['value cache age']
+		"""
+		self._value_cache.default_age = self.attribs['value cache age']
+		return self._value_cache.active()
+
+	def _cache_read_value(self, tag, result, now):
+		""" Keep the result of read_tag with a single tag in the value cache
+
+		:return: result
+		"""
+		# An error reply is returned as (-1, 0)
+		if result is not None and result[1] and self._use_value_cache():
+			self._value_cache.put(tag, result[0], result[1], now)
+		return result
+
+	def _cache_read_values(self, tag_list, now):
+		""" Keep the results of read_tag with a list of tags in the value cache
+
+		:return: tag_list
+		"""
+		if tag_list and self._use_value_cache():
+			for name, value, typ in tag_list:
+				self._value_cache.put(name, value, typ, now)
+		return tag_list
+
+	def _cache_written_value(self, tag, value, typ, written):
+		""" Update the value cache after write_tag with a single tag
+		"""
+		if isinstance(tag, tuple):
+			tag, value, typ = tag
+		self._cache_written_values([(tag, value, typ, 'GOOD' if written else 'BAD')])
+
+	def _cache_written_values(self, tag_list):
+		""" Update the value cache with the results of write_tag
+
+		The values written are kept as the plc stores them, the values of the tags not written are dropped.
+
+		:return: tag_list
+		"""
+		if not self._use_value_cache():
+			return tag_list
+		now = _clock()
+		for name, value, typ, status in tag_list:
+			self._value_cache.invalidate(name)
+			if status == 'GOOD':
+				self._value_cache.put(name, UNPACK_DATA_FUNCTION[typ](PACK_DATA_FUNCTION[typ](value)), typ, now)
+		return tag_list
+
+	def set_value_cache_age(self, tags, max_age):
+		""" Set how long the values of tags read are served by the value cache
+
+		:param tags: a tag name or a list of them, as passed to read_tag
+		:param max_age: the maximum age in seconds, 0 to always read the tags from the plc, None to use
+						attribs['value cache age'] again
+		"""
+		self._value_cache.set_max_age(tags, max_age)
+
+	def invalidate_value_cache(self, tag=None):
+		""" Drop the values read from a tag from the value cache, all the values if tag is None
+		"""
+		self._value_cache.invalidate(tag)
+
+	def get_single_flight_stats(self):
+		""" Get the statistics of the reads shared by read_tag and read_array
+
+		:return: a dictionary with coalesced (the reads served by a read in flight) and in flight (the reads going on)
+		"""
+		with self._flights_lock:
+			in_flight = sum(len(flights) for flights in self._flights.values())
+		return {'coalesced': self._coalesced_reads, 'in flight': in_flight}
+
+	def get_value_cache_stats(self):
+		""" Get the statistics of the value cache used by read_tag
+
+		:return: the dictionary of ValueCache.stats
+		"""
+		return self._value_cache.stats()
+
+	def get_template_cache_stats(self):
+		""" Get the statistics of the template cache used by get_tag_struct, read_template and get_udt_codec
+
+		:return: the dictionary of TemplateCache.stats
+		"""
+		return self._template_cache.stats()
+
+	def get_udt_codec(self, instance_id):
+		""" get the decoder of the structures of a template
+
+		The template and the nested ones are read from the plc the first time, then the UdtCodec compiled from them is
+		kept for the next calls. Its decode method takes the data of a structure as returned by read_tag. The threads
+		asking for the same template share its reading, see get_tag_struct.
+
+		:param instance_id: the template instance, that is the lower 12 bits of the symbol type of a structure tag
+		:return: the UdtCodec, None if the templates cannot be read
+		"""
+		codec = self._udt_codecs.get(instance_id)
+		if codec is not None:
+			return codec
+
+		pending = [instance_id]
+		while pending:
+			template_id = pending.pop()
+			if template_id in self._template_cache.templates:
+				continue
+			tag_struct = self.get_tag_struct(template_id)
+			if not self._tag_struct_read(tag_struct):
+				template = None
+			else:
+				template = self.read_template(template_id, tag_struct['obj_def_size'] * 4 - 21, tag_struct['member_cnt'])
+			if template is None or not self._add_template(template_id, tag_struct, template, pending):
+				self._status = (10, "Cannot read template {0}. get_udt_codec will not be executed.".format(template_id))
+				self.logger.warning(self._status)
+				return None
+
+		codec = self._udt_codecs[instance_id] = compile_udt(instance_id, self._template_cache.templates)
+		return codec
+
+	def _build_change_signature_request(self):
+		""" Build the Get Attribute List message request of the change detection attributes of the controller
+
+		:return: the message request
+		"""
+		message_request = [
+			pack_sint(TAG_SERVICES_REQUEST['Get Attribute List']),
+			pack_sint(3),  # Request Path ( 20 AC 25 00 01 00 )
+			CLASS_ID["8-bit"],
+			CLASS_CODE["Controller Object"],
+			INSTANCE_ID["16-bit"],
+			b'\x00',
+			pack_uint(1),  # The instance
+			pack_uint(5),  # Number of attributes to retrieve
+			pack_uint(1),  # Attributes 1 to 4 and 10: change counters of the project
+			pack_uint(2),
+			pack_uint(3),
+			pack_uint(4),
+			pack_uint(10)
+		]
+		return b''.join(message_request)
+
+	def _parse_change_signature(self):
+		""" Extract the attributes read by get_change_signature from the last reply
+
+		:return: the attributes as an hex string
+		"""
+		return to_str(binascii.hexlify(copy_bytes(self._reply, 50)))
+
+	@_serialized
+	def get_change_signature(self):
+		""" get the change detection attributes of the controller
+
+		Their value changes whenever the project is downloaded or edited, so it tells if the tags and the templates
+		read before are still valid.
+
+		:return: the attributes as an hex string, None if the controller does not provide them
+		"""
+		if self._session == 0:
+			self._status = (10, "A session need to be registered before to call get_change_signature.")
+			self.logger.warning(self._status)
+			return None
+
+		if not self._target_is_connected:
+			if not self.forward_open():
+				self._status = (10, "Target did not connected. get_change_signature will not be executed.")
+				self.logger.warning(self._status)
+				return None
+
+		self._reading_controller = True
+		try:
+			if not self.send_unit_data(self._connected_message(self._build_change_signature_request())):
+				return None
+		finally:
+			self._reading_controller = False
+		return self._parse_change_signature()
+
+	def _use_tag_database(self, database):
+		""" Take the tag list and the templates of a database instead of reading them from the plc
+		"""
+		self._tag_list = list(database.symbols)
+		self._clear_symbol_instances()
+		self._add_symbol_instances(self._tag_list)
+		self._template_cache.load(database.templates, database.struct_handles)
+		self._udt_codecs = {}
+
+	def _save_tag_database(self, path, signature):
+		""" Save the tag list and the templates read from the plc to the database at path
+		"""
+		if signature is None:
+			# Without change detection the database could never be trusted
+			return
+		database = TagDatabase(signature, self._tag_list, self._template_cache.templates,
+							   self._template_cache.struct_handles)
+		try:
+			database.save(path)
+		except (IOError, OSError) as e:
+			self._status = (10, "Error {0} saving the tag database {1}".format(e, path))
+			self.logger.warning(self._status)
+
+	@_serialized
+	def load_tag_database(self, path):
+		""" load the tag list and the templates from the tag database at path
+
+		The database is used if the controller reports the same change detection attributes saved with it. Otherwise
+		the tag list and the templates of all the structure tags are read from the plc, as get_tag_list and
+		get_udt_codec do, and saved to path for the next connection. When attribs['tag database'] is set, open calls
+		this method with it.
+
+		:param path: the file of the database
+		:return: the tag list, None in case of error
+		"""
+		signature = self.get_change_signature()
+		if signature is not None:
+			database = TagDatabase.load(path)
+			if database is not None and database.signature == signature:
+				self._use_tag_database(database)
+				return self._tag_list
+
+		self._use_tag_database(TagDatabase(signature, [], {}, {}))
+		if self.get_tag_list() is None:
+			return None
+		for instance_id in struct_template_ids(self._tag_list):
+			# A template that cannot be read is left out, get_udt_codec reports it in the status
+			self.get_udt_codec(instance_id)
+		self._save_tag_database(path, signature)
+		return self._tag_list
+
+	def get_tag_index(self, expand_arrays=False):
+		""" get the index of the names of the tags in the plc and of their members
+
+		The tag list read by get_tag_list or load_tag_database is used, or read if there is none, and the templates
+		of the structure tags are read if they are not in the template cache.
+
+		:param expand_arrays: as in TagIndex
+		:return: the TagIndex, None in case of error
+		"""
+		if not self._tag_list and self.get_tag_list() is None:
+			return None
+		for instance_id in struct_template_ids(self._tag_list):
+			# A template that cannot be read leaves its members out, get_udt_codec reports it in the status
+			self.get_udt_codec(instance_id)
+		return TagIndex(self._tag_list, self._template_cache.templates, expand_arrays)
+
 	def _send(self):
 		""" socket send
 
 		:return: true if no error otherwise false
 		"""
 		try:
-			self.logger.debug(print_bytes_msg(self._message, '-------------- SEND --------------'))
+			if self.logger.isEnabledFor(logging.DEBUG):
+				self.logger.debug(print_bytes_msg(self._message, '-------------- SEND --------------'))
 			self.__sock.send(self._message)
 		except SocketError as e:
 			self._status = (11, "Error {0} during {1}".format(e, 'send'))
@@ -1135,8 +2428,12 @@ class Driver(object):
 		:return: true if no error otherwise false
 		"""
 		try:
-			self._reply = self.__sock.receive()
-			self.logger.debug(print_bytes_msg(self._reply, '----------- RECEIVE -----------'))
+			if self.attribs['zero copy']:
+				self._reply = self.__sock.receive_into()
+			else:
+				self._reply = self.__sock.receive()
+			if self.logger.isEnabledFor(logging.DEBUG):
+				self.logger.debug(print_bytes_msg(self._reply, '----------- RECEIVE -----------'))
 		except SocketError as e:
 			self._status = (12, "Error {0} during {1}".format(e, 'receive'))
 			self.logger.critical(self._status)
@@ -1144,6 +2441,7 @@ class Driver(object):
 
 		return True
 
+	@_serialized
 	def open(self, ip_address):
 		""" socket open
 
@@ -1152,18 +2450,22 @@ class Driver(object):
 		# handle the socket layer
 		if not self._connection_opened:
 			try:
+				self.__sock = Socket(None)
 				self.__sock.connect(ip_address, self.attribs['port'])
 				self._connection_opened = True
 				if self.register_session() is None:
 					self._status = (13, "Session not registered")
 					self.logger.error(self._status)
 					return False
+				if self.attribs['tag database'] is not None:
+					self.load_tag_database(self.attribs['tag database'])
 				return True
 			except SocketError as e:
 				self._status = (13, "Error {0} during {1}".format(e, 'open'))
 				self.logger.critical(self._status)
 		return False
 
+	@_serialized
 	def close(self):
 		""" socket close
 
@@ -1173,7 +2475,8 @@ class Driver(object):
 			self.forward_close()
 		if self._session != 0:
 			self.un_register_session()
-		self.__sock.close()
+		if self.__sock is not None:
+			self.__sock.close()
 		self.__sock = None
 		self._session = 0
 		self._connection_opened = False
@@ -0,0 +1,807 @@
+# -*- coding: utf-8 -*-
+#
+# clx_async.py - asyncio Ethernet/IP Client for Rockwell PLCs
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import asyncio
+import functools
+import logging
+
+from pycomm.ab_comm.clx import Driver, CONNECTED_SEQUENCE_OFFSET, _clock, _is_ndarray, _read_tag_flight, _share_read_tag, _read_array_flight, \
+	_share_read_array, _UNSHARED
+from pycomm.ab_comm.udt import compile_udt
+from pycomm.ab_comm.tagdb import TagDatabase, struct_template_ids
+from pycomm.ab_comm.symbols import SymbolTable
+from pycomm.ab_comm.tagindex import TagIndex
+from pycomm.cip.cip_base import *
+
+
+def _serialized(method):
+	""" Run the coroutine method holding the lock of the driver
+
+	Only one request/reply exchange at a time can use the connection. A method called by another one already holding
+	the lock, like forward_open called by read_tag, runs straight away.
+	"""
+	@functools.wraps(method)
+	async def wrapper(self, *args, **kwargs):
+		task = asyncio.current_task()
+		if self._lock_owner is task:
+			return await method(self, *args, **kwargs)
+		async with self._lock:
+			self._lock_owner = task
+			try:
+				return await method(self, *args, **kwargs)
+			finally:
+				self._lock_owner = None
+	return wrapper
+
+
+def _single_flight(request, share):
+	""" Share a read in flight among the tasks asking for it, instead of sending it again
+
+	Same as clx._single_flight, for coroutines. It goes before _serialized, so that a task waits for the read in flight
+	and not for the lock.
+	"""
+	def decorator(method):
+		@functools.wraps(method)
+		async def wrapper(self, *args, **kwargs):
+			if self._lock_owner is asyncio.current_task():
+				return await method(self, *args, **kwargs)
+			key, span = request(*args, **kwargs)
+			flights = self._flights.setdefault(key, [])
+			for flight_span, future in flights:
+				if flight_span >= span:
+					result = share(await asyncio.shield(future), span, flight_span)
+					if result is _UNSHARED:
+						return await method(self, *args, **kwargs)
+					self._coalesced_reads += 1
+					return result
+
+			flight = (span, asyncio.get_event_loop().create_future())
+			flights.append(flight)
+			result = None
+			try:
+				result = await method(self, *args, **kwargs)
+			finally:
+				flights.remove(flight)
+				if not flights:
+					del self._flights[key]
+				flight[1].set_result(result)
+			return result
+		return wrapper
+	return decorator
+
+
+class AsyncDriver(Driver):
+	"""
+	asyncio version of the Ethernet/IP client, it requires Python 3.7 or later.
+
+	It works like clx.Driver and uses the same message builders and reply parsers, but every method that goes to the
+	network is a coroutine and the connection is an asyncio stream. One event loop can poll many controllers without
+	a thread per socket:
+
+		async def poll(ip):
+			c = AsyncDriver()
+			if await c.open(ip):
+				print(await c.read_tag(['parts', 'ControlWord', 'Counts']))
+				await c.close()
+
+		loop.run_until_complete(asyncio.gather(*[poll(ip) for ip in ips]))
+
+	Calls made concurrently on the same driver are executed one after the other. The 'zero copy' attribute has no
+	effect, the replies are read from the stream.
+	"""
+	def __init__(self):
+		super(AsyncDriver, self).__init__()
+		self.logger = logging.getLogger('ab_comm.clx_async')
+		self._reader = None
+		self._writer = None
+		self._timeout = 5.0
+		self._lock = asyncio.Lock()
+		self._lock_owner = None
+
+	async def _check_connection(self, code, method):
+		""" Check the session and open the connection with the target if needed
+
+		:return: False if the method cannot be executed
+		"""
+		if self._session == 0:
+			self._status = (code, "A session need to be registered before to call {0}.".format(method))
+			self.logger.warning(self._status)
+			return False
+
+		if not self._target_is_connected:
+			if not await self.forward_open():
+				self._status = (code, "Target did not connected. {0} will not be executed.".format(method))
+				self.logger.warning(self._status)
+				return False
+		return True
+
+	@_serialized
+	async def nop(self):
+		""" No reply command
+
+		A NOP provides a way for either an originator or target to determine if the TCP connection is still open.
+		"""
+		self._message = self.build_header(ENCAPSULATION_COMMAND['nop'], 0)
+		await self._send()
+
+	@_serialized
+	async def list_identity(self):
+		""" ListIdentity command to locate and identify potential target
+
+		After sending the message the client wait for the reply
+		"""
+		self._message = self.build_header(ENCAPSULATION_COMMAND['list_identity'], 0)
+		await self._send()
+		await self._receive()
+
+	@_serialized
+	async def register_session(self):
+		""" Register a new session with the communication partner
+
+		:return: None if any error, otherwise return the session number
+		"""
+		if self._session:
+			return self._session
+
+		self._message = self.build_header(ENCAPSULATION_COMMAND['register_session'], 4)
+		self._message += pack_uint(self.attribs['protocol version'])
+		self._message += pack_uint(0)
+		await self._send()
+		await self._receive()
+		if self._check_reply():
+			self._session = unpack_dint_from(self._reply, 4)
+			self.logger.info("Session ={0} has been registered.".format(print_bytes_line(copy_bytes(self._reply, 4, 8))))
+			return self._session
+		self.logger.warning('Session not registered.')
+		return None
+
+	@_serialized
+	async def un_register_session(self):
+		""" Un-register a connection
+
+		"""
+		self._message = self.build_header(ENCAPSULATION_COMMAND['unregister_session'], 0)
+		await self._send()
+		self._session = None
+
+	@_serialized
+	async def send_rr_data(self, msg):
+		""" SendRRData transfer an encapsulated request/reply packet between the originator and target
+
+		:param msg: The message to be send to the target
+		:return: the reply received from the target
+		"""
+		self._message = self.build_header(ENCAPSULATION_COMMAND["send_rr_data"], len(msg))
+		self._message += msg
+		await self._send()
+		await self._receive()
+		return self._check_reply()
+
+	@_serialized
+	async def send_unit_data(self, msg):
+		""" SendUnitData send encapsulated connected messages.
+
+		The replies with another sequence count are discarded, as in clx.Driver.send_unit_data.
+
+		:param msg: The message to be send to the target
+		:return: the reply received from the target
+		"""
+		self._message = self.build_header(ENCAPSULATION_COMMAND["send_unit_data"], len(msg))
+		self._message += msg
+		sequence = unpack_uint_from(msg, CONNECTED_SEQUENCE_OFFSET - HEADER_SIZE)
+		await self._send()
+		while await self._receive() and self._is_stale_reply(sequence):
+			self.logger.warning("Discarded stale reply with sequence count {0}".format(
+				unpack_uint_from(self._reply, CONNECTED_SEQUENCE_OFFSET)))
+		return self._check_reply()
+
+	@_serialized
+	async def send_unit_data_pipelined(self, message_requests, parse=None):
+		""" Send connected messages keeping more than one of them in flight on the connection
+
+		Same as clx.Driver.send_unit_data_pipelined.
+
+		:param message_requests: the list of message requests to send, each one without the sequence count
+		:param parse: if not None, called as parse(index) for each reply matched, while self._reply holds the reply
+		:return: a list with the result of _check_reply for each request, False for the ones timed out
+		"""
+		return await self._send_frames_pipelined(len(message_requests), self._unit_data_frame(message_requests), parse)
+
+	async def _send_frames_pipelined(self, count, frame, parse):
+		""" The pipeline of send_unit_data_pipelined, for messages already encapsulated
+
+		Same as clx.Driver._send_frames_pipelined. The caller must hold the lock of the driver.
+		"""
+		depth = max(1, self.attribs['pipeline depth'])
+		timeout = self.attribs['pipeline timeout']
+		results = [False] * count
+		in_flight = {}      # sequence count -> (index of the request, deadline)
+		next_request = 0
+		while next_request < count or in_flight:
+			# Fill the pipeline
+			while next_request < count and len(in_flight) < depth:
+				sequence = self._get_sequence()
+				self._message = frame(next_request, sequence)
+				if not await self._send():
+					return results
+				in_flight[sequence] = (next_request, _clock() + timeout)
+				next_request += 1
+
+			# Wait for the next reply, not longer than the oldest request can wait
+			reply_received = False
+			remaining = min(deadline for index, deadline in in_flight.values()) - _clock()
+			if remaining > 0:
+				try:
+					self._reply = await self._read_message(remaining)
+					reply_received = True
+				except asyncio.TimeoutError:
+					pass
+				except (OSError, EOFError, SocketError) as e:
+					self._status = (12, "Error {0} during {1}".format(e, 'receive'))
+					self.logger.critical(self._status)
+					return results
+
+			if not reply_received:
+				now = _clock()
+				for sequence in [seq for seq, (index, deadline) in in_flight.items() if deadline <= now]:
+					del in_flight[sequence]
+					self._status = (12, "Request with sequence count {0} timed out".format(sequence))
+					self.logger.warning(self._status)
+				continue
+
+			sequence = unpack_uint_from(self._reply, CONNECTED_SEQUENCE_OFFSET)
+			if unpack_uint_from(self._reply, 0) != unpack_uint(ENCAPSULATION_COMMAND["send_unit_data"]) or \
+					sequence not in in_flight:
+				self.logger.warning("Discarded stale reply with sequence count {0}".format(sequence))
+				continue
+			index, deadline = in_flight.pop(sequence)
+			results[index] = self._check_reply()
+			if parse is not None:
+				parse(index)
+		return results
+
+	@_serialized
+	async def forward_open(self):
+		""" CIP implementation of the forward open message
+
+		Refer to ODVA documentation Volume 1 3-5.5.2. Same as clx.Driver.forward_open.
+
+		:return: False if any error in the reply message
+		"""
+		if self._session == 0:
+			self._status = (4, "A session need to be registered before to call forward_open.")
+			self.logger.warning(self._status)
+			return None
+
+		if self.attribs['connection size'] > CONNECTION_PARAMETER['Default'] & CONNECTION_SIZE_MASK:
+			if await self.send_rr_data(self._build_forward_open_request(large=True)):
+				return self._parse_forward_open_reply(large=True)
+			self.logger.warning("Large Forward Open rejected, trying Forward Open.")
+
+		if await self.send_rr_data(self._build_forward_open_request()):
+			return self._parse_forward_open_reply()
+		self._status = (4, "forward_open returned False")
+		self.logger.warning(self._status)
+		return False
+
+	@_serialized
+	async def forward_close(self):
+		""" CIP implementation of the forward close message
+
+		Refer to ODVA documentation Volume 1 3-5.5.3
+
+		:return: False if any error in the reply message
+		"""
+		if self._session == 0:
+			self._status = (5, "A session need to be registered before to call forward_close.")
+			self.logger.warning(self._status)
+			return None
+
+		if await self.send_rr_data(self._build_forward_close_request()):
+			self._target_is_connected = False
+			return True
+		self._status = (5, "forward_close returned False")
+		self.logger.warning(self._status)
+		return False
+
+	@_single_flight(_read_tag_flight, _share_read_tag)
+	@_serialized
+	async def read_tag(self, tag):
+		""" read tag from a connected plc
+
+		Same arguments and return value of clx.Driver.read_tag
+		"""
+		multi_requests = isinstance(tag, list)
+		if not await self._check_connection(6, 'read_tag'):
+			return None
+
+		now = _clock()
+		cached = self._use_value_cache()
+		if multi_requests:
+			results, stale = self._value_cache.split(tag, now) if cached else (None, tag)
+			if not stale:
+				return results
+			packets = self._build_read_tag_packets(stale)
+			if packets is None:
+				return None
+			replies = [None] * len(packets)
+
+			def parse(index):
+				replies[index] = self._parse_read_tag_packet(packets[index][0])
+
+			await self.send_unit_data_pipelined([message_request for tags, message_request in packets], parse)
+			tag_list = self._merge_read_tag_packets(packets, replies)
+			return self._value_cache.merge(results, tag_list, now) if cached else tag_list
+
+		if cached:
+			value = self._value_cache.get(tag, now)
+			if value is not None:
+				return value
+
+		message_request = self._build_read_tag_request(tag)
+		if message_request is None:
+			return None
+
+		await self.send_unit_data(self._connected_message(message_request))
+		if self._reply is None:
+			return None
+		return self._cache_read_value(tag, self._parse_read_tag_reply(tag), now)
+
+	@_serialized
+	async def read_plan(self, plan):
+		""" read the tags of a clx.ReadPlan from a connected plc
+
+		Same arguments and return value of clx.Driver.read_plan
+		"""
+		if not await self._check_connection(6, 'read_plan'):
+			return None
+
+		if not self._read_plan_compiled(plan) and not self._compile_read_plan(plan):
+			return None
+
+		replies = [None] * len(plan)
+
+		def parse(index):
+			replies[index] = self._parse_read_plan_packet(plan, index)
+
+		now = _clock()
+		await self._send_frames_pipelined(len(plan), self._read_plan_frame(plan), parse)
+		return self._cache_read_values(self._merge_read_tag_packets(plan._packets, replies), now)
+
+	@_single_flight(_read_array_flight, _share_read_array)
+	@_serialized
+	async def read_array(self, tag, counts, ndarray=False):
+		""" read array of atomic data type from a connected plc
+
+		Same arguments and return value of clx.Driver.read_array
+		"""
+		if not await self._check_connection(7, 'read_array'):
+			return None
+
+		rp = self._create_tag_rp(tag)
+		if rp is None:
+			self._status = (7, "Cannot create tag {0} request packet. read_array will not be executed.".format(tag))
+			self.logger.warning(self._status)
+			return None
+
+		if not self._start_read_array(ndarray):
+			return None
+
+		while self._byte_offset != -1:
+			if not await self.send_unit_data(self._connected_message(self._build_read_array_request(rp, counts))):
+				return None
+
+		return self._parse_read_array_reply()
+
+	@_serialized
+	async def _read_array_fragment(self, rp, counts, byte_offset, ndarray):
+		""" Read the fragment of iter_array at byte_offset
+
+		Same as clx.Driver._read_array_fragment
+		"""
+		self._byte_offset = byte_offset
+		self._last_position = 0
+		self._tag_array = []
+		self._array_bytes = bytearray() if ndarray else None
+		if not await self.send_unit_data(self._connected_message(self._build_read_array_request(rp, counts))):
+			return None
+		return self._parse_array_fragment()
+
+	async def iter_array(self, tag, counts, chunk_size=None, ndarray=False):
+		""" read array from a connected plc yielding the values while the fragments arrive
+
+		Same arguments of clx.Driver.iter_array, it is an asynchronous generator. The lock of the driver is held
+		for one fragment at a time, so other tasks can use the driver while the chunks are consumed.
+		"""
+		if not await self._check_connection(7, 'iter_array'):
+			return
+
+		rp = self._create_tag_rp(tag)
+		if rp is None:
+			self._status = (7, "Cannot create tag {0} request packet. iter_array will not be executed.".format(tag))
+			self.logger.warning(self._status)
+			return
+
+		if not self._check_numpy(ndarray, 'iter_array'):
+			return
+
+		buffer = bytearray() if ndarray else []
+		byte_offset = 0
+		while byte_offset != -1:
+			fragment = await self._read_array_fragment(rp, counts, byte_offset, ndarray)
+			if fragment is None:
+				return
+			values, typ, dtype, byte_offset = fragment
+			buffer += values
+			for chunk in self._split_array_chunks(buffer, typ, dtype, chunk_size, byte_offset == -1):
+				yield chunk, typ
+
+	@_serialized
+	async def write_tag(self, tag, value=None, typ=None):
+		""" write tag/tags from a connected plc
+
+		Same arguments and return value of clx.Driver.write_tag
+		"""
+		multi_requests = isinstance(tag, list)
+		if not await self._check_connection(8, 'write_tag'):
+			return None
+
+		if multi_requests:
+			packets = self._build_write_tag_packets(tag)
+			if packets is None:
+				return None
+			replies = [None] * len(packets)
+
+			def parse(index):
+				replies[index] = self._parse_write_tag_packet(packets[index][0])
+
+			await self.send_unit_data_pipelined([message_request for tags, message_request in packets], parse)
+			return self._cache_written_values(self._merge_write_tag_packets(packets, replies))
+
+		message_request = self._build_write_tag_request(tag, value, typ)
+		if message_request is None:
+			return None
+
+		ret_val = await self.send_unit_data(self._connected_message(message_request))
+		self._cache_written_value(tag, value, typ, ret_val)
+		return ret_val
+
+	@_serialized
+	async def write_array(self, tag, data_type, values):
+		""" write array of atomic data type from a connected plc
+
+		Same arguments of clx.Driver.write_array
+		"""
+		if not isinstance(values, list) and not _is_ndarray(values):
+			self._status = (9, "A list of tags must be passed to write_array.")
+			self.logger.warning(self._status)
+			return None
+
+		if not await self._check_connection(9, 'write_array'):
+			return None
+
+		fragments = self._build_write_array_fragments(tag, data_type, values)
+		if fragments is None:
+			return None
+
+		await self.send_unit_data_pipelined(fragments)
+		self._value_cache.invalidate(tag)
+
+	@_serialized
+	async def _read_tag_list_page(self, instance, skip_system, skip_programs):
+		""" Read the page of the tag list starting at instance
+
+		Same as clx.Driver._read_tag_list_page
+		"""
+		self._last_instance = instance
+		self._tag_page = []
+		self._tag_list_filter = (skip_system, skip_programs)
+		try:
+			if not await self.send_unit_data(self._connected_message(self._build_tag_list_request())):
+				return None
+		finally:
+			self._tag_list_filter = (False, False)
+		return self._tag_page, self._last_instance
+
+	async def iter_tag_list(self, skip_system=False, skip_programs=False):
+		""" get the tags in the plc one page at a time
+
+		Same arguments of clx.Driver.iter_tag_list, it is an asynchronous generator. The lock of the driver is held
+		for one page at a time.
+		"""
+		if not await self._check_connection(10, 'iter_tag_list'):
+			return
+
+		instance = 0
+		while instance != -1:
+			page = await self._read_tag_list_page(instance, skip_system, skip_programs)
+			if page is None:
+				return
+			tags, instance = page
+			yield tags
+
+	@_serialized
+	async def get_tag_list(self, skip_system=False, skip_programs=False):
+		""" get a list of the tags in the plc
+
+		Same as clx.Driver.get_tag_list
+		"""
+		if not await self._check_connection(10, 'get_tag_list'):
+			return None
+
+		self._tag_list = []
+		# The instances of the tags deleted from the plc can be taken by other tags
+		self._clear_symbol_instances()
+		instance = 0
+		while instance != -1:
+			page = await self._read_tag_list_page(instance, skip_system, skip_programs)
+			if page is None:
+				self._tag_list_partial()
+				break
+			tags, instance = page
+			self._tag_list.extend(tags)
+			self._add_symbol_instances(tags)
+
+		return self._tag_list
+
+	async def get_symbol_table(self, skip_system=False, skip_programs=False):
+		""" get the tags in the plc as a SymbolTable
+
+		Same as clx.Driver.get_symbol_table. The lock of the driver is held for one page at a time.
+		"""
+		if not await self._check_connection(10, 'get_symbol_table'):
+			return None
+
+		table = SymbolTable()
+		instance = 0
+		while instance != -1:
+			page = await self._read_tag_list_page(instance, skip_system, skip_programs)
+			if page is None:
+				return None
+			tags, instance = page
+			table.extend(tags)
+		return table
+
+	@_serialized
+	async def get_tag_struct(self, instance_id):
+		""" get the structure of a tag in the plc
+
+		The attributes are read once per template, then taken from the template cache.
+		"""
+		if not await self._check_connection(10, 'get_tag_struct'):
+			return None
+
+		tag_struct = self._template_cache.get('struct', instance_id)
+		if tag_struct is not None:
+			return tag_struct
+
+		self._tag_struct = {}
+		await self.send_unit_data(self._connected_message(self._build_tag_struct_request(instance_id)))
+		if self._tag_struct_read(self._tag_struct):
+			self._template_cache.put('struct', instance_id, self._tag_struct)
+
+		return self._tag_struct
+
+	@_serialized
+	async def read_template(self, instance_id, to_read, mem_cnt):
+		""" get a list of the members of a template
+
+		The template is read once, then taken from the template cache.
+		"""
+		if not await self._check_connection(10, 'read_template'):
+			return None
+
+		template = self._template_cache.get('template', instance_id)
+		if template is not None:
+			return template
+
+		self._tag_template = {}
+		self._last_instance = 0
+		self._template_buffer = b""
+		self._reading_template = True
+		try:
+			while self._last_instance != -1:
+				if not await self.send_unit_data(
+						self._connected_message(self._build_read_template_request(instance_id, to_read))):
+					return None
+		finally:
+			self._reading_template = False
+
+		template = self._parse_template_members(mem_cnt)
+		if self._template_read(template, mem_cnt):
+			self._template_cache.put('template', instance_id, template)
+		return template
+
+	@_serialized
+	async def get_udt_codec(self, instance_id):
+		""" get the decoder of the structures of a template
+
+		Same arguments and return value of clx.Driver.get_udt_codec
+		"""
+		codec = self._udt_codecs.get(instance_id)
+		if codec is not None:
+			return codec
+
+		pending = [instance_id]
+		while pending:
+			template_id = pending.pop()
+			if template_id in self._template_cache.templates:
+				continue
+			tag_struct = await self.get_tag_struct(template_id)
+			if not self._tag_struct_read(tag_struct):
+				template = None
+			else:
+				template = await self.read_template(
+					template_id, tag_struct['obj_def_size'] * 4 - 21, tag_struct['member_cnt'])
+			if template is None or not self._add_template(template_id, tag_struct, template, pending):
+				self._status = (10, "Cannot read template {0}. get_udt_codec will not be executed.".format(template_id))
+				self.logger.warning(self._status)
+				return None
+
+		codec = self._udt_codecs[instance_id] = compile_udt(instance_id, self._template_cache.templates)
+		return codec
+
+	@_serialized
+	async def get_change_signature(self):
+		""" get the change detection attributes of the controller
+
+		Same as clx.Driver.get_change_signature
+		"""
+		if not await self._check_connection(10, 'get_change_signature'):
+			return None
+
+		self._reading_controller = True
+		try:
+			if not await self.send_unit_data(self._connected_message(self._build_change_signature_request())):
+				return None
+		finally:
+			self._reading_controller = False
+		return self._parse_change_signature()
+
+	@_serialized
+	async def load_tag_database(self, path):
+		""" load the tag list and the templates from the tag database at path
+
+		Same as clx.Driver.load_tag_database. The file is read and written in the event loop: it is small, and read
+		once per connection.
+		"""
+		signature = await self.get_change_signature()
+		if signature is not None:
+			database = TagDatabase.load(path)
+			if database is not None and database.signature == signature:
+				self._use_tag_database(database)
+				return self._tag_list
+
+		self._use_tag_database(TagDatabase(signature, [], {}, {}))
+		if await self.get_tag_list() is None:
+			return None
+		for instance_id in struct_template_ids(self._tag_list):
+			await self.get_udt_codec(instance_id)
+		self._save_tag_database(path, signature)
+		return self._tag_list
+
+	async def get_tag_index(self, expand_arrays=False):
+		""" get the index of the names of the tags in the plc and of their members
+
+		Same as clx.Driver.get_tag_index
+		"""
+		if not self._tag_list and await self.get_tag_list() is None:
+			return None
+		for instance_id in struct_template_ids(self._tag_list):
+			await self.get_udt_codec(instance_id)
+		return TagIndex(self._tag_list, self._template_cache.templates, expand_arrays)
+
+	async def _read_message(self, timeout):
+		""" read one encapsulated message from the stream
+
+		The timeout applies to the wait for the message to begin. Once the header is in, the rest of the message
+		must follow within the timeout of the driver or the connection is considered broken.
+
+		:return: the message
+		"""
+		header = await asyncio.wait_for(self._reader.readexactly(HEADER_SIZE), timeout)
+		try:
+			data = await asyncio.wait_for(self._reader.readexactly(unpack_uint_from(header, 2)), self._timeout)
+		except asyncio.TimeoutError:
+			raise SocketError("timeout in the middle of a message.")
+		return header + data
+
+	async def _send(self):
+		""" stream send
+
+		:return: true if no error otherwise false
+		"""
+		try:
+			if self.logger.isEnabledFor(logging.DEBUG):
+				self.logger.debug(print_bytes_msg(self._message, '-------------- SEND --------------'))
+			self._writer.write(self._message)
+			await self._writer.drain()
+		except (OSError, AttributeError) as e:
+			self._status = (11, "Error {0} during {1}".format(e, 'send'))
+			self.logger.critical(self._status)
+			return False
+
+		return True
+
+	async def _receive(self):
+		""" stream receive
+
+		:return: true if no error otherwise false
+		"""
+		try:
+			self._reply = await self._read_message(self._timeout)
+			if self.logger.isEnabledFor(logging.DEBUG):
+				self.logger.debug(print_bytes_msg(self._reply, '----------- RECEIVE -----------'))
+		except (OSError, EOFError, AttributeError, SocketError, asyncio.TimeoutError) as e:
+			self._reply = None
+			self._status = (12, "Error {0} during {1}".format(e, 'receive'))
+			self.logger.critical(self._status)
+			return False
+
+		return True
+
+	@_serialized
+	async def open(self, ip_address):
+		""" stream open
+
+		:return: true if no error otherwise false
+		"""
+		if not self._connection_opened:
+			try:
+				self._reader, self._writer = await asyncio.wait_for(
+					asyncio.open_connection(ip_address, self.attribs['port']), self._timeout)
+				self._connection_opened = True
+				if await self.register_session() is None:
+					self._status = (13, "Session not registered")
+					self.logger.error(self._status)
+					return False
+				if self.attribs['tag database'] is not None:
+					await self.load_tag_database(self.attribs['tag database'])
+				return True
+			except (OSError, asyncio.TimeoutError) as e:
+				self._status = (13, "Error {0} during {1}".format(e, 'open'))
+				self.logger.critical(self._status)
+		return False
+
+	@_serialized
+	async def close(self):
+		""" stream close
+
+		"""
+		if self._target_is_connected:
+			await self.forward_close()
+		if self._session != 0:
+			await self.un_register_session()
+		if self._writer is not None:
+			self._writer.close()
+			try:
+				await self._writer.wait_closed()
+			except OSError:
+				pass
+		self._reader = None
+		self._writer = None
+		self._session = 0
+		self._connection_opened = False
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+#
+# poller.py - Multi-rate polling of Rockwell PLCs
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from pycomm.ab_comm.clx import ReadPlan, _clock
+
+
+class ScanClass(object):
+	"""
+	The tags read at the same rate by a Poller, with the statistics of their scans.
+	"""
+	def __init__(self, rate, callback):
+		self.rate = rate
+		self.callback = callback
+		self.tags = []
+		self.tick = 0           # the number of periods from the start of the poller to the next scan
+		self.next_due = None
+		self.scans = 0
+		self.errors = 0
+		self.overruns = 0
+		self.missed = 0
+		self.last_lateness = 0.0
+		self.max_lateness = 0.0
+		self.last_duration = 0.0
+
+	def stats(self):
+		""" Get the statistics of the scan class
+
+		:return: a dictionary with rate, tags (their number), scans, errors (scans with no reply), overruns (scans
+				 that ended after the next one was due), missed (the scans skipped because of the overruns), lateness
+				 and max_lateness (how late the last and the worst scan started) and duration (of the last scan)
+		"""
+		return {'rate': self.rate, 'tags': len(self.tags), 'scans': self.scans, 'errors': self.errors,
+				'overruns': self.overruns, 'missed': self.missed, 'lateness': self.last_lateness,
+				'max_lateness': self.max_lateness, 'duration': self.last_duration}
+
+
+class Poller(object):
+	"""
+	Read tags registered at different rates, all on the connection of one driver.
+
+	The scans of every rate are due at whole multiples of the rate from the same start, so a late scan does not
+	delay the next ones and the rates that are multiples of each other come due together. The tags of all the
+	rates due at the same time are read together by a ReadPlan, in the same multiple service packets; a plan is
+	kept for each combination of rates. A scan that ends after the next one of its rate was due is an overrun: the
+	scans already missed are skipped, counted and reported to on_overrun.
+
+	:param driver: the open clx.Driver to read with
+	:param on_overrun: if not None, called as on_overrun(rate, missed, lateness) at every overrun
+	:param window: the rates due within window seconds from now are read now, with the ones already due
+	"""
+	def __init__(self, driver, on_overrun=None, window=0.0):
+		self.logger = logging.getLogger('ab_comm.poller')
+		self.driver = driver
+		self.on_overrun = on_overrun
+		self.window = window
+		self._classes = OrderedDict()   # rate -> ScanClass
+		self._plans = {}                # tuple of rates -> ReadPlan of their tags
+		self._start = None
+		self._running = False
+
+	def add(self, tags, rate, callback=None):
+		""" Register tags to read every rate seconds
+
+		:param tags: the list of tag names, as passed to read_tag
+		:param rate: the period of the scans in seconds
+		:param callback: if not None, called as callback(results) after every scan of the rate, with the results of
+						 read_tag for the tags of the rate, or None if the scan failed
+		"""
+		scan_class = self._classes.get(rate)
+		if scan_class is None:
+			scan_class = self._classes[rate] = ScanClass(rate, callback)
+			if self._start is not None:
+				scan_class.tick = int(math.ceil((_clock() - self._start) / rate))
+				scan_class.next_due = self._start + scan_class.tick * rate
+		elif callback is not None:
+			scan_class.callback = callback
+		for tag in tags:
+			if tag not in scan_class.tags:
+				scan_class.tags.append(tag)
+		self._plans.clear()
+
+	def remove(self, tags, rate=None):
+		""" Stop reading tags, at the rate given or at all the rates
+
+		The rates left without tags are dropped.
+		"""
+		for scan_class in list(self._classes.values()):
+			if rate is not None and scan_class.rate != rate:
+				continue
+			scan_class.tags = [tag for tag in scan_class.tags if tag not in tags]
+			if not scan_class.tags:
+				del self._classes[scan_class.rate]
+		self._plans.clear()
+
+	def stats(self):
+		""" Get the statistics of the scan classes
+
+		:return: dictionary rate -> ScanClass.stats
+		"""
+		return dict((rate, scan_class.stats()) for rate, scan_class in self._classes.items())
+
+	def _due(self, now):
+		""" Take the scan classes due at now
+
+		:return: the due scan classes and the ReadPlan of their tags
+		"""
+		if self._start is None:
+			self._start = now
+			for scan_class in self._classes.values():
+				scan_class.next_due = now
+		due = [scan_class for scan_class in self._classes.values() if scan_class.next_due <= now + self.window]
+		if not due:
+			return due, None
+		key = tuple(scan_class.rate for scan_class in due)
+		plan = self._plans.get(key)
+		if plan is None:
+			tags = []
+			for scan_class in due:
+				tags.extend(tag for tag in scan_class.tags if tag not in tags)
+			plan = self._plans[key] = ReadPlan(tags)
+		return due, plan
+
+	def _finish(self, due, results, started, finished):
+		""" Schedule the next scans of the due classes and give them the results
+		"""
+		by_tag = None
+		if isinstance(results, list):
+			by_tag = dict((result[0], result) for result in results)
+		for scan_class in due:
+			lateness = max(0.0, started - scan_class.next_due)
+			scan_class.scans += 1
+			scan_class.last_lateness = lateness
+			scan_class.max_lateness = max(scan_class.max_lateness, lateness)
+			scan_class.last_duration = finished - started
+			# The scans are due at whole multiples of the rate, so that the errors of the floats do not add up
+			scan_class.tick += 1
+			scan_class.next_due = self._start + scan_class.tick * scan_class.rate
+			if scan_class.next_due <= finished:
+				missed = int((finished - scan_class.next_due) // scan_class.rate) + 1
+				scan_class.tick += missed
+				scan_class.next_due = self._start + scan_class.tick * scan_class.rate
+				scan_class.overruns += 1
+				scan_class.missed += missed
+				self.logger.warning("Overrun of the {0} s scan: {1} scans missed".format(scan_class.rate, missed))
+				if self.on_overrun is not None:
+					self.on_overrun(scan_class.rate, missed, lateness)
+			if by_tag is None:
+				scan_class.errors += 1
+			if scan_class.callback is not None:
+				scan_class.callback(None if by_tag is None else
+									[by_tag.get(tag, (tag, None, None)) for tag in scan_class.tags])
+
+	def _wait(self):
+		""" The seconds until the next scan is due, None if there are no tags
+		"""
+		if not self._classes:
+			return None
+		return max(0.0, min(scan_class.next_due for scan_class in self._classes.values()) - _clock())
+
+	def poll(self):
+		""" Read the tags of the rates that are due, if any
+
+		For the applications with their own loop: call it again within the time returned.
+
+		:return: the seconds until the next scan is due, None if there are no tags
+		"""
+		started = _clock()
+		due, plan = self._due(started)
+		if due:
+			results = self.driver.read_plan(plan)
+			self._finish(due, results, started, _clock())
+		return self._wait()
+
+	def run(self, duration=None):
+		""" Poll until stop is called, or for duration seconds
+
+		:param duration: how long to run in seconds, None to run until stop
+		"""
+		end = None if duration is None else _clock() + duration
+		self._running = True
+		try:
+			while self._running:
+				wait = self.poll()
+				if wait is None:
+					break
+				if end is not None:
+					if _clock() + wait >= end:
+						break
+				if wait > 0:
+					time.sleep(wait)
+		finally:
+			self._running = False
+
+	def stop(self):
+		""" Make run return, from a callback or another thread
+		"""
+		self._running = False
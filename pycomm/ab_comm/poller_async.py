@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# poller_async.py - Multi-rate polling of Rockwell PLCs with asyncio
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+
+import asyncio
+
+from pycomm.ab_comm.clx import _clock
+from pycomm.ab_comm.poller import Poller
+
+
+class AsyncPoller(Poller):
+	"""
+	asyncio version of Poller, for clx_async.AsyncDriver.
+
+	Same arguments and scheduling of Poller; poll and run are coroutines, the callbacks are plain functions.
+	"""
+	async def poll(self):
+		""" Read the tags of the rates that are due, if any
+
+		Same as Poller.poll
+		"""
+		started = _clock()
+		due, plan = self._due(started)
+		if due:
+			results = await self.driver.read_plan(plan)
+			self._finish(due, results, started, _clock())
+		return self._wait()
+
+	async def run(self, duration=None):
+		""" Poll until stop is called, or for duration seconds
+
+		Same as Poller.run
+		"""
+		end = None if duration is None else _clock() + duration
+		self._running = True
+		try:
+			while self._running:
+				wait = await self.poll()
+				if wait is None:
+					break
+				if end is not None:
+					if _clock() + wait >= end:
+						break
+				await asyncio.sleep(wait)
+		finally:
+			self._running = False
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# subscription.py - Change driven subscriptions to the tags of Rockwell PLCs
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+
+
+import logging
+from collections import namedtuple
+from pycomm.cip.cip_const import DATA_FUNCTION_SIZE
+
+FLOAT_TYPES = ('REAL', 'LREAL')
+INTEGER_TYPES = ('BOOL', 'SINT', 'INT', 'DINT', 'LINT', 'USINT', 'UINT', 'UDINT', 'ULINT', 'BYTE', 'WORD', 'DWORD',
+				 'LWORD')
+
+# A change delivered to the callback of a subscription. previous is the value last delivered, None at the first
+# scan; bits is the mask of the bits changed for the integer types, None for the others.
+Change = namedtuple('Change', 'tag value typ previous bits')
+
+
+class Subscription(object):
+	"""
+	The conditions under which a change of a tag is delivered to a callback.
+
+	:param tag: the tag name, as passed to read_tag
+	:param callback: called as callback(changes) with the list of the Change of the scan
+	:param deadband: the REAL and LREAL values are delivered only when they move more than deadband from the
+					 value last delivered
+	:param percent: the same, with the deadband in percent of the value last delivered; with deadband too, the
+					larger of the two is used
+	:param mask: the BOOL and integer values are delivered only when one of the bits of mask changes, all the
+				 bits if None
+	"""
+	__slots__ = ('tag', 'callback', 'deadband', 'percent', 'mask', 'value', 'typ', 'delivered')
+
+	def __init__(self, tag, callback, deadband=0.0, percent=None, mask=None):
+		self.tag = tag
+		self.callback = callback
+		self.deadband = deadband
+		self.percent = percent
+		self.mask = mask
+		self.value = None
+		self.typ = None
+		self.delivered = False
+
+	def update(self, value, typ):
+		""" Compare a new value with the one last delivered
+
+		:return: the Change to deliver, None if the value did not change enough
+		"""
+		previous = self.value
+		bits = None
+		if self.delivered:
+			if value is None or previous is None or typ != self.typ:
+				if value is None and previous is None:
+					return None
+			elif typ in FLOAT_TYPES:
+				if value != value or previous != previous:
+					# NaN is delivered once, when it comes and when it goes
+					if value != value and previous != previous:
+						return None
+				else:
+					threshold = self.deadband or 0.0
+					if self.percent is not None:
+						threshold = max(threshold, abs(previous) * self.percent / 100.0)
+					if abs(value - previous) <= threshold:
+						return None
+			elif typ in INTEGER_TYPES:
+				bits = (int(value) ^ int(previous)) & ((1 << 8 * DATA_FUNCTION_SIZE.get(typ, 8)) - 1)
+				if self.mask is not None:
+					bits &= self.mask
+				if not bits:
+					return None
+			elif value == previous:
+				return None
+		self.value = value
+		self.typ = typ
+		self.delivered = True
+		return Change(self.tag, value, typ, previous, bits)
+
+
+class Subscriptions(object):
+	"""
+	Deliver to callbacks only the changes of the tags read by a Poller.
+
+	The tags subscribed at a rate are added to the poller at that rate. After every scan of the rate the values are
+	compared with the ones last delivered, and every callback is called once with the list of its changes, if any.
+	The first scan delivers all the values; a tag that can not be read is delivered once with value None.
+
+	The callback of the poller for the rates with subscriptions is taken by this class.
+
+	:param poller: the Poller, or AsyncPoller, that reads the tags
+	"""
+	def __init__(self, poller):
+		self.logger = logging.getLogger('ab_comm.subscription')
+		self.poller = poller
+		self._subscriptions = {}        # rate -> dictionary tag -> list of Subscription
+		self.scans = 0
+		self.changes = 0
+
+	def subscribe(self, tags, rate, callback, deadband=0.0, percent=None, mask=None):
+		""" Subscribe to the changes of tags, read every rate seconds
+
+		:param tags: the list of tag names, as passed to read_tag
+		:param rate: the period of the scans in seconds
+		:param callback: called as callback(changes) after a scan with changes, with the list of Change
+		:param deadband: see Subscription
+		:param percent: see Subscription
+		:param mask: see Subscription
+		:return: the list of the new Subscription
+		"""
+		by_tag = self._subscriptions.get(rate)
+		if by_tag is None:
+			by_tag = self._subscriptions[rate] = {}
+		subscriptions = []
+		for tag in tags:
+			subscription = Subscription(tag, callback, deadband, percent, mask)
+			by_tag.setdefault(tag, []).append(subscription)
+			subscriptions.append(subscription)
+		self.poller.add(tags, rate, lambda results: self._scan(rate, results))
+		return subscriptions
+
+	def unsubscribe(self, tags, callback=None):
+		""" Remove the subscriptions to tags, of callback or of all the callbacks
+
+		The tags left without subscriptions are removed from the poller.
+		"""
+		for rate, by_tag in list(self._subscriptions.items()):
+			dropped = []
+			for tag in tags:
+				subscriptions = [subscription for subscription in by_tag.get(tag, ())
+								 if callback is not None and subscription.callback is not callback]
+				if subscriptions:
+					by_tag[tag] = subscriptions
+				elif tag in by_tag:
+					del by_tag[tag]
+					dropped.append(tag)
+			if dropped:
+				self.poller.remove(dropped, rate)
+			if not by_tag:
+				del self._subscriptions[rate]
+
+	def _scan(self, rate, results):
+		""" Deliver the changes of a scan of rate
+		"""
+		by_tag = self._subscriptions.get(rate)
+		if by_tag is None:
+			return
+		self.scans += 1
+		if results is None:
+			# the scan failed: all the tags are delivered as not read
+			results = [(tag, None, None) for tag in by_tag]
+		batches = {}
+		for result in results:
+			value, typ = (result[1], result[2]) if len(result) > 2 else (None, None)
+			for subscription in by_tag.get(result[0], ()):
+				change = subscription.update(value, typ)
+				if change is not None:
+					batch = batches.get(id(subscription.callback))
+					if batch is None:
+						batch = batches[id(subscription.callback)] = (subscription.callback, [])
+					batch[1].append(change)
+		for callback, changes in batches.values():
+			self.changes += len(changes)
+			try:
+				callback(changes)
+			except Exception as e:
+				self.logger.warning("Subscription callback failed: {0}".format(e))
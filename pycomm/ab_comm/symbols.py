@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+# symbols.py - Compact table of the symbols of Rockwell PLCs
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+
+from array import array
+import zlib
+from pycomm.cip.cip_base import to_bytes, to_str
+
+
+def _name_hash(key):
+	""" Hash of the key of a tag name, the same on every run and Python version
+	"""
+	return zlib.crc32(key) & 0xffffffff
+
+
+def _name_key(name):
+	""" The key of a tag name in the index: the names of the tags are not case sensitive
+	"""
+	return to_bytes(name).lower()
+
+
+class SymbolTable(object):
+	"""
+	The tags of a controller stored by column, for the controllers with many thousands of tags.
+
+	The instances, symbol types, attributes 3 and dimensions are kept in typed arrays and the names in one byte string
+	with the offset of each name. A tag is found by name, not case sensitive as in the controller, through an open
+	addressing hash index, itself an array, and by instance through a binary search. The tags are returned as the dictionaries of get_tag_list, made on request.
+	"""
+	def __init__(self, tags=()):
+		"""
+		:param tags: the tags to add, as returned by get_tag_list or iter_tag_list
+		"""
+		self._instances = array('I')
+		self._symbol_types = array('H')
+		self._attrs_3 = array('I')
+		self._dimensions = array('I')         # three per tag
+		self._names = bytearray()
+		self._name_offsets = array('I', [0])  # the name of tag i is _names[_name_offsets[i]:_name_offsets[i + 1]]
+		self._index = array('i', [-1] * 8)    # hash slot -> tag, -1 when free
+		self._by_instance = None              # the tags sorted by instance, made by the first by_instance
+		self.extend(tags)
+
+	def __len__(self):
+		return len(self._instances)
+
+	def __contains__(self, name):
+		return self._find(_name_key(name)) >= 0
+
+	def __getitem__(self, name):
+		index = self._find(_name_key(name))
+		if index < 0:
+			raise KeyError(name)
+		return self.tag(index)
+
+	def __iter__(self):
+		for index in range(len(self)):
+			yield self.tag(index)
+
+	def get(self, name, default=None):
+		""" Get a tag by name
+
+		:return: the dictionary of the tag, default if there is no tag with that name
+		"""
+		index = self._find(_name_key(name))
+		if index < 0:
+			return default
+		return self.tag(index)
+
+	def names(self):
+		""" Iterate the names of the tags, in the order they have been added
+		"""
+		for index in range(len(self)):
+			yield self.name(index)
+
+	def name(self, index):
+		""" The name of the tag at index
+		"""
+		return to_str(bytes(self._names[self._name_offsets[index]:self._name_offsets[index + 1]]))
+
+	def tag(self, index):
+		""" The dictionary of the tag at index, with the keys of get_tag_list
+		"""
+		symbol_type = self._symbol_types[index]
+		dimensions = self._dimensions[index * 3:index * 3 + ((symbol_type & 0b0110000000000000) >> 13)]
+		return {'instance_id': int(self._instances[index]), 'tag_name': self.name(index), 'symbol_type': symbol_type,
+				'attr_3': int(self._attrs_3[index]), 'array_dimensions': [int(size) for size in dimensions]}
+
+	def append(self, tag):
+		""" Add a tag
+
+		:param tag: the dictionary of the tag, as returned by get_tag_list. A tag with a name already in the table
+					replaces it, in its place.
+		"""
+		name = to_bytes(tag['tag_name'])
+		dimensions = list(tag.get('array_dimensions', ()))[:3]
+		dimensions += [0] * (3 - len(dimensions))
+		self._by_instance = None
+		index = self._find(_name_key(name))
+		if index >= 0:
+			# The same name, maybe with another case: same length
+			self._instances[index] = tag['instance_id']
+			self._symbol_types[index] = tag['symbol_type']
+			self._attrs_3[index] = tag.get('attr_3', 0)
+			self._dimensions[index * 3:index * 3 + 3] = array('I', dimensions)
+			self._names[self._name_offsets[index]:self._name_offsets[index + 1]] = name
+			return
+
+		index = len(self)
+		self._instances.append(tag['instance_id'])
+		self._symbol_types.append(tag['symbol_type'])
+		self._attrs_3.append(tag.get('attr_3', 0))
+		self._dimensions.extend(dimensions)
+		self._names += name
+		self._name_offsets.append(len(self._names))
+
+		if (index + 1) * 2 > len(self._index):
+			self._rehash(len(self._index) * 2)
+		self._insert(_name_key(name), index)
+
+	def extend(self, tags):
+		""" Add the tags of a list or of the pages of iter_tag_list
+		"""
+		for tag in tags:
+			if isinstance(tag, list):
+				self.extend(tag)
+			else:
+				self.append(tag)
+
+	def by_instance(self, instance_id):
+		""" Get a tag by instance
+
+		:return: the dictionary of the tag, None if there is no tag with that instance
+		"""
+		if self._by_instance is None:
+			instances = self._instances
+			self._by_instance = array('I', sorted(range(len(self)), key=lambda index: instances[index]))
+		order = self._by_instance
+		low, high = 0, len(order)
+		while low < high:
+			middle = (low + high) // 2
+			if self._instances[order[middle]] < instance_id:
+				low = middle + 1
+			else:
+				high = middle
+		if low < len(order) and self._instances[order[low]] == instance_id:
+			return self.tag(order[low])
+		return None
+
+	def nbytes(self):
+		""" The memory used by the columns and the index, in bytes
+		"""
+		columns = (self._instances, self._symbol_types, self._attrs_3, self._dimensions, self._name_offsets, self._index)
+		return sum(len(column) * column.itemsize for column in columns) + len(self._names)
+
+	def _key_at(self, index):
+		return self._names[self._name_offsets[index]:self._name_offsets[index + 1]].lower()
+
+	def _slots(self, key):
+		""" The slots of the index to probe for the key of a name, in order
+		"""
+		mask = len(self._index) - 1
+		slot = _name_hash(key) & mask
+		while True:
+			yield slot
+			slot = (slot + 1) & mask
+
+	def _find(self, key):
+		""" The index of the tag with the key of a name, -1 if not found
+		"""
+		for slot in self._slots(key):
+			index = self._index[slot]
+			if index < 0:
+				return -1
+			if self._key_at(index) == key:
+				return index
+
+	def _insert(self, key, index):
+		for slot in self._slots(key):
+			if self._index[slot] < 0:
+				self._index[slot] = index
+				return
+
+	def _rehash(self, size):
+		self._index = array('i', [-1]) * size
+		for index in range(len(self)):
+			self._insert(bytes(self._key_at(index)), index)
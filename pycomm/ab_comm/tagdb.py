@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+# tagdb.py - Tag database of Rockwell PLCs saved on disk
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+
+import json
+import os
+import zlib
+
+TAG_DATABASE_MAGIC = b'PCTD'
+TAG_DATABASE_VERSION = 2
+
+# The keys of the members of a template, in the order they are saved
+_MEMBER_KEYS = ('tag_name', 'info', 'tag_type', 'data_type', 'dimensions', 'offset')
+
+
+def _native(value):
+	""" Turn the strings of a JSON document into str, which are bytes with Python 2
+	"""
+	if isinstance(value, list):
+		return [_native(item) for item in value]
+	if isinstance(value, dict):
+		return dict((_native(key), _native(item)) for key, item in value.items())
+	if str is bytes and isinstance(value, type(u'')):
+		return value.encode('utf-8')
+	return value
+
+
+def struct_template_ids(symbols):
+	""" The template instances of the structure tags in a tag list, system tags excluded
+
+	:param symbols: the tag list returned by get_tag_list
+	:return: the sorted list of the template instances
+	"""
+	ids = set()
+	for symbol in symbols:
+		symbol_type = symbol['symbol_type']
+		if symbol_type & 0b1000000000000000 and not symbol_type & 0b0001000000000000:
+			ids.add(symbol_type & 0b0000111111111111)
+	return sorted(ids)
+
+
+class TagDatabase(object):
+	"""
+	The tag list and the templates of a controller, saved on disk so that the next connections skip get_tag_list and
+	read_template.
+
+	signature is the value of the change detection attributes of the controller when the database was read: the
+	database is valid as long as the controller reports the same value. The file is a magic, a version byte and the
+	zlib compressed JSON of the database, with the tag list and the members of the templates saved as rows.
+	"""
+	def __init__(self, signature, symbols, templates, struct_handles):
+		"""
+		:param signature: the value returned by Driver.get_change_signature
+		:param symbols: the tag list, as returned by get_tag_list
+		:param templates: dictionary instance_id -> (template, struct_size)
+		:param struct_handles: dictionary struct_handle -> instance_id
+		"""
+		self.signature = signature
+		self.symbols = symbols
+		self.templates = templates
+		self.struct_handles = struct_handles
+
+	def to_bytes(self):
+		""" Serialize the database
+
+		:return: the content of the file
+		"""
+		columns = sorted(set(key for symbol in self.symbols for key in symbol))
+		handles = dict((instance_id, handle) for handle, instance_id in self.struct_handles.items())
+		templates = []
+		for instance_id, (template, struct_size) in sorted(self.templates.items()):
+			templates.append([instance_id, struct_size, handles.get(instance_id), template['name'],
+							  [[member[key] for key in _MEMBER_KEYS] for member in template['members']]])
+		document = {
+			'signature': self.signature,
+			'columns': columns,
+			'symbols': [[symbol.get(key) for key in columns] for symbol in self.symbols],
+			'templates': templates,
+		}
+		data = json.dumps(document, separators=(',', ':')).encode('utf-8')
+		return TAG_DATABASE_MAGIC + bytearray([TAG_DATABASE_VERSION]) + zlib.compress(data)
+
+	@classmethod
+	def from_bytes(cls, data):
+		""" Deserialize a database
+
+		:param data: the content of the file
+		:return: the TagDatabase, None if data is not a database of this version
+		"""
+		header = len(TAG_DATABASE_MAGIC)
+		if data[:header] != TAG_DATABASE_MAGIC or bytearray(data[header:header + 1]) != bytearray([TAG_DATABASE_VERSION]):
+			return None
+		try:
+			document = _native(json.loads(zlib.decompress(data[header + 1:]).decode('utf-8')))
+			columns = document['columns']
+			symbols = [dict(zip(columns, row)) for row in document['symbols']]
+			templates = {}
+			struct_handles = {}
+			for instance_id, struct_size, handle, name, members in document['templates']:
+				template = {'name': name, 'members': [dict(zip(_MEMBER_KEYS, member)) for member in members]}
+				templates[instance_id] = (template, struct_size)
+				if handle is not None:
+					struct_handles[handle] = instance_id
+		except (ValueError, KeyError, TypeError, zlib.error):
+			return None
+		return cls(document['signature'], symbols, templates, struct_handles)
+
+	def save(self, path):
+		""" Write the database to path, through a temporary file so a reader never finds it half written
+		"""
+		temporary = path + '.tmp'
+		with open(temporary, 'wb') as database_file:
+			database_file.write(self.to_bytes())
+		if os.path.exists(path) and not hasattr(os, 'replace'):
+			os.remove(path)
+		getattr(os, 'replace', os.rename)(temporary, path)
+
+	@classmethod
+	def load(cls, path):
+		""" Read the database at path
+
+		:return: the TagDatabase, None if the file does not exist or is not a valid database
+		"""
+		try:
+			with open(path, 'rb') as database_file:
+				data = database_file.read()
+		except (IOError, OSError):
+			return None
+		return cls.from_bytes(data)
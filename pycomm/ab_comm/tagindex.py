@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+#
+# tagindex.py - Index of the tag names of Rockwell PLCs
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+
+import re
+from pycomm.ab_comm.udt import HIDDEN_MEMBER
+
+_COMPONENT = re.compile(r'\[[^\]]*\]|[^.\[]+')
+
+
+def split_tag_name(name):
+	""" Split a tag name in its components: the names between the dots and the brackets with their indexes
+
+	'Program:Main.Line[2].Speed' gives ['Program:Main', 'Line', '[2]', 'Speed']
+	"""
+	return _COMPONENT.findall(name)
+
+
+def _join(prefix, component):
+	if not prefix:
+		return component
+	if component.startswith('['):
+		return prefix + component
+	return prefix + '.' + component
+
+
+def _indexes(dimensions):
+	""" The index components of all the elements of an array with the given dimensions, in row-major order
+	"""
+	indexes = ['']
+	for size in dimensions:
+		indexes = [index + ',' + str(i) if index else str(i) for index in indexes for i in range(size)]
+	return ['[' + index + ']' for index in indexes]
+
+
+class _Node(object):
+	__slots__ = ('children', 'name')
+
+	def __init__(self):
+		self.children = {}  # lower case component -> _Node
+		self.name = None    # the tag name ending here, None if only a part of longer names
+
+
+class TagIndex(object):
+	"""
+	Trie of tag names over their components, for prefix and wildcard queries.
+
+	The names are indexed by component, so 'Line3.Station*' only visits the children of Line3. Like the controller,
+	the index does not care about the case of the names, and it returns them as they have been added. The results
+	are lists of names that read_tag takes as they are.
+	"""
+	def __init__(self, symbols=(), templates=None, expand_arrays=False):
+		"""
+		:param symbols: the tags to index, as returned by get_tag_list, iter_tag_list or get_symbol_table
+		:param templates: dictionary instance_id -> (template, struct_size), as TemplateCache.templates; the members of
+						  the structure tags with a template there are indexed too
+		:param expand_arrays: if True every element of the arrays is indexed, and through the elements the members
+							  of the arrays of structures
+		"""
+		self._root = _Node()
+		self._count = 0
+		self.add_symbols(symbols, templates, expand_arrays)
+
+	def __len__(self):
+		return self._count
+
+	def __contains__(self, name):
+		node = self._node(split_tag_name(name))
+		return node is not None and node.name is not None
+
+	def add(self, name):
+		""" Index a name
+		"""
+		node = self._root
+		for component in split_tag_name(name):
+			key = component.lower()
+			child = node.children.get(key)
+			if child is None:
+				child = node.children[key] = _Node()
+			node = child
+		if node.name is None:
+			self._count += 1
+		node.name = name
+
+	def add_symbols(self, symbols, templates=None, expand_arrays=False):
+		""" Index tags and their members, with the arguments of the constructor
+		"""
+		templates = templates or {}
+		for symbol in symbols:
+			if isinstance(symbol, list):
+				self.add_symbols(symbol, templates, expand_arrays)
+				continue
+			symbol_type = symbol['symbol_type']
+			instance_id = symbol_type & 0b0000111111111111 if symbol_type & 0b1000000000000000 else None
+			self._add_tag(symbol['tag_name'], instance_id, symbol.get('array_dimensions', ()), templates, expand_arrays)
+
+	def _add_tag(self, name, instance_id, dimensions, templates, expand_arrays):
+		""" Index a tag or a member and what is below it
+		"""
+		self.add(name)
+		if dimensions:
+			if expand_arrays:
+				for index in _indexes(dimensions):
+					self._add_tag(name + index, instance_id, (), templates, expand_arrays)
+			return
+		if instance_id is None or instance_id not in templates:
+			return
+		for member in templates[instance_id][0]['members']:
+			if member['tag_name'].startswith(HIDDEN_MEMBER):
+				continue
+			member_instance = member['data_type'] if member['tag_type'] == 'struct' else None
+			member_dimensions = (member['info'],) if member['dimensions'] else ()
+			self._add_tag(_join(name, member['tag_name']), member_instance, member_dimensions, templates, expand_arrays)
+
+	def _node(self, components):
+		node = self._root
+		for component in components:
+			node = node.children.get(component.lower())
+			if node is None:
+				return None
+		return node
+
+	@staticmethod
+	def _names_below(node, names):
+		""" Add to names the names of node and of all the nodes below it
+		"""
+		stack = [node]
+		while stack:
+			node = stack.pop()
+			if node.name is not None:
+				names.append(node.name)
+			stack.extend(node.children.values())
+
+	def prefix(self, prefix):
+		""" Get the names that start with prefix
+
+		The last component of prefix can be incomplete: 'Line3.Sta' finds 'Line3.Station1.Speed' and 'Line3.Start'.
+		A prefix that ends with '.' or ']' finds only what is below the name before it.
+
+		:return: the sorted list of the names
+		"""
+		components = split_tag_name(prefix)
+		complete = not prefix or prefix.endswith('.') or prefix.endswith(']')
+		if complete:
+			node = self._node(components)
+			starts = [] if node is None else [node]
+		else:
+			parent = self._node(components[:-1])
+			last = components[-1].lower()
+			starts = [] if parent is None else [child for key, child in parent.children.items() if key.startswith(last)]
+		names = []
+		for node in starts:
+			if complete:
+				for child in node.children.values():
+					self._names_below(child, names)
+			else:
+				self._names_below(node, names)
+		names.sort()
+		return names
+
+	def glob(self, pattern):
+		""" Get the names that match a pattern
+
+		Within a component '*' matches any text and '?' one character, so 'Line3.Station*.Speed' and 'Recipes[*].Id'
+		are patterns. A '**' component matches any number of components: 'Line3.**' finds all the names below Line3.
+
+		:return: the sorted list of the names
+		"""
+		matchers = []
+		for component in split_tag_name(pattern):
+			if component == '**':
+				matchers.append(None)
+			elif '*' in component or '?' in component:
+				regex = ''.join('.*' if char == '*' else '.' if char == '?' else re.escape(char) for char in component.lower())
+				matchers.append(re.compile(regex + r'\Z').match)
+			else:
+				matchers.append(component.lower())
+
+		names = []
+		seen = set()
+		stack = [(self._root, 0)]
+		while stack:
+			node, position = stack.pop()
+			if position == len(matchers):
+				if node.name is not None and id(node) not in seen:
+					seen.add(id(node))
+					names.append(node.name)
+				continue
+			matcher = matchers[position]
+			if matcher is None:
+				# '**' matches no component, or one more component and stays
+				stack.append((node, position + 1))
+				stack.extend((child, position) for child in node.children.values())
+			elif callable(matcher):
+				stack.extend((child, position + 1) for key, child in node.children.items() if matcher(key))
+			else:
+				child = node.children.get(matcher)
+				if child is not None:
+					stack.append((child, position + 1))
+		names.sort()
+		return names
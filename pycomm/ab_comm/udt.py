@@ -0,0 +1,479 @@
+# -*- coding: utf-8 -*-
+#
+# udt.py - Decoding of the structures (UDT) of Rockwell PLCs
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+import struct
+import threading
+from pycomm.cip.cip_base import *
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# The members that hold the bits of the BOOL members have hidden names starting with this prefix
+HIDDEN_MEMBER = 'ZZZZZZZZZZ'
+
+
+class UdtCodec(object):
+	"""
+	Decoder of a structure compiled from its template by compile_udt.
+
+	The atomic members of the structure, nested structures and member arrays included, are laid out on a single struct
+	and decode(buf, offset=0) returns the structure as a dictionary member name -> value, with a list for the member
+	arrays and a dictionary for the nested structures. The BOOL members are taken from the bits of their host byte.
+
+	view(buf, offset=0) wraps the data of a structure in an instance of view_class, a UdtView that decodes a member
+	the first time it is read.
+
+	When numpy is installed, dtype is the structured dtype of the structure, used by read_array to return arrays of
+	structures as record arrays. It has no field for the BOOL members, which are bits of their hidden host members:
+	bool_field gets them from the record array.
+	"""
+	def __init__(self, name, size, layout, decode, source, view_class=None, dtype=None, bits=None):
+		self.name = name
+		self.size = size
+		self.layout = layout
+		self.decode = decode
+		self.source = source
+		self.view_class = view_class
+		self.dtype = dtype
+		self.bits = bits or {}
+
+	def bool_field(self, records, name):
+		""" Get a BOOL member of an array of structures read as a record array
+
+		:param records: the record array returned by read_array
+		:param name: the name of the BOOL member, with the names of the nested structures separated by '.'
+		:return: an array with 1 where the bit is set and 0 elsewhere
+		"""
+		host_path, bit = self.bits[name]
+		host = records
+		for field in host_path:
+			host = host[field]
+		return (host >> bit) & 1
+
+	def decode_array(self, buf, count=None, offset=0):
+		""" Decode an array of structures
+
+		:param buf: the data of the array, as returned by read_array
+		:param count: the number of elements, all the elements in buf when None
+		:param offset: where the first element starts in buf
+		:return: the list of the elements
+		"""
+		if count is None:
+			count = (len(buf) - offset) // self.size
+		decode = self.decode
+		return [decode(buf, offset + index * self.size) for index in range(count)]
+
+	def view(self, buf, offset=0):
+		""" Wrap a structure without decoding it
+
+		:param buf: the data of the structure, as returned by read_tag
+		:param offset: where the structure starts in buf
+		:return: the UdtView of the structure
+		"""
+		return self.view_class(buf, offset)
+
+	def view_array(self, buf, count=None, offset=0):
+		""" Wrap an array of structures without decoding it
+
+		Same arguments of decode_array
+		:return: the list of the UdtView of the elements
+		"""
+		if count is None:
+			count = (len(buf) - offset) // self.size
+		return [self.view_class(buf, offset + index * self.size) for index in range(count)]
+
+
+class UdtView(object):
+	"""
+	Base of the classes made by compile_udt for the structures of a template.
+
+	A view keeps the buffer of the data and the offset of the structure. Every member is an attribute decoded from
+	the buffer when it is first read and then kept in a slot, so reading a few members of a large structure does not
+	pay for the others. Nested structures are views on the same buffer.
+	"""
+	__slots__ = ('_buf', '_offset')
+	_members = ()
+
+	def __init__(self, buf, offset=0):
+		self._buf = buf
+		self._offset = offset
+
+	def __getitem__(self, name):
+		if name not in self._members:
+			raise KeyError(name)
+		return getattr(self, name)
+
+	def __iter__(self):
+		return iter(self._members)
+
+	def __len__(self):
+		return len(self._members)
+
+	def to_dict(self):
+		""" Decode all the members
+
+		:return: the same dictionary returned by UdtCodec.decode
+		"""
+		result = {}
+		for name in self._members:
+			value = getattr(self, name)
+			if isinstance(value, UdtView):
+				value = value.to_dict()
+			elif isinstance(value, list) and value and isinstance(value[0], UdtView):
+				value = [element.to_dict() for element in value]
+			result[name] = value
+		return result
+
+	def __repr__(self):
+		return '{0}({1})'.format(self.__class__.__name__, ', '.join(self._members))
+
+
+class TemplateCache(object):
+	"""
+	The attributes of the Template Objects (get_tag_struct) and the templates (read_template) read from a controller,
+	safe to share between threads.
+
+	The entries are keyed by template instance, so all the tags and members of a structure share them. templates holds
+	the templates added with their nested ones, as compile_udt takes them, and struct_handles gives the template
+	instance of the structure handle found in the read replies.
+
+	A thread that looks up an entry another thread is reading waits for it instead of reading it again. So lookup is
+	called without the lock of the driver, which only read holds. AsyncDriver has no need of it: its lock serializes
+	the requests, so a task finds in the cache the entry read by another one.
+	"""
+	def __init__(self):
+		self.templates = {}         # instance_id -> (template, struct_size)
+		self.struct_handles = {}    # struct_handle -> instance_id
+		self.hits = 0
+		self.misses = 0
+		self.coalesced = 0
+		self._entries = {}          # (kind, instance_id) -> entry
+		self._pending = {}          # (kind, instance_id) -> threading.Event set when the entry has been read
+		self._lock = threading.Lock()
+
+	def __len__(self):
+		return len(self._entries)
+
+	def get(self, kind, instance_id):
+		""" Get an entry
+
+		:param kind: 'struct' for the reply of get_tag_struct, 'template' for the reply of read_template
+		:return: the entry, None if it is not in the cache
+		"""
+		with self._lock:
+			entry = self._entries.get((kind, instance_id))
+			if entry is not None:
+				self.hits += 1
+			return entry
+
+	def put(self, kind, instance_id, entry):
+		""" Keep an entry read from the controller
+		"""
+		with self._lock:
+			self.misses += 1
+			self._entries[(kind, instance_id)] = entry
+
+	def struct_size(self, instance_id):
+		""" Get the size of the structures of a template, if its template or its attributes are in the cache
+
+		:return: the size in bytes, None if it is not known
+		"""
+		with self._lock:
+			if instance_id in self.templates:
+				return self.templates[instance_id][1]
+			entry = self._entries.get(('struct', instance_id))
+		if entry is not None:
+			return entry.get('struct_size')
+		return None
+
+	def lookup(self, kind, instance_id, read, wait=True):
+		""" Get an entry, calling read() to read it from the controller if it is not in the cache
+
+		:param read: the function that reads the entry, it returns (entry, True if the entry is complete). An entry not
+					 complete is returned but not kept.
+		:param wait: False if the caller cannot wait for another thread reading the entry, like one holding the lock of
+					 the driver: it reads the entry by itself
+		:return: the entry
+		"""
+		key = (kind, instance_id)
+		while True:
+			with self._lock:
+				if key in self._entries:
+					self.hits += 1
+					return self._entries[key]
+				reading = self._pending.get(key)
+				if reading is None:
+					reading = self._pending[key] = threading.Event()
+					break
+				if not wait:
+					reading = None
+					break
+				self.coalesced += 1
+			# If the other reader fails the entry is still missing, and the next loop reads it
+			reading.wait()
+
+		try:
+			entry, complete = read()
+			if complete:
+				self.put(kind, instance_id, entry)
+		finally:
+			if reading is not None:
+				with self._lock:
+					del self._pending[key]
+				reading.set()
+		return entry
+
+	def add_template(self, instance_id, template, struct_size, struct_handle):
+		""" Add a template to templates, once its nested templates are being added too
+		"""
+		with self._lock:
+			self.templates[instance_id] = (template, struct_size)
+			self.struct_handles[struct_handle] = instance_id
+
+	def load(self, templates, struct_handles):
+		""" Drop all the entries and take the templates given, like the ones of a tag database
+
+		:param templates: dictionary instance_id -> (template, struct_size)
+		:param struct_handles: dictionary struct_handle -> instance_id
+		"""
+		with self._lock:
+			self._entries.clear()
+			self.templates = dict(templates)
+			self.struct_handles = dict(struct_handles)
+
+	def stats(self):
+		""" Get the statistics of the cache
+
+		:return: a dictionary with hits, misses (the entries read from the controller), coalesced (the lookups that
+				 waited for the same entry read by another thread), size and templates (the number of templates ready
+				 for compile_udt)
+		"""
+		with self._lock:
+			return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced, 'size': len(self._entries),
+					'templates': len(self.templates)}
+
+
+def template_name(template):
+	""" The name of a template without the ';' suffix that the controller appends
+	"""
+	return template['name'].split(';', 1)[0]
+
+
+def _compile_members(instance_id, base, templates, fields):
+	""" Add the atomic members of template instance_id placed at base to fields
+
+	:param fields: the list of (offset, format) of the fields of the struct, in the order they are found
+	:return: the tree of the values: ('dict', [(name, node)]), ('list', [node]), ('slice', field, count),
+			 ('field', field) or ('bit', field, bit)
+	"""
+	template, size = templates[instance_id]
+	hosts = {}      # offset -> field of the one byte members, where the BOOL members take their bits
+	items = []
+	for position, member in enumerate(template['members']):
+		if member['tag_type'] == 'atomic' and member['data_type'] == 'BOOL' and not member['dimensions']:
+			continue
+		offset = base + member['offset']
+		count = member['info'] if member['dimensions'] else 1
+		if member['tag_type'] == 'struct':
+			nested_size = templates[member['data_type']][1]
+			nodes = [_compile_members(member['data_type'], offset + index * nested_size, templates, fields)
+					 for index in range(count)]
+			node = ('list', nodes) if member['dimensions'] else nodes[0]
+		else:
+			typ = member['data_type']
+			element_size = DATA_FUNCTION_SIZE[typ]
+			first = len(fields)
+			for index in range(count):
+				fields.append((offset + index * element_size, data_format(typ)))
+			if element_size == 1:
+				hosts[offset] = first
+			node = ('slice', first, count) if member['dimensions'] else ('field', first)
+		if not member['tag_name'].startswith(HIDDEN_MEMBER):
+			items.append((position, member['tag_name'], node))
+
+	for position, member in enumerate(template['members']):
+		if member['tag_type'] == 'atomic' and member['data_type'] == 'BOOL' and not member['dimensions']:
+			offset = base + member['offset']
+			if offset not in hosts:
+				hosts[offset] = len(fields)
+				fields.append((offset, 'B'))
+			items.append((position, member['tag_name'], ('bit', hosts[offset], member['info'])))
+
+	items.sort(key=lambda item: item[0])
+	return 'dict', [(name, node) for position, name, node in items]
+
+
+def _render(node, rank):
+	""" Write the Python expression that builds the value of node from the tuple v of the fields
+	"""
+	kind = node[0]
+	if kind == 'dict':
+		return '{' + ', '.join('{0!r}: {1}'.format(name, _render(child, rank)) for name, child in node[1]) + '}'
+	if kind == 'list':
+		return '[' + ', '.join(_render(child, rank) for child in node[1]) + ']'
+	if kind == 'slice':
+		return 'list(v[{0}:{1}])'.format(rank[node[1]], rank[node[1]] + node[2])
+	if kind == 'field':
+		return 'v[{0}]'.format(rank[node[1]])
+	return '(v[{0}] >> {1}) & 1'.format(rank[node[1]], node[2])
+
+
+def _lazy_member(slot, decode):
+	""" Make the property of a member of a UdtView, which decodes the member and keeps it in slot
+	"""
+	def get(self):
+		try:
+			return slot.__get__(self, None)
+		except AttributeError:
+			value = decode(self._buf, self._offset)
+			slot.__set__(self, value)
+			return value
+	return property(get)
+
+
+def _member_decoder(member, templates, view_classes):
+	""" Make the function decode(buf, offset) of a member of a structure placed at offset
+	"""
+	member_offset = member['offset']
+	if member['tag_type'] == 'struct':
+		nested = _view_class(member['data_type'], templates, view_classes)
+		if not member['dimensions']:
+			return lambda buf, offset: nested(buf, offset + member_offset)
+		nested_size = templates[member['data_type']][1]
+		count = member['info']
+		return lambda buf, offset: [nested(buf, offset + member_offset + index * nested_size)
+									for index in range(count)]
+	if member['data_type'] == 'BOOL' and not member['dimensions']:
+		bit = member['info']
+		unpack_host = struct.Struct('<B').unpack_from
+		return lambda buf, offset: (unpack_host(buf, offset + member_offset)[0] >> bit) & 1
+	if member['dimensions']:
+		unpack = struct.Struct('<{0}{1}'.format(member['info'], data_format(member['data_type']))).unpack_from
+		return lambda buf, offset: list(unpack(buf, offset + member_offset))
+	unpack = struct.Struct('<' + data_format(member['data_type'])).unpack_from
+	return lambda buf, offset: unpack(buf, offset + member_offset)[0]
+
+
+def _view_class(instance_id, templates, view_classes):
+	""" Make the UdtView class of template instance_id, or take it from view_classes if already made
+	"""
+	if instance_id in view_classes:
+		return view_classes[instance_id]
+	template, size = templates[instance_id]
+	members = [member for member in template['members'] if not member['tag_name'].startswith(HIDDEN_MEMBER)]
+	slots = tuple('_m{0}'.format(index) for index in range(len(members)))
+	cls = type(str(template_name(template)), (UdtView,), {
+		'__slots__': slots,
+		'_members': tuple(member['tag_name'] for member in members)})
+	view_classes[instance_id] = cls
+	for slot, member in zip(slots, members):
+		setattr(cls, member['tag_name'], _lazy_member(cls.__dict__[slot],
+													  _member_decoder(member, templates, view_classes)))
+	return cls
+
+
+def _bool_members(instance_id, templates, path, bits):
+	""" Add to bits the BOOL members of template instance_id and of its nested structures, which are not arrays
+
+	:param path: the field names leading to the template, from the outer structure
+	:param bits: dictionary dotted name -> (field names of the host member, bit)
+	"""
+	template, size = templates[instance_id]
+	hosts = {}
+	for member in template['members']:
+		if member['tag_type'] == 'atomic' and not member['dimensions'] and member['data_type'] != 'BOOL' and \
+				DATA_FUNCTION_SIZE[member['data_type']] == 1:
+			hosts[member['offset']] = member['tag_name']
+	for member in template['members']:
+		name = member['tag_name']
+		if member['tag_type'] == 'struct' and not member['dimensions']:
+			_bool_members(member['data_type'], templates, path + (name,), bits)
+		elif member['tag_type'] == 'atomic' and member['data_type'] == 'BOOL' and not member['dimensions'] and \
+				member['offset'] in hosts:
+			bits['.'.join(path + (name,))] = (path + (hosts[member['offset']],), member['info'])
+
+
+def _udt_dtype(instance_id, templates):
+	""" Make the numpy structured dtype of template instance_id, with the offsets of the members and the size of the
+	structure as itemsize
+	"""
+	template, size = templates[instance_id]
+	names = []
+	formats = []
+	offsets = []
+	for member in template['members']:
+		if member['tag_type'] == 'struct':
+			fmt = _udt_dtype(member['data_type'], templates)
+		elif member['data_type'] == 'BOOL' and not member['dimensions']:
+			continue
+		else:
+			fmt = numpy.dtype(DATA_DTYPE[member['data_type']])
+		if member['dimensions']:
+			fmt = (fmt, (member['info'],))
+		names.append(member['tag_name'])
+		formats.append(fmt)
+		offsets.append(member['offset'])
+	return numpy.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': size})
+
+
+def compile_udt(instance_id, templates):
+	""" Compile the decoder of the structures of template instance_id
+
+	:param instance_id: the template instance, the data type of a structure tag or member
+	:param templates: dictionary instance_id -> (template, struct_size) of the template and of all the nested ones,
+					  the template as returned by Driver.read_template and struct_size from Driver.get_tag_struct
+	:return: the UdtCodec
+	"""
+	fields = []
+	tree = _compile_members(instance_id, 0, templates, fields)
+
+	# The struct takes the fields in the order of their offsets, with pad bytes in between
+	order = sorted(range(len(fields)), key=lambda field: fields[field][0])
+	rank = [0] * len(fields)
+	fmt = ['<']
+	position = 0
+	for index, field in enumerate(order):
+		offset, field_format = fields[field]
+		if offset < position:
+			raise CipError("Overlapping members at offset {0} in template {1}".format(offset, instance_id))
+		if offset > position:
+			fmt.append('{0}x'.format(offset - position))
+		fmt.append(field_format)
+		position = offset + struct.calcsize('<' + field_format)
+		rank[field] = index
+	layout = struct.Struct(''.join(fmt))
+
+	source = 'def decode(buf, offset=0):\n\tv = unpack_from(buf, offset)\n\treturn {0}\n'.format(_render(tree, rank))
+	namespace = {'unpack_from': layout.unpack_from}
+	exec(compile(source, '<udt {0}>'.format(instance_id), 'exec'), namespace)
+	bits = {}
+	_bool_members(instance_id, templates, (), bits)
+	dtype = _udt_dtype(instance_id, templates) if numpy is not None else None
+	view_class = _view_class(instance_id, templates, {})
+	template, size = templates[instance_id]
+	return UdtCodec(template_name(template), size, layout, namespace['decode'], source, view_class, dtype, bits)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# valuecache.py - Cache of the values read from Rockwell PLCs
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+
+
+def _base_name(tag):
+	""" The name of the tag without members and indexes
+	"""
+	return tag.split('.', 1)[0].split('[', 1)[0]
+
+
+class ValueCache(object):
+	"""
+	The values of the tags read, served again until they are older than their maximum age.
+
+	The maximum age of single tags or groups of tags is set by set_max_age; default_age is used for the others. A tag
+	with maximum age None, or 0, is not kept. The entries are invalidated by base name, so that a write to a member
+	or an element of a tag drops all the values read from that tag.
+
+	:param default_age: the maximum age in seconds of the tags without their own
+	"""
+	def __init__(self, default_age=None):
+		self.default_age = default_age
+		self.hits = 0
+		self.misses = 0
+		self._ages = {}         # tag -> maximum age
+		self._values = {}       # tag -> (value, data type, time read)
+		self._names = {}        # base name -> set of the tags kept
+
+	def __len__(self):
+		return len(self._values)
+
+	def active(self):
+		""" True if any tag can be kept
+		"""
+		return bool(self.default_age or self._ages)
+
+	def max_age(self, tag):
+		age = self._ages.get(tag)
+		return self.default_age if age is None else age
+
+	def set_max_age(self, tags, max_age):
+		""" Set the maximum age of tags, None to use default_age again
+
+		:param tags: a tag name or a list of them
+		"""
+		if not isinstance(tags, list):
+			tags = [tags]
+		for tag in tags:
+			if max_age is None:
+				self._ages.pop(tag, None)
+			else:
+				self._ages[tag] = max_age
+			if not self.max_age(tag):
+				self.invalidate(tag)
+
+	def get(self, tag, now):
+		""" Get the value of a tag if it is not older than its maximum age
+
+		:return: the tuple (value, data type), None if the tag is not kept or too old
+		"""
+		max_age = self.max_age(tag)
+		if not max_age:
+			return None
+		entry = self._values.get(tag)
+		if entry is not None and now - entry[2] <= max_age:
+			self.hits += 1
+			return entry[0], entry[1]
+		self.misses += 1
+		return None
+
+	def put(self, tag, value, typ, now):
+		""" Keep the value of a tag read at now, if the tag has a maximum age
+		"""
+		if not self.max_age(tag) or value is None:
+			return
+		self._values[tag] = (value, typ, now)
+		self._names.setdefault(_base_name(tag), set()).add(tag)
+
+	def split(self, tags, now):
+		""" Split a list of tags in the ones served by the cache and the ones to read
+
+		:return: the list of the results of read_tag, None for the tags to read, and the list of the tags to read
+		"""
+		results = []
+		stale = []
+		for tag in tags:
+			entry = self.get(tag, now)
+			if entry is None:
+				results.append(None)
+				stale.append(tag)
+			else:
+				results.append((tag, entry[0], entry[1]))
+		return results, stale
+
+	def merge(self, results, tag_list, now):
+		""" Put the results of the tags read in the places left by split, and keep them
+
+		:param results: the list returned by split
+		:param tag_list: the results of read_tag for the tags to read returned by split
+		:return: results
+		"""
+		read = iter(tag_list)
+		for index, result in enumerate(results):
+			if result is None:
+				result = results[index] = next(read)
+				self.put(result[0], result[1], result[2], now)
+		return results
+
+	def invalidate(self, tag=None):
+		""" Drop the values read from a tag, all the values if tag is None
+		"""
+		if tag is None:
+			self._values.clear()
+			self._names.clear()
+			return
+		for name in self._names.pop(_base_name(tag), ()):
+			self._values.pop(name, None)
+
+	def stats(self):
+		""" Get the statistics of the cache
+
+		:return: a dictionary with hits, misses and values (the number of tags kept)
+		"""
+		return {'hits': self.hits, 'misses': self.misses, 'values': len(self._values)}
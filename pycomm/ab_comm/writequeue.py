@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+#
+# writequeue.py - Coalesced writes to the tags of Rockwell PLCs
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+
+
+import logging
+import struct
+import threading
+from collections import OrderedDict, deque
+from pycomm.cip.cip_base import PACK_DATA_FUNCTION
+from pycomm.cip.cip_const import MULTIPLE_SERVICE_OVERHEAD
+from pycomm.ab_comm.clx import _clock
+
+
+class WriteFuture(object):
+	"""
+	The completion of a write queued in a WriteQueue.
+
+	The result is the tuple returned by write_tag for the tag, (tag name, value, data type, 'GOOD' or 'BAD'), with
+	the value actually written: the last one queued for the tag before the flush.
+	"""
+	def __init__(self):
+		self._event = threading.Event()
+		self._lock = threading.Lock()
+		self._result = None
+		self._callbacks = []
+
+	def done(self):
+		return self._event.is_set()
+
+	def result(self, timeout=None):
+		""" Wait for the write to complete
+
+		:param timeout: the seconds to wait, None to wait until the write is flushed
+		:return: the result of the write, None if it is not complete within timeout
+		"""
+		self._event.wait(timeout)
+		return self._result
+
+	def add_done_callback(self, callback):
+		""" Call callback(future) when the write completes, at once if it is already complete
+		"""
+		with self._lock:
+			if not self._event.is_set():
+				self._callbacks.append(callback)
+				return
+		callback(self)
+
+	def set_result(self, result):
+		""" Complete the write and call the callbacks, the first result only is kept
+		"""
+		with self._lock:
+			if self._event.is_set():
+				return
+			self._result = result
+			self._event.set()
+			callbacks, self._callbacks = self._callbacks, []
+		for callback in callbacks:
+			callback(self)
+
+
+class BaseWriteQueue(object):
+	"""
+	The coalescing of the writes shared by WriteQueue and writequeue_async.AsyncWriteQueue, without the flushing.
+
+	The writes of different tags queued together make a batch, sent by one write_tag. A write that would not fit the
+	packet of the batch closes it: the batch is ready to be flushed at once, before the write, which starts the next
+	batch. So every batch closed is one full packet. A tag written again while its batch is open is sent once, with
+	its last value, and all the writes of the tag complete with its result.
+
+	:param driver: the open driver to write with
+	:param window: the seconds a write can wait for the others
+	"""
+	def __init__(self, driver, window=0.01):
+		self.logger = logging.getLogger('ab_comm.writequeue')
+		self.driver = driver
+		self.window = window
+		self.writes = 0
+		self.coalesced = 0
+		self.flushes = 0
+		self._pending = OrderedDict()   # tag name -> [value, data type, futures, size of the service request]
+		self._size = MULTIPLE_SERVICE_OVERHEAD
+		self._first = None              # when the oldest write pending was queued
+		self._ready = deque()           # the batches closed, each one a dictionary as _pending
+		self._condition = threading.Condition()
+
+	def _service_size(self, tag, value, typ):
+		""" The size of the Write Tag service request of a write
+
+		:return: the size in bytes, None if the write cannot be sent
+		"""
+		rp = self.driver._create_tag_rp(tag, multi_requests=True)
+		if rp is None:
+			return None
+		try:
+			# service, request path, data type, number of elements and value
+			return 5 + len(rp) + len(PACK_DATA_FUNCTION[typ](value))
+		except (LookupError, struct.error):
+			return None
+
+	def _close_batch(self):
+		""" Make the pending writes a batch ready to be flushed
+		"""
+		self._ready.append(self._pending)
+		self._pending = OrderedDict()
+		self._size = MULTIPLE_SERVICE_OVERHEAD
+		self._first = None
+
+	def _queue(self, tag, value, typ, future):
+		""" Add a write to the pending ones
+
+		:return: True if a batch is ready to be flushed
+		"""
+		size = self._service_size(tag, value, typ)
+		if size is None:
+			self.logger.warning("Write of {0} type {1} rejected".format(tag, typ))
+			future.set_result((tag, value, typ, 'BAD'))
+			return False
+		with self._condition:
+			self.writes += 1
+			entry = self._pending.get(tag)
+			grown = 2 + size if entry is None else size - entry[3]
+			if self._pending and self._size + grown > self.driver.get_connection_size():
+				# The write would not fit the packet: the batch is closed before it
+				self._close_batch()
+				entry = None
+				grown = 2 + size
+			self._size += grown
+			if entry is None:
+				self._pending[tag] = [value, typ, [future], size]
+			else:
+				# Last value wins
+				self.coalesced += 1
+				entry[0], entry[1], entry[3] = value, typ, size
+				entry[2].append(future)
+			if self._first is None:
+				self._first = _clock()
+			self._condition.notify()
+			return bool(self._ready)
+
+	def _take(self):
+		""" Take the next batch to flush: the first one ready, or the pending writes
+
+		:return: the list of the writes for write_tag and the dictionary of the batch, or None and None
+		"""
+		with self._condition:
+			if self._ready:
+				batch = self._ready.popleft()
+			elif self._pending:
+				batch = self._pending
+				self._pending = OrderedDict()
+				self._size = MULTIPLE_SERVICE_OVERHEAD
+				self._first = None
+			else:
+				return None, None
+		return [(tag, entry[0], entry[1]) for tag, entry in batch.items()], batch
+
+	def _complete(self, batch, results):
+		""" Complete the futures of the writes flushed with the results of write_tag
+		"""
+		self.flushes += 1
+		by_tag = {}
+		if results:
+			by_tag = dict((result[0], result) for result in results)
+		for tag, entry in batch.items():
+			result = by_tag.get(tag, (tag, entry[0], entry[1], 'BAD'))
+			for future in entry[2]:
+				if not future.done():
+					future.set_result(result)
+
+	def _wait(self):
+		""" The seconds until the next batch is due, 0 if one is ready, None if there are no writes
+		"""
+		if self._ready:
+			return 0.0
+		if self._first is None:
+			return None
+		return max(0.0, self._first + self.window - _clock())
+
+	def stats(self):
+		""" Get the statistics of the queue
+
+		:return: a dictionary with writes (queued), coalesced (replaced by a later write of the same tag), flushes
+				 (write_tag calls) and pending (the tags waiting for the flush)
+		"""
+		with self._condition:
+			pending = len(self._pending) + sum(len(batch) for batch in self._ready)
+		return {'writes': self.writes, 'coalesced': self.coalesced, 'flushes': self.flushes, 'pending': pending}
+
+
+class WriteQueue(BaseWriteQueue):
+	"""
+	Collect the writes of single tags and send them together, in Multiple Service Packets.
+
+	The writes queued within window seconds from the first one are flushed together with one write_tag, and a
+	batch that fills a packet is flushed at once; see BaseWriteQueue.
+
+	The writes are flushed by flush, by poll in the loop of the application, or by the thread started with start.
+	write_tag holds the lock of the driver, so the thread and the other users of the driver can share it.
+
+	:param driver: the open clx.Driver to write with
+	:param window: the seconds a write can wait for the others
+	"""
+	def __init__(self, driver, window=0.01):
+		BaseWriteQueue.__init__(self, driver, window)
+		self._thread = None
+		self._running = False
+
+	def write(self, tag, value, typ):
+		""" Queue the write of a tag
+
+		:param tag: the tag name
+		:param value: the value to write
+		:param typ: the data type, as passed to write_tag
+		:return: the WriteFuture of the write
+		"""
+		future = WriteFuture()
+		self._queue(tag, value, typ, future)
+		return future
+
+	def flush(self):
+		""" Write all the pending writes now
+
+		:return: the number of tags written
+		"""
+		written = 0
+		while True:
+			tags, batch = self._take()
+			if not tags:
+				return written
+			results = self.driver.write_tag(tags)
+			self._complete(batch, results)
+			written += len(batch)
+
+	def poll(self):
+		""" Flush the batches that are due
+
+		For the applications with their own loop: call it again within the time returned.
+
+		:return: the seconds until the next batch is due, None if there are no writes
+		"""
+		while self._wait() == 0.0:
+			tags, batch = self._take()
+			if not tags:
+				break
+			results = self.driver.write_tag(tags)
+			self._complete(batch, results)
+		return self._wait()
+
+	def _run(self):
+		while True:
+			with self._condition:
+				while self._running and self._wait() != 0.0:
+					self._condition.wait(self._wait())
+				if not self._running:
+					break
+			self.poll()
+		self.flush()
+
+	def start(self):
+		""" Start a thread that flushes the writes when they are due
+		"""
+		if self._thread is not None:
+			return
+		self._running = True
+		self._thread = threading.Thread(target=self._run, name='ab_comm.writequeue')
+		self._thread.daemon = True
+		self._thread.start()
+
+	def stop(self):
+		""" Flush the pending writes and stop the thread started with start
+		"""
+		if self._thread is None:
+			return
+		with self._condition:
+			self._running = False
+			self._condition.notify()
+		self._thread.join()
+		self._thread = None
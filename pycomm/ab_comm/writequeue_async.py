@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#
+# writequeue_async.py - Coalesced writes to the tags of Rockwell PLCs with asyncio
+#
+#
+# Copyright (c) 2014 Agostino Ruscito <ruscito@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+
+
+
+import asyncio
+
+from pycomm.ab_comm.writequeue import BaseWriteQueue
+
+
+class AsyncWriteQueue(BaseWriteQueue):
+	"""
+	asyncio version of WriteQueue, for clx_async.AsyncDriver.
+
+	Same arguments and coalescing of WriteQueue. write returns an asyncio.Future and the writes are flushed by a task
+	of the event loop, started by the first write pending; flush and poll are coroutines. The driver serializes its
+	requests, so no lock is needed to share it.
+	"""
+	def __init__(self, driver, window=0.01):
+		BaseWriteQueue.__init__(self, driver, window)
+		self._task = None
+		self._batch_ready = asyncio.Event()
+
+	def write(self, tag, value, typ):
+		""" Queue the write of a tag
+
+		Same arguments of WriteQueue.write
+
+		:return: the asyncio.Future of the write
+		"""
+		future = asyncio.get_event_loop().create_future()
+		if self._queue(tag, value, typ, future):
+			self._batch_ready.set()
+		if self._task is None and self._wait() is not None:
+			self._task = asyncio.ensure_future(self._flush_when_due())
+		return future
+
+	async def _flush_batch(self):
+		""" Write the next batch
+
+		:return: the number of tags written, 0 if there are no writes
+		"""
+		tags, batch = self._take()
+		if not tags:
+			return 0
+		results = await self.driver.write_tag(tags)
+		self._complete(batch, results)
+		return len(batch)
+
+	async def flush(self):
+		""" Write all the pending writes now
+
+		Same as WriteQueue.flush
+		"""
+		written = 0
+		while True:
+			count = await self._flush_batch()
+			if not count:
+				return written
+			written += count
+
+	async def poll(self):
+		""" Flush the batches that are due
+
+		Same as WriteQueue.poll
+		"""
+		while self._wait() == 0.0:
+			if not await self._flush_batch():
+				break
+		return self._wait()
+
+	async def _flush_when_due(self):
+		try:
+			while True:
+				wait = self._wait()
+				if wait is None:
+					return
+				if wait:
+					self._batch_ready.clear()
+					try:
+						await asyncio.wait_for(self._batch_ready.wait(), wait)
+					except asyncio.TimeoutError:
+						pass
+				await self.poll()
+		finally:
+			self._task = None
@@ -26,6 +26,8 @@
 
 import struct
 import socket
+import threading
+from collections import OrderedDict
 
 from pycomm.cip.cip_const import *
 
@@ -38,61 +40,77 @@ class SocketError(Exception):
 	pass
 
 
+class SocketTimeout(SocketError):
+	pass
+
+
 class CipError(Exception):
 	pass
 
 
+# Precompiled codecs. The unsigned ones are used for the fields of the protocol, the others for the data types
+_USINT = struct.Struct('<B')
+_UINT = struct.Struct('<H')
+_UDINT = struct.Struct('<I')
+_ULINT = struct.Struct('<Q')
+_SINT = struct.Struct('<b')
+_INT = struct.Struct('<h')
+_DINT = struct.Struct('<i')
+_LINT = struct.Struct('<q')
+_REAL = struct.Struct('<f')
+
+
 def pack_sint(n):
-	return struct.pack('B', n)
+	return _USINT.pack(n)
 
 
 def pack_uint(n):
 	"""pack 16 bit into 2 bytes little endian"""
-	return struct.pack('<H', n)
+	return _UINT.pack(n)
 
 
 def pack_dint(n):
 	"""pack 32 bit into 4 bytes little endian"""
-	return struct.pack('<I', n)
+	return _UDINT.pack(n)
 
 
 def pack_real(r):
-	"""unpack 4 bytes little endian to int"""
-	return struct.pack('<f', r)
+	"""pack a float into 4 bytes little endian"""
+	return _REAL.pack(r)
 
 
 def pack_lint(l):
-	"""unpack 4 bytes little endian to int"""
-	return struct.unpack('<q', l)
+	"""pack 64 bit into 8 bytes little endian"""
+	return _LINT.pack(l)
 
 
 def unpack_bool(st):
-	if int(struct.unpack('B', st[0])[0]) & 255:
+	if int(_USINT.unpack_from(st, 0)[0]) & 255:
 		return 1
 	return 0
 
 def unpack_sint(st):
-	return int(struct.unpack('B', st[0])[0])
+	return int(_USINT.unpack_from(st, 0)[0])
 
 
 def unpack_uint(st):
 	"""unpack 2 bytes little endian to int"""
-	return int(struct.unpack('<H', st[0:2])[0])
+	return int(_UINT.unpack_from(st, 0)[0])
 
 
 def unpack_dint(st):
 	"""unpack 4 bytes little endian to int"""
-	return int(struct.unpack('<I', st[0:4])[0])
+	return int(_UDINT.unpack_from(st, 0)[0])
 
 
 def unpack_real(st):
-	"""unpack 4 bytes little endian to int"""
-	return float(struct.unpack('<f', st[0:4])[0])
+	"""unpack 4 bytes little endian to float"""
+	return float(_REAL.unpack_from(st, 0)[0])
 
 
 def unpack_lint(st):
-	"""unpack 4 bytes little endian to int"""
-	return int(struct.unpack('<q', st[0:8])[0])
+	"""unpack 8 bytes little endian to int"""
+	return int(_LINT.unpack_from(st, 0)[0])
 
 
 def unpack_struct(st):
@@ -100,39 +118,122 @@ def unpack_struct(st):
 	return st[2:]
 
 
-PACK_DATA_FUNCTION = {
-	'BOOL': pack_sint,
-	'SINT': pack_sint,		# Signed 8-bit integer
-	'INT': pack_uint,		# Signed 16-bit integer
-	'DINT': pack_dint,		# Signed 32-bit integer
-	'REAL': pack_real,		# 32-bit floating point
-	'LINT': pack_lint,
-	'BYTE': pack_sint,		# byte string 8-bits
-	'WORD': pack_uint,		# byte string 16-bits
-	'DWORD': pack_dint,		# byte string 32-bits
-	'LWORD': pack_lint		# byte string 64-bits
-}
+def unpack_sint_from(buf, offset=0):
+	"""unpack 1 byte found at offset in buf to int"""
+	return _USINT.unpack_from(buf, offset)[0]
 
 
-UNPACK_DATA_FUNCTION = {
-	'BOOL': unpack_bool,
-	'SINT': unpack_sint,		# Signed 8-bit integer
-	'INT': unpack_uint,			# Signed 16-bit integer
-	'DINT': unpack_dint,		# Signed 32-bit integer
-	'REAL': unpack_real,		# 32-bit floating point,
-	'LINT': unpack_lint,
-	'BYTE': unpack_sint,		# byte string 8-bits
-	'WORD': unpack_uint,		# byte string 16-bits
-	'DWORD': unpack_dint,		# byte string 32-bits
-	'LWORD': unpack_lint,		# byte string 64-bits
-	'STRUCT': unpack_struct		# structure
+def unpack_uint_from(buf, offset=0):
+	"""unpack 2 bytes little endian found at offset in buf to int"""
+	return _UINT.unpack_from(buf, offset)[0]
+
+
+def unpack_dint_from(buf, offset=0):
+	"""unpack 4 bytes little endian found at offset in buf to int"""
+	return _UDINT.unpack_from(buf, offset)[0]
+
+
+def copy_bytes(buf, start=0, end=None):
+	"""return a byte string copy of buf[start:end]
+
+	Use it for any data that must outlive the reply it has been taken from. The reply can be a memoryview over the
+	receive buffer of the socket, which is overwritten by the next message.
+	"""
+	chunk = buf[start:end]
+	if isinstance(chunk, memoryview):
+		return chunk.tobytes()
+	return chunk
+
+
+def to_str(st):
+	"""return the byte string st as str, the type used for tag names"""
+	if isinstance(st, str):
+		return st
+	return st.decode('ascii')
+
+
+def to_bytes(st):
+	"""return the str st as byte string, the type used to build the messages"""
+	if isinstance(st, bytes):
+		return st
+	return st.encode('ascii')
+
+
+DATA_STRUCT = {
+	'BOOL': _USINT,
+	'SINT': _SINT,		# Signed 8-bit integer
+	'INT': _INT,		# Signed 16-bit integer
+	'DINT': _DINT,		# Signed 32-bit integer
+	'REAL': _REAL,		# 32-bit floating point
+	'LINT': _LINT,
+	'BYTE': _USINT,		# byte string 8-bits
+	'WORD': _UINT,		# byte string 16-bits
+	'DWORD': _UDINT,	# byte string 32-bits
+	'LWORD': _ULINT		# byte string 64-bits
 }
 
 
+def _unpack_function(codec):
+	""" Make the function of UNPACK_DATA_FUNCTION that decodes a byte string with codec
+	"""
+	unpack_from = codec.unpack_from
+
+	def unpack(st):
+		return unpack_from(st, 0)[0]
+	return unpack
+
+
+PACK_DATA_FUNCTION = dict((typ, codec.pack) for typ, codec in DATA_STRUCT.items())
+
+
+UNPACK_DATA_FUNCTION = dict((typ, _unpack_function(codec)) for typ, codec in DATA_STRUCT.items())
+UNPACK_DATA_FUNCTION['BOOL'] = unpack_bool
+UNPACK_DATA_FUNCTION['STRUCT'] = unpack_struct		# structure
+
+
+def data_format(typ):
+	"""return the struct format character of the atomic type typ"""
+	return to_str(DATA_STRUCT[typ].format)[-1]
+
+
+def unpack_data_from(typ, buf, offset=0, end=None):
+	"""unpack the value of type typ found at offset in buf
+
+	It returns the same value of UNPACK_DATA_FUNCTION[typ](buf[offset:end]) without slicing buf.
+	The end is used only by STRUCT, whose data bytes are returned as a new byte string.
+	"""
+	if typ == 'STRUCT':
+		return copy_bytes(buf, offset + 2, end)
+	value = DATA_STRUCT[typ].unpack_from(buf, offset)[0]
+	if typ == 'BOOL':
+		return 1 if value & 255 else 0
+	return value
+
+
+_ARRAY_CODECS = {}
+
+
+def unpack_array_from(typ, buf, offset=0, count=1):
+	"""unpack count values of the atomic type typ found at offset in buf, with a single unpack
+
+	The codecs are compiled once for each type and count, and kept for the next fragments.
+	:return: the list of the values
+	"""
+	codec = _ARRAY_CODECS.get((typ, count))
+	if codec is None:
+		if len(_ARRAY_CODECS) >= 256:
+			_ARRAY_CODECS.clear()
+		codec = _ARRAY_CODECS[(typ, count)] = struct.Struct('<{0}{1}'.format(count, data_format(typ)))
+	values = list(codec.unpack_from(buf, offset))
+	if typ == 'BOOL':
+		return [1 if value & 255 else 0 for value in values]
+	return values
+
+
 def print_bytes_line(msg):
 	out = ''
-	for ch in msg:
-		out += "{:0>2x}".format(ord(ch))
+	for ch in bytearray(msg):
+		out += "{:0>2x}".format(ch)
 	return out
 
 
@@ -141,11 +242,11 @@ def print_bytes_msg(msg, info=''):
 	new_line = True
 	line = 0
 	column = 0
-	for idx, ch in enumerate(msg):
+	for idx, ch in enumerate(bytearray(msg)):
 		if new_line:
 			out += "\n({:0>4d}) ".format(line * 10)
 			new_line = False
-		out += "{:0>2x} ".format(ord(ch))
+		out += "{:0>2x} ".format(ch)
 		if column == 9:
 			new_line = True
 			column = 0
@@ -156,7 +257,7 @@ def print_bytes_msg(msg, info=''):
 
 
 def get_extended_status(msg, start):
-	status = unpack_sint(msg[start:start+1])
+	status = unpack_sint_from(msg, start)
 	# send_rr_data
 	# 42 General Status
 	# 43 Size of additional status
@@ -166,16 +267,16 @@ def get_extended_status(msg, start):
 	# 48 General Status
 	# 49 Size of additional status
 	# 50..n additional status
-	extended_status_size = (unpack_sint(msg[start+1:start+2]))*2
+	extended_status_size = (unpack_sint_from(msg, start+1))*2
 	extended_status = 0
 	if extended_status_size != 0:
 		# There is an additional status
 		if extended_status_size == 1:
-			extended_status = unpack_sint(msg[start+2:start+3])
+			extended_status = unpack_sint_from(msg, start+2)
 		elif extended_status_size == 2:
-			extended_status = unpack_uint(msg[start+2:start+4])
+			extended_status = unpack_uint_from(msg, start+2)
 		elif extended_status_size == 4:
-			extended_status = unpack_dint(msg[start+2:start+6])
+			extended_status = unpack_dint_from(msg, start+2)
 		else:
 			return 'Extended Status Size Unknown'
 	try:
@@ -184,16 +285,87 @@ def get_extended_status(msg, start):
 		return "Extended Status info not present"
 
 
-def create_tag_rp(tag, multi_requests=False):
+class RequestPathCache(object):
+	""" Bounded LRU cache of request paths, safe to share between threads
+
+	The request path of a key not in the cache is made by calling build(tag, multi_requests, instance_id) outside the
+	lock. When the cache is full the least recently used path is dropped.
+
+	:param build: the function that makes the request path
+	:param capacity: the maximum number of request paths kept
+	"""
+	def __init__(self, build, capacity=1024):
+		self.capacity = capacity
+		self.hits = 0
+		self.misses = 0
+		self._build = build
+		self._paths = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __len__(self):
+		return len(self._paths)
+
+	def lookup(self, tag, multi_requests=False, instance_id=None):
+		""" Get the request path of a tag, building it if it is not in the cache
+
+		:return: the request path, None if it cannot be created
+		"""
+		key = (tag, multi_requests, instance_id)
+		with self._lock:
+			if key in self._paths:
+				request_path = self._paths.pop(key)
+				self._paths[key] = request_path
+				self.hits += 1
+				return request_path
+			self.misses += 1
+
+		request_path = self._build(tag, multi_requests, instance_id)
+		with self._lock:
+			self._paths[key] = request_path
+			while len(self._paths) > self.capacity:
+				self._paths.popitem(last=False)
+		return request_path
+
+	def invalidate(self, tag=None):
+		""" Drop the request paths of a tag, or all of them when tag is None
+
+		To be called when the tag database of the controller changes.
+		"""
+		with self._lock:
+			if tag is None:
+				self._paths.clear()
+			else:
+				for key in [key for key in self._paths if key[0] == tag]:
+					del self._paths[key]
+
+	def stats(self):
+		""" Get the statistics of the cache
+
+		:return: a dictionary with hits, misses, size and capacity
+		"""
+		with self._lock:
+			return {'hits': self.hits, 'misses': self.misses, 'size': len(self._paths), 'capacity': self.capacity}
+
+
+def create_tag_rp(tag, multi_requests=False, instance_id=None):
 	""" Create tag Request Packet
 
 	It returns the request packed wrapped around the tag passed.
 	If any error it returns none
+
+	When instance_id is given, the first name of the tag is addressed by that instance of the Symbol Object instead of
+	the ANSI extended symbolic segment. The request paths are kept in TAG_RP_CACHE, so the same tag is parsed only once.
+	"""
+	return TAG_RP_CACHE.lookup(tag, multi_requests, instance_id)
+
+
+def _create_tag_rp(tag, multi_requests, instance_id):
+	""" Build the request path of create_tag_rp
 	"""
 	tags = tag.split('.')
 	rp = []
 	index = []
-	for tag in tags:
+	for position, tag in enumerate(tags):
 		add_index = False
 		# Check if is an array tag
 		if tag.find('[') != -1:
@@ -209,16 +381,29 @@ def create_tag_rp(tag, multi_requests=False):
 			tag = tag[:tag.find('[')]
 		tag_length = len(tag)
 
-		# Create the request path
-		rp.append(EXTENDED_SYMBOL)  # ANSI Ext. symbolic segment
-		rp.append(chr(tag_length))  # Length of the tag
-
-		# Add the tag to the Request path
-		for char in tag:
-			rp.append(char)
-		# Add pad byte because total length of Request path must be word-aligned
-		if tag_length % 2:
-			rp.append(PADDING_BYTE)
+		if position == 0 and instance_id is not None:
+			# Logical segments of the Symbol Object instance
+			rp.append(CLASS_ID["8-bit"])
+			rp.append(CLASS_CODE["Symbol Object"])
+			if instance_id <= 0xff:
+				rp.append(INSTANCE_ID["8-bit"])
+				rp.append(pack_sint(instance_id))
+			elif instance_id <= 0xffff:
+				rp.append(INSTANCE_ID["16-bit"]+PADDING_BYTE)
+				rp.append(pack_uint(instance_id))
+			else:
+				rp.append(INSTANCE_ID["32-bit"]+PADDING_BYTE)
+				rp.append(pack_dint(instance_id))
+		else:
+			# Create the request path
+			rp.append(EXTENDED_SYMBOL)  # ANSI Ext. symbolic segment
+			rp.append(pack_sint(tag_length))  # Length of the tag
+
+			# Add the tag to the Request path
+			rp.append(to_bytes(tag))
+			# Add pad byte because total length of Request path must be word-aligned
+			if tag_length % 2:
+				rp.append(PADDING_BYTE)
 		# Add any index
 		if add_index:
 			for idx in index:
@@ -238,12 +423,16 @@ def create_tag_rp(tag, multi_requests=False):
 
 	# At this point the Request Path is completed,
 	if multi_requests:
-		request_path = chr(len(rp)/2) + ''.join(rp)
+		request_path = b''.join(rp)
+		request_path = pack_sint(len(request_path)//2) + request_path
 	else:
-		request_path = ''.join(rp)
+		request_path = b''.join(rp)
 	return request_path
 
 
+TAG_RP_CACHE = RequestPathCache(_create_tag_rp)
+
+
 def build_common_packet_format(message_type, message, addr_type, addr_data=None, timeout=10):
 	""" build_common_packet_format
 
@@ -271,7 +460,7 @@ def build_multiple_service(rp_list, sequence=None):
 	if sequence is not None:
 		mr.append(pack_uint(sequence))
 
-	mr.append(chr(TAG_SERVICES_REQUEST["Multiple Service Packet"]))  # the Request Service
+	mr.append(pack_sint(TAG_SERVICES_REQUEST["Multiple Service Packet"]))  # the Request Service
 	mr.append(pack_sint(2))                 # the Request Path Size length in word
 	mr.append(CLASS_ID["8-bit"])
 	mr.append(CLASS_CODE["Message Router"])
@@ -293,6 +482,35 @@ def build_multiple_service(rp_list, sequence=None):
 	return mr
 
 
+def plan_multiple_service(rp_list, reply_sizes, connection_size):
+	""" plan_multiple_service
+	Split a list of service requests in the fewest Multiple Service Packets that fit a connection.
+
+	A packet is closed when either its request or its expected reply would not fit in connection_size. The services
+	keep their order, so the replies can be merged back by concatenation. A service too big for any packet gets a
+	packet for itself.
+
+	:param rp_list: the list of service requests, each one as passed to build_multiple_service
+	:param reply_sizes: the expected size of the reply to each service request
+	:param connection_size: the size of the connection in bytes
+	:return: a list of (start, end) slices of rp_list, one for each packet
+	"""
+	packets = []
+	start = 0
+	request_size = reply_size = MULTIPLE_SERVICE_OVERHEAD
+	for index, rp in enumerate(rp_list):
+		request_size += 2 + len(rp)
+		reply_size += 2 + reply_sizes[index]
+		if index > start and (request_size > connection_size or reply_size > connection_size):
+			packets.append((start, index))
+			start = index
+			request_size = MULTIPLE_SERVICE_OVERHEAD + 2 + len(rp)
+			reply_size = MULTIPLE_SERVICE_OVERHEAD + 2 + reply_sizes[index]
+	if start < len(rp_list):
+		packets.append((start, len(rp_list)))
+	return packets
+
+
 def parse_multiple_request(message, tags, typ):
 	""" parse_multi_request
 	This function should be used to parse the reply message to a multi request service rapped around the
@@ -307,22 +525,21 @@ def parse_multiple_request(message, tags, typ):
 	"""
 	offset = 50
 	position = 50
-	number_of_service_replies = unpack_uint(message[offset:offset+2])
+	number_of_service_replies = unpack_uint_from(message, offset)
 	tag_list = []
 	for index in range(number_of_service_replies):
 		position += 2
-		start = offset + unpack_uint(message[position:position+2])
-		general_status = unpack_sint(message[start+2:start+3])
+		start = offset + unpack_uint_from(message, position)
+		general_status = unpack_sint_from(message, start+2)
 
 		if general_status == 0:
 			if typ == "READ":
-				data_type = unpack_uint(message[start+4:start+6])
+				data_type = unpack_uint_from(message, start+4)
 				try:
 					value_begin = start + 6
 					value_end = value_begin + DATA_FUNCTION_SIZE[I_DATA_TYPE[data_type]]
-					value = message[value_begin:value_end]
 					tag_list.append((tags[index],
-									UNPACK_DATA_FUNCTION[I_DATA_TYPE[data_type]](value),
+									unpack_data_from(I_DATA_TYPE[data_type], message, value_begin, value_end),
 									I_DATA_TYPE[data_type]))
 				except LookupError:
 					tag_list.append((tags[index], None, None))
@@ -344,6 +561,8 @@ class Socket:
 		else:
 			self.sock.settimeout(timeout)
 		self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+		self._buffer = None
+		self._view = None
 
 	def connect(self, host, port):
 		try:
@@ -375,7 +594,7 @@ class Socket:
 		while bytes_recd < msg_len:
 			try:
 				chunk = self.sock.recv(min(msg_len - bytes_recd, 2048))
-				if chunk == '':
+				if not chunk:
 					raise SocketError("socket connection broken.")
 				if one_shot:
 					data_size = int(struct.unpack('<H', chunk[2:4])[0])  # Length
@@ -384,9 +603,57 @@ class Socket:
 
 				chunks.append(chunk)
 				bytes_recd += len(chunk)
+			except socket.timeout as e:
+				if bytes_recd == 0:
+					raise SocketTimeout(e)
+				raise SocketError(e)
 			except socket.error as e:
 				raise SocketError(e)
-		return ''.join(chunks)
+		return b''.join(chunks)
+
+	def receive_into(self, timeout=0):
+		""" receive an encapsulated message into the buffer of the socket
+
+		The buffer is allocated at the first call, big enough for the largest encapsulated message, and then reused
+		for every message received on this connection. Nothing is copied or joined: the bytes land where they are
+		parsed. The memoryview returned is valid only until the next call to receive_into.
+
+		:return: a memoryview over the message received
+		"""
+		if timeout != 0:
+			self.sock.settimeout(timeout)
+		if self._buffer is None:
+			self._buffer = bytearray(HEADER_SIZE + 0xffff)
+			self._view = memoryview(self._buffer)
+		msg_len = HEADER_SIZE
+		bytes_recd = 0
+		one_shot = True
+		while bytes_recd < msg_len:
+			try:
+				if bytes_recd:
+					nbytes = self.sock.recv_into(self._view[bytes_recd:msg_len])
+				else:
+					nbytes = self.sock.recv_into(self._buffer, msg_len)
+			except socket.timeout as e:
+				# Only a timeout between two messages leaves the stream usable
+				if bytes_recd == 0:
+					raise SocketTimeout(e)
+				raise SocketError(e)
+			except socket.error as e:
+				raise SocketError(e)
+			if nbytes == 0:
+				raise SocketError("socket connection broken.")
+			bytes_recd += nbytes
+			if one_shot and bytes_recd >= HEADER_SIZE:
+				msg_len = HEADER_SIZE + unpack_uint_from(self._buffer, 2)  # Length
+				one_shot = False
+		return self._view[:msg_len]
+
+	def gettimeout(self):
+		return self.sock.gettimeout()
+
+	def settimeout(self, timeout):
+		self.sock.settimeout(timeout)
 
 	def close(self):
 		self.sock.close()
@@ -25,36 +25,37 @@
 #
 
 ELEMENT_ID = {
-	"8-bit": '\x28',
-	"16-bit": '\x29',
-	"32-bit": '\x2a'
+	"8-bit": b'\x28',
+	"16-bit": b'\x29',
+	"32-bit": b'\x2a'
 }
 
 CLASS_ID = {
-	"8-bit": '\x20',
-	"16-bit": '\x21',
+	"8-bit": b'\x20',
+	"16-bit": b'\x21',
 }
 
 INSTANCE_ID = {
-	"8-bit": '\x24',
-	"16-bit": '\x25'
+	"8-bit": b'\x24',
+	"16-bit": b'\x25',
+	"32-bit": b'\x26'
 }
 
 ATTRIBUTE_ID = {
-	"8-bit": '\x30',
-	"16-bit": '\x31'
+	"8-bit": b'\x30',
+	"16-bit": b'\x31'
 }
 
 ENCAPSULATION_COMMAND = {  # Volume 2: 2-3.2 Command Field UINT 2 byte
-	"nop": '\x00\x00',
-	"list_targets": '\x01\x00',
-	"list_services": '\x04\x00',
-	"list_identity": '\x63\x00',
-	"list_interfaces": '\x64\x00',
-	"register_session": '\x65\x00',
-	"unregister_session": '\x66\x00',
-	"send_rr_data": '\x6F\x00',
-	"send_unit_data": '\x70\x00'
+	"nop": b'\x00\x00',
+	"list_targets": b'\x01\x00',
+	"list_services": b'\x04\x00',
+	"list_identity": b'\x63\x00',
+	"list_interfaces": b'\x64\x00',
+	"register_session": b'\x65\x00',
+	"unregister_session": b'\x66\x00',
+	"send_rr_data": b'\x6F\x00',
+	"send_unit_data": b'\x70\x00'
 }
 
 """
@@ -65,21 +66,22 @@ When a UDT is created, an instance of the Template object (Class ID 0x6C) is
 created to hold information about the structure makeup.
 """
 CLASS_CODE = {
-	"Message Router": '\x02',  # Volume 1: 5-1
-	"Symbol Object": '\x6b',
-	"Template Object": '\x6c',
-	"Connection Manager": '\x06'  # Volume 1: 3-5
+	"Message Router": b'\x02',  # Volume 1: 5-1
+	"Symbol Object": b'\x6b',
+	"Template Object": b'\x6c',
+	"Controller Object": b'\xac',
+	"Connection Manager": b'\x06'  # Volume 1: 3-5
 }
 
 CONNECTION_MANAGER_INSTANCE = {
-	'Open Request': '\x01',
-	'Open Format Rejected': '\x02',
-	'Open Resource  Rejected': '\x03',
-	'Open Other Rejected': '\x04',
-	'Close Request': '\x05',
-	'Close Format Request': '\x06',
-	'Close Other Request': '\x07',
-	'Connection Timeout': '\x08'
+	'Open Request': b'\x01',
+	'Open Format Rejected': b'\x02',
+	'Open Resource  Rejected': b'\x03',
+	'Open Other Rejected': b'\x04',
+	'Close Request': b'\x05',
+	'Close Format Request': b'\x06',
+	'Close Other Request': b'\x07',
+	'Connection Timeout': b'\x08'
 }
 
 TAG_SERVICES_REQUEST = {
@@ -254,14 +256,14 @@ EXTEND_CODES = {
 	}
 }
 DATA_ITEM = {
-	'Connected': '\xb1\x00',
-	'Unconnected': '\xb2\x00'
+	'Connected': b'\xb1\x00',
+	'Unconnected': b'\xb2\x00'
 }
 
 ADDRESS_ITEM = {
-	'Connection Based': '\xa1\x00',
-	'Null': '\x00\x00',
-	'UCMM': '\x00\x00'
+	'Connection Based': b'\xa1\x00',
+	'Null': b'\x00\x00',
+	'UCMM': b'\x00\x00'
 }
 
 UCMM = {
@@ -273,12 +275,12 @@ UCMM = {
 }
 
 CONNECTION_SIZE = {
-	'Backplane': '\x03',     # CLX
-	'Direct Network': '\x02'
+	'Backplane': b'\x03',     # CLX
+	'Direct Network': b'\x02'
 }
 
 HEADER_SIZE = 24
-EXTENDED_SYMBOL = '\x91'
+EXTENDED_SYMBOL = b'\x91'
 BOOL_ONE = 0xff
 REQUEST_SERVICE = 0
 REQUEST_PATH_SIZE = 1
@@ -288,20 +290,20 @@ INSUFFICIENT_PACKETS = 6
 OFFSET_MESSAGE_REQUEST = 40
 
 
-FORWARD_CLOSE = '\x4e'
-UNCONNECTED_SEND = '\x52'
-FORWARD_OPEN = '\x54'
-LARGE_FORWARD_OPEN = '\x5b'
-GET_CONNECTION_DATA = '\x56'
-SEARCH_CONNECTION_DATA = '\x57'
-GET_CONNECTION_OWNER = '\x5a'
+FORWARD_CLOSE = b'\x4e'
+UNCONNECTED_SEND = b'\x52'
+FORWARD_OPEN = b'\x54'
+LARGE_FORWARD_OPEN = b'\x5b'
+GET_CONNECTION_DATA = b'\x56'
+SEARCH_CONNECTION_DATA = b'\x57'
+GET_CONNECTION_OWNER = b'\x5a'
 MR_SERVICE_SIZE = 2
 
-PADDING_BYTE = '\x00'
-PRIORITY = '\x0a'
-TIMEOUT_TICKS = '\x05'
-TIMEOUT_MULTIPLIER = '\x01'
-TRANSPORT_CLASS = '\xa3'
+PADDING_BYTE = b'\x00'
+PRIORITY = b'\x0a'
+TIMEOUT_TICKS = b'\x05'
+TIMEOUT_MULTIPLIER = b'\x01'
+TRANSPORT_CLASS = b'\xa3'
 
 CONNECTION_PARAMETER = {
 	'PLC5': 0x4302,
@@ -311,6 +313,23 @@ CONNECTION_PARAMETER = {
 	'Default': 0x43f8,
 }
 
+"""
+Large Forward Open uses 32 bit network connection parameters: the connection size is the lower 16 bits
+"""
+LARGE_CONNECTION_PARAMETER = {
+	'Default': 0x42000000,
+}
+CONNECTION_SIZE_MASK = 0x01ff
+LARGE_CONNECTION_SIZE_MASK = 0xffff
+MAX_CONNECTION_SIZE = 4002
+
+"""
+Bytes taken in a connected message by the sequence count and the Multiple Service Packet header. When the size of a
+service reply is not known yet, it is taken as the reply header, the data type and the largest atomic value.
+"""
+MULTIPLE_SERVICE_OVERHEAD = 10
+DEFAULT_SERVICE_REPLY_SIZE = 14
+
 """
 Atomic Data Type:
 
@@ -408,6 +427,22 @@ DATA_FUNCTION_SIZE = {
 	'STRUCT': -1		# structure various size
 }
 
+"""
+numpy dtype of each atomic data type, little-endian as on the wire
+"""
+DATA_DTYPE = {
+	'BOOL': 'u1',
+	'SINT': 'i1',		# Signed 8-bit integer
+	'INT': '<i2',		# Signed 16-bit integer
+	'DINT': '<i4',		# Signed 32-bit integer
+	'REAL': '<f4',		# 32-bit floating point
+	'LINT': '<i8',
+	'BYTE': 'u1',		# byte string 8-bits
+	'WORD': '<u2',		# byte string 16-bits
+	'DWORD': '<u4',		# byte string 32-bits
+	'LWORD': '<u8'		# byte string 64-bits
+}
+
 REPLY_INFO = {
 	0x4e: 'FORWARD_CLOSE (4E,00)',
 	0x52: 'UNCONNECTED_SEND (52,00)',
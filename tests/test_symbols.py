@@ -0,0 +1,60 @@
+import unittest
+
+from pycomm.ab_comm.symbols import SymbolTable
+
+
+def make_tag(instance_id, name, symbol_type=0xc4, attr_3=0, dimensions=()):
+	return {'instance_id': instance_id, 'tag_name': name, 'symbol_type': symbol_type, 'attr_3': attr_3,
+			'array_dimensions': list(dimensions)}
+
+
+class SymbolTableTest(unittest.TestCase):
+
+	def test_append_and_lookup(self):
+		tags = [make_tag(0xfffffffe, 'Last', attr_3=0xdeadbeef),
+				make_tag(0x80000000, 'Array', symbol_type=0xc4 | (1 << 13), attr_3=0xffffffff, dimensions=[0xffffffff]),
+				make_tag(1, 'First')]
+		table = SymbolTable()
+		for tag in tags:
+			table.append(tag)
+		self.assertEqual(len(table), 3)
+		for tag in tags:
+			self.assertTrue(tag['tag_name'] in table)
+			self.assertEqual(table[tag['tag_name']], tag)
+		self.assertEqual(table.get('Missing'), None)
+		self.assertRaises(KeyError, lambda: table['Missing'])
+		self.assertEqual(list(table.names()), ['Last', 'Array', 'First'])
+
+	def test_by_instance(self):
+		table = SymbolTable(make_tag(instance_id, 'T%d' % index, attr_3=0xdeadbeef)
+							for index, instance_id in enumerate([0xffffffff, 7, 0x80000000, 0]))
+		self.assertEqual(table.by_instance(0xffffffff)['tag_name'], 'T0')
+		self.assertEqual(table.by_instance(0x80000000)['tag_name'], 'T2')
+		self.assertEqual(table.by_instance(0)['tag_name'], 'T3')
+		self.assertEqual(table.by_instance(0)['attr_3'], 0xdeadbeef)
+		self.assertEqual(table.by_instance(8), None)
+
+	def test_case_insensitive(self):
+		table = SymbolTable([make_tag(1, 'MyTag'), make_tag(2, 'Other')])
+		self.assertTrue('mytag' in table)
+		self.assertEqual(table['MYTAG']['instance_id'], 1)
+		self.assertEqual(table.get('mytag')['tag_name'], 'MyTag')
+
+	def test_append_replaces(self):
+		table = SymbolTable([make_tag(1, 'MyTag'), make_tag(2, 'Other')])
+		table.append(make_tag(3, 'MYTAG', dimensions=[4]))
+		self.assertEqual(len(table), 2)
+		self.assertEqual(list(table.names()), ['MYTAG', 'Other'])
+		self.assertEqual([tag['instance_id'] for tag in table], [3, 2])
+		self.assertEqual(table['mytag']['instance_id'], 3)
+		self.assertEqual(table.by_instance(1), None)
+		self.assertEqual(table.by_instance(3)['tag_name'], 'MYTAG')
+
+	def test_index_grows(self):
+		table = SymbolTable(make_tag(index, 'Tag%d' % index) for index in range(1000))
+		self.assertEqual(table['Tag999']['instance_id'], 999)
+		self.assertEqual(table.by_instance(500)['tag_name'], 'Tag500')
+
+
+if __name__ == '__main__':
+	unittest.main()
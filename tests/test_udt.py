@@ -0,0 +1,47 @@
+import threading
+import time
+import unittest
+
+from pycomm.ab_comm.clx import Driver
+
+TAG_STRUCT = {'obj_def_size': 20, 'struct_size': 24, 'member_cnt': 3, 'struct_handle': 0x0f00}
+
+
+class SlowDriver(Driver):
+	""" A connected driver that answers get_tag_struct once another thread is waiting for the same template
+	"""
+	def __init__(self):
+		Driver.__init__(self)
+		self._session = 1
+		self._target_is_connected = True
+		self.requests = 0
+
+	def send_unit_data(self, msg):
+		self.requests += 1
+		deadline = time.time() + 2
+		while self._template_cache.stats()['coalesced'] == 0 and time.time() < deadline:
+			time.sleep(0.001)
+		self._tag_struct = dict(TAG_STRUCT)
+		return True
+
+
+class TemplateCacheTest(unittest.TestCase):
+
+	def test_threads_share_a_read(self):
+		driver = SlowDriver()
+		results = []
+		threads = [threading.Thread(target=lambda: results.append(driver.get_tag_struct(0x2a0))) for _ in range(2)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(results, [TAG_STRUCT, TAG_STRUCT])
+		self.assertEqual(driver.requests, 1)
+		stats = driver.get_template_cache_stats()
+		self.assertEqual((stats['misses'], stats['coalesced'], stats['hits']), (1, 1, 1))
+		self.assertEqual(driver.get_tag_struct(0x2a0), TAG_STRUCT)
+		self.assertEqual(driver.requests, 1)
+
+
+if __name__ == '__main__':
+	unittest.main()
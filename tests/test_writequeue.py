@@ -0,0 +1,68 @@
+import unittest
+
+from pycomm.ab_comm.clx import Driver
+from pycomm.ab_comm.writequeue import WriteQueue, WriteFuture
+
+# A Write Tag service of a DINT tag named Tnnn in a Multiple Service Packet: its offset (2), service (1), size of the
+# request path (1), request path (6), data type (2), number of elements (2) and value (4)
+DINT_WRITE_SIZE = 18
+MULTIPLE_SERVICE_OVERHEAD = 10
+
+
+class RecordingDriver(Driver):
+	""" A driver that records the writes instead of sending them
+	"""
+	def __init__(self, packets):
+		Driver.__init__(self)
+		self._connection_size = MULTIPLE_SERVICE_OVERHEAD + packets * DINT_WRITE_SIZE
+		self.written = []
+
+	def write_tag(self, tag, value=None, typ=None):
+		self.written.append(list(tag))
+		return [(name, value, typ, 'GOOD') for name, value, typ in tag]
+
+
+class WriteQueueTest(unittest.TestCase):
+
+	def test_last_value_wins(self):
+		driver = RecordingDriver(10)
+		queue = WriteQueue(driver, window=60)
+		first = queue.write('T001', 1, 'DINT')
+		queue.write('T002', 5, 'DINT')
+		last = queue.write('T001', 2, 'DINT')
+		self.assertEqual(queue.flush(), 2)
+		self.assertEqual(driver.written, [[('T001', 2, 'DINT'), ('T002', 5, 'DINT')]])
+		self.assertEqual(first.result(0), ('T001', 2, 'DINT', 'GOOD'))
+		self.assertEqual(last.result(0), ('T001', 2, 'DINT', 'GOOD'))
+		self.assertEqual(queue.stats(), {'writes': 3, 'coalesced': 1, 'flushes': 1, 'pending': 0})
+
+	def test_batch_closed_before_overflow(self):
+		driver = RecordingDriver(3)
+		queue = WriteQueue(driver, window=60)
+		for index in range(3):
+			queue.write('T%03d' % index, index, 'DINT')
+		# The packet is full, but nothing overflows it yet
+		queue.write('T001', 7, 'DINT')
+		self.assertTrue(queue.poll() > 0)
+		self.assertEqual(driver.written, [])
+
+		queue.write('T003', 3, 'DINT')
+		queue.poll()
+		self.assertEqual(driver.written, [[('T000', 0, 'DINT'), ('T001', 7, 'DINT'), ('T002', 2, 'DINT')]])
+		self.assertEqual(queue.stats()['pending'], 1)
+		queue.flush()
+		self.assertEqual(driver.written[1:], [[('T003', 3, 'DINT')]])
+
+	def test_done_callback(self):
+		future = WriteFuture()
+		calls = []
+		future.add_done_callback(calls.append)
+		future.set_result(('T001', 1, 'DINT', 'GOOD'))
+		future.set_result(('T001', 2, 'DINT', 'BAD'))
+		future.add_done_callback(calls.append)
+		self.assertEqual(calls, [future, future])
+		self.assertEqual(future.result(0), ('T001', 1, 'DINT', 'GOOD'))
+
+
+if __name__ == '__main__':
+	unittest.main()